@@ -0,0 +1,14 @@
+"""
+ASGI entry point for TopLoggerStats.
+"""
+
+import os
+import sys
+
+project_directory = os.path.dirname(__file__)
+
+if project_directory not in sys.path:
+    sys.path.append(project_directory)
+
+
+from src.asgi import application as app
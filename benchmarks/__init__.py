@@ -0,0 +1,6 @@
+"""
+Benchmarks for TopLoggerStats. Every module can be run on its own, e.g. `python -m benchmarks.aggregation`.
+
+The compiled Cython modules are required, so run `cythonize -i src/cython_modules/*.pyx` first.
+`python -m benchmarks.suite` runs the end-to-end suite on generated data against the TopLogger stub.
+"""
@@ -0,0 +1,156 @@
+"""
+Compares the single-pass aggregation engine with the former per-chart SQL queries.
+
+The former path ran one full scan of the main table for every stat and chart. The benchmark
+runs these queries against a synthetic main table and compares it with loading the table once
+into the aggregates.
+"""
+
+import random
+import sqlite3
+import time
+from collections.abc import Callable
+from datetime import datetime as dt, timedelta as td
+
+from src.cython_modules.aggregates import load_aggregates
+
+
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 5
+
+# The synthetic grades are grade indices already, like the grades the legacy queries read, so they are their own lookup
+IDENTITY = tuple(range(30))
+
+# The queries of the statistics processor before the aggregation engine, for a dashboard of a single gym
+LEGACY_QUERIES = (
+    "SELECT ascend_type, MAX(grade) FROM main WHERE grade IS NOT NULL AND gym_id IN {gyms} GROUP BY ascend_type",
+    "SELECT ascend_type, COUNT(ascend_type) FROM main WHERE grade IS NOT NULL AND gym_id IN {gyms} GROUP BY ascend_type",
+    """SELECT ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1),
+        ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1),
+        ROUND(SUM(CASE WHEN ascend_type = 'Redpoint' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
+        FROM main WHERE date_logged IS NOT NULL AND ascend_type IS NOT NULL AND gym_id IN {gyms}""",
+    """SELECT CAST(strftime('%s', date_logged) * 1000 + 40000000 AS INTEGER),
+        IFNULL(MAX(0, MAX(CASE WHEN ascend_type = 'Redpoint' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)), 0),
+        IFNULL(MAX(0, MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)), 0),
+        IFNULL(MAX(0, MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)), 0)
+        FROM main WHERE date_logged IS NOT NULL AND gym_id IN {gyms}
+        GROUP BY strftime('%m-%Y', date_logged) ORDER BY CAST(strftime('%s', date_logged) AS INTEGER) ASC""",
+    """SELECT CAST(strftime('%s', date_logged) * 1000 + 40000000 AS INTEGER),
+        SUM(CASE WHEN ascend_type = 'Redpoint' THEN 1 ELSE 0 END), SUM(CASE WHEN ascend_type = 'Flash' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN ascend_type = 'Onsight' THEN 1 ELSE 0 END)
+        FROM main WHERE date_logged IS NOT NULL AND gym_id IN {gyms}
+        GROUP BY strftime('%m-%Y', date_logged) ORDER BY CAST(strftime('%s', date_logged) AS INTEGER) ASC""",
+    """SELECT grade, SUM(CASE WHEN ascend_type = 'Redpoint' THEN 1 ELSE 0 END), SUM(CASE WHEN ascend_type = 'Flash' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN ascend_type = 'Onsight' THEN 1 ELSE 0 END)
+        FROM main WHERE grade IS NOT NULL AND ascend_type IS NOT NULL AND gym_id IN {gyms} GROUP BY grade""",
+    """SELECT grade, ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1),
+        ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
+        FROM main WHERE date_logged IS NOT NULL AND ascend_type IS NOT NULL AND grade IS NOT NULL AND gym_id IN {gyms}
+        GROUP BY grade ORDER BY grade ASC""",
+    """SELECT grade_rating, grade, COUNT(*) FROM main
+        WHERE grade IS NOT NULL AND grade_rating IS NOT NULL AND gym_id IN {gyms} GROUP BY grade, grade_rating""",
+    """SELECT rating, ROUND(average_opinion, 1) FROM main
+        WHERE rating IS NOT NULL AND average_opinion IS NOT NULL AND gym_id IN {gyms}""",
+    """SELECT IFNULL(ascend_type, "Not ascended"), AVG(rating), COUNT(rating) FROM main
+        WHERE gym_id IN {gyms} AND rating IS NOT NULL GROUP BY IFNULL(ascend_type, "Not ascended")""",
+    """SELECT wall_name, ascend_type, COUNT(id) FROM main WHERE gym_id IN {gyms} AND ascend_type IS NOT NULL
+        GROUP BY wall_name, ascend_type ORDER BY wall_name""",
+    """SELECT wall_name, MAX(0, MAX(CASE WHEN ascend_type = 'Redpoint' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)),
+        MAX(0, MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)),
+        MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)
+        FROM main WHERE grade IS NOT NULL AND wall_name IS NOT NULL AND gym_id IN {gyms} GROUP BY wall_name""",
+    """SELECT wall_name, ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1),
+        ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
+        FROM main WHERE date_logged IS NOT NULL AND ascend_type IS NOT NULL AND wall_name IS NOT NULL AND gym_id IN {gyms}
+        GROUP BY wall_name ORDER BY wall_name ASC""",
+    """SELECT wall_name, AVG(rating), COUNT(rating) FROM main
+        WHERE rating IS NOT NULL AND wall_name IS NOT NULL AND gym_id IN {gyms} GROUP BY wall_name""",
+)
+
+
+def create_main_table(conn: sqlite3.Connection, nr_of_ascends: int, gym_id: int = 1, seed: int = 0) -> None:
+    """Creates a synthetic main table for a user with the given number of ascends
+
+    Arguments:
+        conn (sqlite3.Connection): Connection to the database
+        nr_of_ascends (int): Number of ascends of the user
+
+    Keyword Arguments:
+        gym_id (int): Gym id of the ascends {1}
+        seed (int): Seed of the random generator {0}
+    """
+    rng = random.Random(seed)
+    start = dt(2020, 9, 1)
+
+    rows = []
+    for i in range(nr_of_ascends):
+        ascended = rng.random() < 0.9
+        rated = rng.random() < 0.3
+        rows.append(
+            (
+                i,
+                i,
+                (
+                    (start + td(minutes=rng.randrange(0, 5 * 365 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S")
+                    if ascended
+                    else None
+                ),
+                rng.choice(("Onsight", "Flash", "Redpoint", "Redpoint")) if ascended else None,
+                gym_id,
+                rng.randrange(0, 30),
+                "route",
+                rng.uniform(1, 5),
+                f"Wall {rng.randrange(0, 25)}",
+                "Synthetic gym",
+                rng.randrange(0, 30) if rated else None,
+                rng.randrange(1, 6) if rated else None,
+            )
+        )
+
+    conn.execute(
+        """
+        CREATE TABLE main (
+            id, climb_id, date_logged, ascend_type, gym_id, grade, climb_type,
+            average_opinion, wall_name, gym_name, grade_rating, rating
+        )
+        """
+    )
+    conn.executemany("INSERT INTO main VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def run_legacy(cursor: sqlite3.Cursor, gyms: str) -> None:
+    for query in LEGACY_QUERIES:
+        cursor.execute(query.format(gyms=gyms))
+        cursor.fetchall()
+
+
+def run_aggregates(cursor: sqlite3.Cursor, gym_ids: tuple[int, ...]) -> None:
+    load_aggregates(cursor, "route", gym_ids, IDENTITY)
+
+
+def best_of(function: Callable[..., object], *args: object) -> float:
+    """Returns the best wall time of the function in milliseconds out of REPEATS runs"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    print(f"{'ascends':>10} {'legacy (ms)':>12} {'aggregates (ms)':>16} {'speedup':>8}")
+    for size in SIZES:
+        with sqlite3.connect(":memory:") as conn:
+            create_main_table(conn, size)
+            cursor = conn.cursor()
+
+            legacy = best_of(run_legacy, cursor, "(1)")
+            aggregates = best_of(run_aggregates, cursor, (1,))
+
+        print(f"{size:>10} {legacy:>12.1f} {aggregates:>16.1f} {legacy / aggregates:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
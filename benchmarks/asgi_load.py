@@ -0,0 +1,237 @@
+"""
+Load test of the ASGI entry point against the WSGI one, at the same number of threads, on generated
+databases and against the local TopLogger stub.
+
+Both servers run one worker process: gunicorn with the gthread worker serves wsgi.py and uvicorn
+serves asgi.py with the same number of threads in its pool. Every client opens the dashboard of a
+user and, as the frontend does, sends a preload for it at the same time. The syncs of the user are
+moved back in time first, so every visit refreshes the user data from the stub, which answers after
+the latency. A WSGI thread waits on TopLogger for the whole refresh, the ASGI pool only runs the
+SQLite work, the charts and the templates. The requests per second, the latencies of the dashboards
+and the peak memory of the server processes are reported.
+
+    python -m benchmarks.asgi_load [--threads 8] [--clients 64] [--latency 0.2] [--seconds 20]
+        [--warmup 3] [--users 200] [--connections 8]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime as dt
+
+import httpx
+
+STUB_PORT = 8771
+SERVER_PORT = 8772
+SECRET_KEY = "asgi-load"
+
+# The fetch layer and the app read their configuration when they are imported, the servers inherit it
+os.environ["TOPLOGGER_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ["TOPLOGGER_RATE_LIMIT"] = "0"
+os.environ["BACKGROUND_REFRESH"] = "0"
+os.environ["SECRET_KEY"] = SECRET_KEY
+os.environ.pop("PROD", None)
+
+from benchmarks.generator import Dataset, Scale, age_sync_state, generate  # noqa: E402
+from benchmarks.stub_server import StubData, StubServer  # noqa: E402
+from src.caching import preload_fingerprint  # noqa: E402
+
+
+CLIMB_TYPE = "boulder"
+GRADING_SYSTEM = "french"
+DAY = 86400
+
+
+def serve_wsgi(threads: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self) -> None:
+            options = {
+                "bind": f"127.0.0.1:{SERVER_PORT}",
+                "workers": 1,
+                "worker_class": "gthread",
+                "threads": threads,
+                "loglevel": "warning",
+            }
+            for name, value in options.items():
+                self.cfg.set(name, value)
+
+        def load(self) -> object:
+            from wsgi import app
+
+            return app
+
+    Server().run()
+
+
+def serve_asgi() -> None:
+    import uvicorn
+    from asgi import app
+
+    uvicorn.run(app, host="127.0.0.1", port=SERVER_PORT, log_level="warning", access_log=False)
+
+
+def serve(mode: str, threads: int) -> None:
+    """Serves the app in the process of the server, on the databases in its DATA_DIRECTORY"""
+    if mode == "wsgi":
+        serve_wsgi(threads)
+    else:
+        # The size of the pool is read from ASGI_THREADS when the constants are imported
+        serve_asgi()
+
+
+def peak_memory(pid: int) -> float:
+    """Returns the sum of the peak resident memory of the process and its children in MiB"""
+    total = 0
+    with open(f"/proc/{pid}/status") as f:
+        total += next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        children = f.read().split()
+
+    return (total + sum(peak_memory(int(child)) * 1024 for child in children)) / 1024
+
+
+def cpu_time(pid: int) -> float:
+    """Returns the CPU seconds of the process and its children so far"""
+    with open(f"/proc/{pid}/stat") as f:
+        # The fields after the name, which is in parentheses, the user and system time are the 14th and 15th
+        fields = f.read().rsplit(")", 1)[1].split()
+    total = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return total + sum(cpu_time(int(child)) for child in f.read().split())
+
+
+def wait_for_server() -> None:
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{SERVER_PORT}/")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("The server did not start")
+
+
+def percentile(latencies: list[float], q: int) -> float:
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1]
+
+
+async def load(dataset: Dataset, clients: int, seconds: float) -> tuple[int, int, list[float]]:
+    """Lets the clients visit the users in turn until the seconds are over.
+
+    Returns:
+        tuple: The number of requests, the number of failed requests and the latencies of the
+            dashboards in ms
+    """
+    uids = itertools.cycle(dataset.uids)
+    requests, failed, latencies = 0, 0, []
+    deadline = time.monotonic() + seconds
+
+    async def visit(client: httpx.AsyncClient, uid: int) -> None:
+        nonlocal requests, failed
+        gyms = dataset.scale.user_gyms(uid)
+        # The cookies of the dashboard are set on the request, the client keeps none of its own
+        cookie = (
+            f"climb_type={CLIMB_TYPE}; grading_system={GRADING_SYSTEM}; gyms={','.join(map(str, gyms))}; name=Bench"
+        )
+        preload = {
+            "fp": preload_fingerprint(SECRET_KEY, dt.now()),
+            "climb_type": CLIMB_TYPE,
+            "gym_ids": [str(gym) for gym in gyms],
+        }
+        await asyncio.to_thread(age_sync_state, dataset, uid, DAY)
+
+        start = time.perf_counter()
+        dashboard, preloaded = await asyncio.gather(
+            client.get(f"/{uid}", headers={"Cookie": cookie}),
+            client.post(f"/api/preload/{uid}", json=preload),
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        requests += 2
+        failed += (dashboard.status_code != 200) + (preloaded.status_code != 200)
+
+    async def run(client: httpx.AsyncClient) -> None:
+        nonlocal requests, failed
+        while time.monotonic() < deadline:
+            try:
+                await visit(client, next(uids))
+            except httpx.TransportError:
+                requests += 2
+                failed += 2
+
+    limits = httpx.Limits(max_connections=clients * 2, max_keepalive_connections=clients * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{SERVER_PORT}", limits=limits, timeout=60) as client:
+        await asyncio.gather(*(run(client) for _ in range(clients)))
+
+    return requests, failed, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8, help="threads of the worker of both servers")
+    parser.add_argument("--clients", type=int, default=64, help="users that visit a dashboard at the same time")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds every response of the stub is delayed")
+    parser.add_argument("--seconds", type=float, default=20, help="seconds of load per server")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load per server before the measurement")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--connections", type=int, help="connections to the stub per server, the default of the app")
+    # Runs a server in the process, for the load test itself
+    parser.add_argument("--serve", choices=("wsgi", "asgi"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.threads)
+        return
+
+    if args.connections:
+        os.environ["TOPLOGGER_MAX_CONNECTIONS_PER_HOST"] = str(args.connections)
+
+    scale = Scale(nr_of_gyms=10, climbs_per_gym=1000, nr_of_users=args.users, ascends_per_user=300)
+    data = StubData(scale.nr_of_gyms, scale.climbs_per_gym, scale.walls_per_gym)
+    with tempfile.TemporaryDirectory() as directory, StubServer(STUB_PORT, args.latency, data) as stub:
+        dataset = generate(directory, scale)
+        print(
+            f"{args.clients} clients, each with a dashboard request and a preload, {args.threads} threads per server, "
+            f"the stub answers after {args.latency * 1000:.0f} ms"
+        )
+        print(
+            f"{'server':>6} {'requests/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'failed':>7} {'upstream calls':>15} "
+            f"{'CPU ms/request':>15} {'peak RSS (MiB)':>15}"
+        )
+
+        for mode in ("wsgi", "asgi"):
+            server = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.asgi_load", "--serve", mode, "--threads", str(args.threads)],
+                env={**os.environ, "DATA_DIRECTORY": directory, "ASGI_THREADS": str(args.threads)},
+            )
+            try:
+                wait_for_server()
+                asyncio.run(load(dataset, args.clients, args.warmup))
+
+                stub.reset()
+                cpu = cpu_time(server.pid)
+                requests, failed, latencies = asyncio.run(load(dataset, args.clients, args.seconds))
+                cpu = cpu_time(server.pid) - cpu
+                memory = peak_memory(server.pid)
+            finally:
+                server.terminate()
+                server.wait()
+
+            print(
+                f"{mode:>6} {requests / args.seconds:>11.1f} {percentile(latencies, 50):>9.0f} "
+                f"{percentile(latencies, 99):>9.0f} {failed:>7} {stub.requests:>15} "
+                f"{cpu / requests * 1000:>15.1f} {memory:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Measures what a refresh of a returning user transfers from TopLogger and writes, against the local stub.
+
+A user with a long history at a few gyms is refreshed three times: the first refresh of the new
+user, a refresh a day later that fetches the changes since the watermarks of the gyms, and the
+scheduled reconciliation a month later that fetches every ascend and opinion again. Before the
+watermarks, every refresh after a week was a full fetch and the others fetched every ascend and
+opinion of the climbs in the gyms, so the reconciliation shows the cost of the former refreshes.
+
+    python -m benchmarks.delta_sync [--climbs-per-gym 6000] [--recent-per-gym 30]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from shutil import copyfile
+
+from benchmarks.stub_server import StubData, StubServer
+
+
+PORT = 8769
+UID = 42
+GYMS = (1, 2, 3, 4, 5)
+DAY = 86400
+
+# The fetch layer reads its base url and limits when it is imported, the database module the paths of the
+# databases, which are created in a directory of their own
+DATA_DIRECTORY = tempfile.TemporaryDirectory(prefix="delta-sync-")
+os.environ["DATA_DIRECTORY"] = DATA_DIRECTORY.name
+os.environ["TOPLOGGER_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["TOPLOGGER_RATE_LIMIT"] = "0"
+
+from scripts.create_databases import (  # noqa: E402
+    create_data_db,
+    create_db_index,
+    create_default_user_db,
+    create_update_db,
+)
+from src.cython_modules.constants import (  # noqa: E402
+    DATA_DB,
+    DEFAULT_USER_DB,
+    UPDATE_DB,
+    USER_DB_FORMAT_STRING,
+    USER_RECONCILE_INTERVAL,
+)
+from src.cython_modules.engine import update_climbs, update_gyms, update_user_data, update_walls  # noqa: E402
+
+
+def create_databases() -> str:
+    """Creates the databases in the data directory and fills the static database from the stub
+
+    Returns:
+        str: Path to the user database
+    """
+    user_db = USER_DB_FORMAT_STRING.format(UID)
+    os.makedirs(os.path.dirname(DEFAULT_USER_DB), exist_ok=True)
+
+    create_data_db(DATA_DB)
+    create_update_db(UPDATE_DB)
+    create_default_user_db(DEFAULT_USER_DB)
+    create_db_index(DATA_DB)
+    copyfile(DEFAULT_USER_DB, user_db)
+
+    update_gyms()
+    update_walls(set(GYMS))
+    update_climbs(set(GYMS), False)
+
+    return user_db
+
+
+def age_sync_state(seconds: int) -> None:
+    """Moves the syncs of the user back in time, as if the user returns after the seconds"""
+    with sqlite3.connect(UPDATE_DB) as conn:
+        conn.execute(
+            """
+            UPDATE user_sync_state
+            SET last_full_sync = last_full_sync - ?1,
+                last_partial_sync = last_partial_sync - ?1,
+                watermark = watermark - ?1
+            WHERE uid = ?2
+            """,
+            (seconds, UID),
+        )
+        conn.commit()
+
+
+def refresh(server: StubServer, user_db: str, label: str, new_user: bool) -> None:
+    server.reset()
+    start = time.perf_counter()
+    with sqlite3.connect(user_db) as conn:
+        written, records, body_bytes = update_user_data(conn, UID, "boulder", GYMS, new_user)
+
+    print(
+        f"{label:>16} {server.requests:>9} {records:>8} {body_bytes / 1024:>10.1f} {written:>8} "
+        f"{(time.perf_counter() - start) * 1000:>10.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--climbs-per-gym", type=int, default=6000)
+    parser.add_argument("--recent-per-gym", type=int, default=30, help="climbs per gym with a recent update")
+    args = parser.parse_args()
+
+    data = StubData(nr_of_gyms=len(GYMS), climbs_per_gym=args.climbs_per_gym, recent_per_gym=args.recent_per_gym)
+    with StubServer(PORT, 0.0, data) as server, DATA_DIRECTORY:
+        user_db = create_databases()
+
+        print(f"{'refresh':>16} {'requests':>9} {'records':>8} {'KiB':>10} {'written':>8} {'time (ms)':>10}")
+        refresh(server, user_db, "first", True)
+
+        age_sync_state(DAY)
+        refresh(server, user_db, "a day later", False)
+
+        age_sync_state(USER_RECONCILE_INTERVAL)
+        refresh(server, user_db, "reconciliation", False)
+
+
+if __name__ == "__main__":
+    main()
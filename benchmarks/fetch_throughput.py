@@ -0,0 +1,67 @@
+"""
+Measures the throughput of the fetch layer against the local TopLogger stub.
+
+The former path fetched the climbs and walls one gym at a time over a blocking session. The
+benchmark fetches the climbs of a batch of gyms in the same way, and through the fetch layer
+with increasing per-host concurrency limits. The last row shows the token bucket at work.
+"""
+
+import os
+import time
+
+import httpx
+
+from benchmarks.stub_server import StubServer
+
+
+PORT = 8765
+LATENCY = 0.05
+NR_OF_GYMS = 40
+CONCURRENCY_LIMITS = (1, 4, 8, 16)
+RATE_LIMIT = 20.0
+
+# The fetch layer reads its base url when it is imported
+os.environ["TOPLOGGER_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+
+from src.cython_modules import api  # noqa: E402
+
+
+def run_sequential(base_url: str, gym_ids: set[int]) -> None:
+    with httpx.Client() as session:
+        for gym_id in gym_ids:
+            session.get(f"{base_url}/v1/gyms/{gym_id}/climbs.json").json()
+
+
+def timed(function, *args: object) -> float:
+    """Returns the wall time of the function in seconds"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    gym_ids = set(range(1, NR_OF_GYMS + 1))
+
+    with StubServer(PORT, LATENCY) as server:
+        print(f"Fetching the climbs of {NR_OF_GYMS} gyms, the stub answers after {LATENCY * 1000:.0f} ms")
+        print(f"{'path':>28} {'seconds':>8} {'req/s':>7} {'in flight':>10}")
+
+        elapsed = timed(run_sequential, server.url, gym_ids)
+        print(f"{'sequential session':>28} {elapsed:>8.2f} {NR_OF_GYMS / elapsed:>7.1f} {server.max_in_flight:>10}")
+
+        for limit in CONCURRENCY_LIMITS:
+            api.configure_limits(limit, 0, limit)
+            server.reset()
+            elapsed = timed(api.fetch_climbs, gym_ids)
+            label = f"fetch layer, {limit} per host"
+            print(f"{label:>28} {elapsed:>8.2f} {NR_OF_GYMS / elapsed:>7.1f} {server.max_in_flight:>10}")
+
+        api.configure_limits(CONCURRENCY_LIMITS[-1], RATE_LIMIT, 1)
+        server.reset()
+        elapsed = timed(api.fetch_climbs, gym_ids)
+        label = f"fetch layer, {RATE_LIMIT:.0f} req/s limit"
+        print(f"{label:>28} {elapsed:>8.2f} {NR_OF_GYMS / elapsed:>7.1f} {server.max_in_flight:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Generates the databases of the application with deterministic synthetic data, at a configurable scale.
+
+The static database holds gyms, walls and climbs with the ids of the TopLogger stub, so the ascends
+and opinions that the stub serves refer to the generated climbs. The update database holds the sync
+state of every user, synced at the time of the generation, and every user has a database with
+ascends and opinions at a few gyms. The same scale and seed give the same data, only the sync times
+depend on the clock. The databases are laid out as in the data directory of the application, which
+serves them with DATA_DIRECTORY set to the directory.
+
+    python -m benchmarks.generator --directory /tmp/toplogger-data [--gyms 20] [--climbs-per-gym 2000]
+        [--users 20] [--ascends-per-user 1000] [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime as dt, timedelta as td
+from shutil import copyfile
+
+from scripts import populate_databases
+from scripts.create_databases import create_data_db, create_db_index, create_default_user_db, create_update_db
+
+
+GYMS_PER_USER = 3
+FIRST_UID = 1
+
+
+class Scale:
+    """Size of the generated data
+
+    Attributes:
+        nr_of_gyms (int): Number of gyms
+        climbs_per_gym (int): Number of climbs per gym, half of them boulders
+        walls_per_gym (int): Number of walls per gym
+        nr_of_users (int): Number of users, with user ids from FIRST_UID
+        ascends_per_user (int): Number of ascends per user, spread over their gyms
+        seed (int): Seed of the random generators
+    """
+
+    def __init__(
+        self,
+        nr_of_gyms: int = 20,
+        climbs_per_gym: int = 2000,
+        walls_per_gym: int = 20,
+        nr_of_users: int = 20,
+        ascends_per_user: int = 1000,
+        seed: int = 0,
+    ) -> None:
+        self.nr_of_gyms = nr_of_gyms
+        self.climbs_per_gym = climbs_per_gym
+        self.walls_per_gym = walls_per_gym
+        self.nr_of_users = nr_of_users
+        self.ascends_per_user = ascends_per_user
+        self.seed = seed
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+    def user_gyms(self, uid: int) -> tuple[int, ...]:
+        """Returns the gyms of the user, the same for every generation with the seed"""
+        rng = random.Random(self.seed * 1_000_003 + uid)
+        gyms = range(1, self.nr_of_gyms + 1)
+        return tuple(sorted(rng.sample(gyms, min(GYMS_PER_USER, len(gyms)))))
+
+
+class Dataset:
+    """Paths of the generated databases
+
+    Attributes:
+        directory (str): Directory of the databases
+        scale (Scale): Size of the data
+        data_db (str): Path to the static database
+        update_db (str): Path to the update database
+        default_user_db (str): Path to the default user database
+        user_db_format (str): Format string of the path of a user database, formatted with the user id
+    """
+
+    def __init__(self, directory: str, scale: Scale) -> None:
+        self.directory = directory
+        self.scale = scale
+        self.data_db = os.path.join(directory, "data.db")
+        self.update_db = os.path.join(directory, "updates.db")
+        self.default_user_db = os.path.join(directory, "user databases", "default_user.db")
+        self.user_db_format = os.path.join(directory, "user databases", "{}.db")
+
+    @property
+    def uids(self) -> range:
+        return range(FIRST_UID, FIRST_UID + self.scale.nr_of_users)
+
+    def user_db(self, uid: int) -> str:
+        return self.user_db_format.format(uid)
+
+
+def generate_static_data(dataset: Dataset) -> None:
+    scale = dataset.scale
+    rng = random.Random(scale.seed)
+    gym_ids = range(1, scale.nr_of_gyms + 1)
+
+    with sqlite3.connect(dataset.data_db) as conn:
+        conn.executemany(
+            "INSERT INTO gyms VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    gym_id,
+                    f"Gym {gym_id}",
+                    f"gym-{gym_id}",
+                    scale.climbs_per_gym,
+                    scale.climbs_per_gym // 2,
+                    scale.climbs_per_gym - scale.climbs_per_gym // 2,
+                    "NL",
+                )
+                for gym_id in gym_ids
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO walls (id, name, gym_id) VALUES (?, ?, ?)",
+            [(gym_id * 1000 + i, f"Wall {i}", gym_id) for gym_id in gym_ids for i in range(scale.walls_per_gym)],
+        )
+        conn.executemany(
+            """
+            INSERT INTO climbs (
+                id, gym_id, type, date_live_start, date_live_end, wall_id,
+                grade, auto_grade, grade_stability, nr_of_ascends, average_opinion
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    gym_id * 100_000 + i,
+                    gym_id,
+                    "boulder" if i % 2 else "route",
+                    (dt(2020, 9, 1) + td(days=rng.randrange(4 * 365))).strftime("%Y-%m-%d %H:%M:%S"),
+                    None,
+                    gym_id * 1000 + rng.randrange(scale.walls_per_gym),
+                    rng.randrange(300, 900),
+                    1,
+                    rng.random(),
+                    rng.randrange(100),
+                    rng.uniform(1, 5),
+                )
+                for gym_id in gym_ids
+                for i in range(scale.climbs_per_gym)
+            ),
+        )
+        conn.executemany("INSERT INTO gym_versions (gym_id, version) VALUES (?, 1)", [(g,) for g in gym_ids])
+        conn.commit()
+
+    populate_databases.populate_grade_database(dataset.data_db)
+
+
+def generate_user_data(dataset: Dataset, uid: int, synced: int) -> None:
+    scale = dataset.scale
+    rng = random.Random(scale.seed * 1_000_003 + uid)
+    gyms = scale.user_gyms(uid)
+    climbs = [gym_id * 100_000 + i for gym_id in gyms for i in range(scale.climbs_per_gym)]
+    ascended = rng.sample(climbs, min(scale.ascends_per_user, len(climbs)))
+    rated = rng.sample(climbs, min(scale.ascends_per_user // 2, len(climbs)))
+
+    path = dataset.user_db(uid)
+    copyfile(dataset.default_user_db, path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO ascends (id, climb_id, date_logged, type, gym_id) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    climb_id,
+                    climb_id,
+                    (dt(2020, 9, 1) + td(minutes=rng.randrange(4 * 365 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S"),
+                    rng.choice(("Onsight", "Flash", "Redpoint", "Redpoint")),
+                    climb_id // 100_000,
+                )
+                for climb_id in ascended
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO opinions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    climb_id,
+                    climb_id,
+                    uid,
+                    rng.random() < 0.1,
+                    rng.random() < 0.05,
+                    rng.randrange(300, 900),
+                    rng.randrange(1, 6),
+                )
+                for climb_id in rated
+            ],
+        )
+        conn.commit()
+
+    with sqlite3.connect(dataset.update_db) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO user_sync_state VALUES (?, ?, ?, ?, NULL, ?)",
+            [(uid, climb_type, gym_id, synced, synced) for climb_type in ("boulder", "route") for gym_id in gyms],
+        )
+        conn.commit()
+
+
+def age_sync_state(dataset: Dataset, uid: int, seconds: int) -> None:
+    """Moves the syncs of the user back in time, so the next refresh fetches the changes since the watermarks"""
+    with sqlite3.connect(dataset.update_db) as conn:
+        conn.execute(
+            """
+            UPDATE user_sync_state
+            SET last_full_sync = strftime('%s', 'now') - ?1, last_partial_sync = NULL,
+                watermark = strftime('%s', 'now') - ?1
+            WHERE uid = ?2
+            """,
+            (seconds, uid),
+        )
+        conn.commit()
+
+
+def generate(directory: str, scale: Scale) -> Dataset:
+    """Generates the databases in the directory, which must not contain them yet
+
+    Arguments:
+        directory (str): Directory of the databases
+        scale (Scale): Size of the data
+
+    Returns:
+        Dataset: The paths of the generated databases
+    """
+    dataset = Dataset(directory, scale)
+    os.makedirs(os.path.dirname(dataset.user_db_format), exist_ok=True)
+
+    create_data_db(dataset.data_db)
+    create_update_db(dataset.update_db)
+    create_default_user_db(dataset.default_user_db)
+    generate_static_data(dataset)
+    create_db_index(dataset.data_db)
+
+    synced = int(time.time())
+    for uid in dataset.uids:
+        generate_user_data(dataset, uid, synced)
+
+    return dataset
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", required=True)
+    parser.add_argument("--gyms", type=int, default=20)
+    parser.add_argument("--climbs-per-gym", type=int, default=2000)
+    parser.add_argument("--walls-per-gym", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--ascends-per-user", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scale = Scale(args.gyms, args.climbs_per_gym, args.walls_per_gym, args.users, args.ascends_per_user, args.seed)
+    start = time.perf_counter()
+    dataset = generate(args.directory, scale)
+    print(f"Generated {scale.as_dict()} in {dataset.directory} in {time.perf_counter() - start:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Compares translating grades with the precomputed lookup arrays of the grading systems with the
+former translation through SQL joins against the `boulder` and `route` tables.
+
+The former path joined the grade table twice per climb while building the main table, once for
+the grade and once for the grade rating, and had to rebuild the main table whenever the grading
+system changed. The lookup arrays translate the raw grades while the aggregates are computed,
+so the main table is shared by all grading systems. The benchmark also compares
+`GradingSystem.get_closest` on the lookup arrays with the linear scan it used before, for all
+grade values of all grading systems.
+"""
+
+import random
+import sqlite3
+import time
+from collections.abc import Callable
+
+from src.custom_types import ClimbType
+from src.cython_modules.aggregates import load_aggregates
+from src.cython_modules.constants import MAX_GRADE, MIN_GRADE
+from src.cython_modules.engine import GradingSystem
+
+
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 5
+
+SYSTEMS: tuple[tuple[ClimbType, str], ...] = (
+    ("boulder", "french"),
+    ("boulder", "french_rounded"),
+    ("boulder", "v_grade"),
+    ("boulder", "british"),
+    ("route", "french"),
+    ("route", "ewbank"),
+    ("route", "uiaa"),
+    ("route", "yds"),
+)
+
+MAIN_COLUMNS = """
+    ascends.id, climbs.id, ascends.date_logged, ascends.type, climbs.gym_id, {grade}, climbs.type,
+    climbs.average_opinion, climbs.date_live_start, climbs.date_live_end, walls.name, gyms.name,
+    opinions.project, opinions.voted_renew, {grade_rating}, opinions.rating
+"""
+
+LEGACY_MAIN_QUERY = f"""
+    INSERT INTO main
+        SELECT {MAIN_COLUMNS.format(grade="grade_reference.french", grade_rating="grading_reference.french")}
+        FROM climbs
+        INNER JOIN gyms ON climbs.gym_id = gyms.id
+        LEFT JOIN ascends ON ascends.climb_id = climbs.id
+        LEFT JOIN opinions ON opinions.climb_id = climbs.id
+        INNER JOIN walls ON climbs.wall_id = walls.id
+        LEFT JOIN route AS grade_reference ON grade_reference.id = climbs.grade
+        LEFT JOIN route AS grading_reference ON grading_reference.id = opinions.grade_rating
+        WHERE climbs.type = 'route'
+            AND (ascends.date_logged IS NOT NULL
+            OR grading_reference.french IS NOT NULL
+            OR opinions.rating IS NOT NULL)
+"""
+
+MAIN_QUERY = f"""
+    INSERT INTO main
+        SELECT {MAIN_COLUMNS.format(grade="climbs.grade", grade_rating="opinions.grade_rating")}
+        FROM climbs
+        INNER JOIN gyms ON climbs.gym_id = gyms.id
+        LEFT JOIN ascends ON ascends.climb_id = climbs.id
+        LEFT JOIN opinions ON opinions.climb_id = climbs.id
+        INNER JOIN walls ON climbs.wall_id = walls.id
+        WHERE climbs.type = 'route'
+            AND (ascends.date_logged IS NOT NULL
+            OR opinions.grade_rating BETWEEN {MIN_GRADE} AND {MAX_GRADE}
+            OR opinions.rating IS NOT NULL)
+"""
+
+
+def create_tables(conn: sqlite3.Connection, nr_of_climbs: int, seed: int = 0) -> None:
+    """Creates synthetic static and user tables for a single gym with the given number of climbs
+
+    Arguments:
+        conn (sqlite3.Connection): Connection to the database
+        nr_of_climbs (int): Number of climbs of the gym
+
+    Keyword Arguments:
+        seed (int): Seed of the random generator {0}
+    """
+    rng = random.Random(seed)
+    system = GradingSystem("route", "french")
+
+    conn.execute("CREATE TABLE gyms (id, name)")
+    conn.execute("CREATE TABLE walls (id, name)")
+    conn.execute(
+        "CREATE TABLE climbs (id, gym_id, wall_id, grade, type, average_opinion, date_live_start, date_live_end)"
+    )
+    conn.execute("CREATE TABLE ascends (id, climb_id, date_logged, type)")
+    conn.execute("CREATE TABLE opinions (climb_id, project, voted_renew, grade_rating, rating)")
+    conn.execute("CREATE TABLE route (id, french)")
+    conn.execute(
+        """
+        CREATE TABLE main (
+            id, climb_id, date_logged, ascend_type, gym_id, grade, climb_type, average_opinion,
+            date_live_start, date_live_end, wall_name, gym_name, project, voted_renew, grade_rating, rating
+        )
+        """
+    )
+    conn.execute('CREATE UNIQUE INDEX "route_index" ON "route" ("id" ASC)')
+
+    conn.execute("INSERT INTO gyms VALUES (1, 'Synthetic gym')")
+    conn.executemany("INSERT INTO walls VALUES (?, ?)", [(i, f"Wall {i}") for i in range(25)])
+    conn.executemany(
+        "INSERT INTO route VALUES (?, ?)", [(i, system.indices[i]) for i in range(MIN_GRADE, MAX_GRADE + 1)]
+    )
+
+    climbs, ascends, opinions = [], [], []
+    for i in range(nr_of_climbs):
+        climbs.append(
+            (i, 1, rng.randrange(25), rng.randrange(MIN_GRADE, 900), "route", rng.uniform(1, 5), "2020-09-01", None)
+        )
+        if rng.random() < 0.9:
+            ascends.append(
+                (
+                    i,
+                    i,
+                    f"202{rng.randrange(5)}-0{rng.randrange(1, 10)}-15 12:00:00",
+                    rng.choice(("Onsight", "Flash", "Redpoint")),
+                )
+            )
+        if rng.random() < 0.3:
+            opinions.append((i, 0, 0, rng.randrange(MIN_GRADE, 900), rng.randrange(1, 6)))
+
+    conn.executemany("INSERT INTO climbs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", climbs)
+    conn.executemany("INSERT INTO ascends VALUES (?, ?, ?, ?)", ascends)
+    conn.executemany("INSERT INTO opinions VALUES (?, ?, ?, ?, ?)", opinions)
+    conn.commit()
+
+
+def build_legacy(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM main")
+    conn.execute(LEGACY_MAIN_QUERY)
+
+
+def build_lookup(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM main")
+    conn.execute(MAIN_QUERY)
+
+
+def run_legacy(conn: sqlite3.Connection, identity: tuple[int, ...]) -> None:
+    # Switching the grading system rebuilds the main table, its grades are already translated
+    build_legacy(conn)
+    load_aggregates(conn.cursor(), "route", (1,), identity)
+
+
+def run_lookup(conn: sqlite3.Connection, indices: tuple[int | None, ...]) -> None:
+    # The main table does not depend on the grading system, only the lookup array changes
+    load_aggregates(conn.cursor(), "route", (1,), indices)
+
+
+def closest_linear(system: GradingSystem, item: int) -> int:
+    return min(range(len(system.integers)), key=lambda i: abs(system.integers[i] - item))
+
+
+def run_linear(systems: list[GradingSystem]) -> None:
+    for system in systems:
+        for grade in range(MIN_GRADE, MAX_GRADE + 1):
+            closest_linear(system, grade)
+
+
+def run_array(systems: list[GradingSystem]) -> None:
+    for system in systems:
+        for grade in range(MIN_GRADE, MAX_GRADE + 1):
+            system.get_closest(grade)
+
+
+def best_of(function: Callable[..., object], *args: object) -> float:
+    """Returns the best wall time of the function in milliseconds out of REPEATS runs"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    system = GradingSystem("route", "french")
+    identity = tuple(range(MAX_GRADE + 1))
+
+    print("Build the main table")
+    print(f"{'climbs':>10} {'sql join (ms)':>14} {'raw grades (ms)':>16} {'speedup':>8}")
+    for size in SIZES:
+        with sqlite3.connect(":memory:") as conn:
+            create_tables(conn, size)
+
+            legacy = best_of(build_legacy, conn)
+            lookup = best_of(build_lookup, conn)
+
+        print(f"{size:>10} {legacy:>14.1f} {lookup:>16.1f} {legacy / lookup:>7.1f}x")
+
+    print()
+    print("Show a dashboard after switching the grading system")
+    print(f"{'climbs':>10} {'sql join (ms)':>14} {'lookup (ms)':>12} {'speedup':>8}")
+    for size in SIZES:
+        with sqlite3.connect(":memory:") as conn:
+            create_tables(conn, size)
+
+            legacy = best_of(run_legacy, conn, identity)
+            build_lookup(conn)
+            lookup = best_of(run_lookup, conn, system.indices)
+
+        print(f"{size:>10} {legacy:>14.1f} {lookup:>12.1f} {legacy / lookup:>7.1f}x")
+
+    systems = [GradingSystem(climb_type, grading_system) for climb_type, grading_system in SYSTEMS]
+    linear = best_of(run_linear, systems)
+    array = best_of(run_array, systems)
+
+    print()
+    print(f"Translate grades {MIN_GRADE}-{MAX_GRADE} for all {len(systems)} grading systems")
+    print(f"{'linear (ms)':>12} {'array (ms)':>11} {'speedup':>8}")
+    print(f"{linear:>12.1f} {array:>11.1f} {linear / array:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Load test of the user refreshes under 50 concurrent users, against the local TopLogger stub.
+
+Every user opens a dashboard and, as the frontend does, sends a preload for the same dashboard
+at the same time. The former path serialized every refresh of the process on one shared loop.
+The fetch executor runs them concurrently on its loop thread and coalesces the identical
+dashboard and preload fetches into one upstream call.
+"""
+
+import os
+import statistics
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier, Lock
+
+from benchmarks.stub_server import StubServer
+
+
+PORT = 8766
+LATENCY = 0.05
+NR_OF_USERS = 50
+ROUNDS = 4
+
+# The fetch layer reads its base url and limits when it is imported
+os.environ["TOPLOGGER_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["TOPLOGGER_MAX_CONNECTIONS_PER_HOST"] = "32"
+os.environ["TOPLOGGER_RATE_LIMIT"] = "0"
+
+from src.cython_modules import api  # noqa: E402
+
+
+legacy_lock = Lock()
+
+
+def refresh_legacy(uid: int) -> object:
+    # One refresh at a time per process, as with the shared loop and its busy-wait
+    with legacy_lock:
+        return api.run(api.async_fetch_user_data(uid, {1, 2}, set(), "boulder"))
+
+
+def refresh_executor(uid: int) -> object:
+    return api.fetch_user_data(uid, {1, 2}, set(), "boulder").result()
+
+
+def load(refresh: Callable[[int], object]) -> list[float]:
+    """Lets every user send a dashboard request and a preload at once, returns the latencies in ms"""
+    latencies: list[float] = []
+    barrier = Barrier(NR_OF_USERS * 2)
+
+    def request(uid: int) -> None:
+        barrier.wait()
+        start = time.perf_counter()
+        refresh(uid)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(NR_OF_USERS * 2) as pool:
+        for _ in range(ROUNDS):
+            list(pool.map(request, [uid for uid in range(NR_OF_USERS) for _ in range(2)]))
+
+    return latencies
+
+
+def percentile(latencies: list[float], q: int) -> float:
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1]
+
+
+def main() -> None:
+    with StubServer(PORT, LATENCY) as server:
+        print(
+            f"{NR_OF_USERS} users, each with a dashboard request and a preload, the stub answers after {LATENCY * 1000:.0f} ms"
+        )
+        print(f"{'path':>16} {'p50 (ms)':>9} {'p99 (ms)':>9} {'upstream calls':>15}")
+
+        for label, refresh in (("shared loop", refresh_legacy), ("fetch executor", refresh_executor)):
+            server.reset()
+            latencies = load(refresh)
+            print(
+                f"{label:>16} {percentile(latencies, 50):>9.0f} {percentile(latencies, 99):>9.0f} "
+                f"{server.requests:>15}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Compares the nightly ingest of the static database through the per-call helpers and through
+the static data writer, while a reader queries the database like the web tier does.
+
+The helpers open a connection, upsert and commit for every 3-gym slice, and a second time to
+bump the gym versions, on a database in the default rollback journal mode. The writer keeps one
+connection in WAL mode, stages the slices and merges them with one upsert per table.
+
+The nightly runs after the first fetch mostly the same climbs again. The writer skips the gyms with
+an unchanged digest and the climbs with an unchanged hash, which the second part compares by the
+rows written and skipped and the peak size of the WAL for an unchanged night and a night that
+changed a few percent of the climbs.
+"""
+
+import gc
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from threading import Event, Thread
+
+# The helpers write to the static database of the constants, which is created in a directory of its own
+DATA_DIRECTORY = tempfile.TemporaryDirectory(prefix="static-writer-")
+os.environ["DATA_DIRECTORY"] = DATA_DIRECTORY.name
+
+from scripts.create_databases import create_data_db  # noqa: E402
+from src import database  # noqa: E402
+from src.cython_modules.constants import DATA_DB  # noqa: E402
+
+
+NR_OF_GYMS = 60
+CLIMBS_PER_GYM = 5_000
+GYMS_PER_SLICE = 3
+CHANGED_FRACTION = 0.02
+
+
+def climbs(gym_ids: list[int]) -> list[tuple]:
+    rows = []
+    for gym_id in gym_ids:
+        rng = random.Random(gym_id)
+        for i in range(CLIMBS_PER_GYM):
+            rows.append(
+                (
+                    gym_id * 100_000 + i,
+                    gym_id,
+                    "boulder" if i % 2 else "route",
+                    "2024-01-01",
+                    None,
+                    gym_id * 1000 + rng.randrange(20),
+                    rng.randrange(200, 1000),
+                    1,
+                    rng.random(),
+                    rng.randrange(100),
+                    rng.uniform(1, 5),
+                )
+            )
+    return rows
+
+
+# The rows are generated up front, so only the database work is measured
+SLICES = [
+    (gym_ids, climbs(gym_ids))
+    for gym_ids in (list(range(start, start + GYMS_PER_SLICE)) for start in range(1, NR_OF_GYMS + 1, GYMS_PER_SLICE))
+]
+
+
+def ingest_helpers(path: str) -> None:
+    for gym_ids, rows in SLICES:
+        database.add_climbs(rows)
+        database.bump_gym_versions(gym_ids)
+
+
+def ingest_writer(path: str) -> None:
+    with database.StaticDataWriter(path) as writer:
+        for _, rows in SLICES:
+            writer.add_climbs(rows)
+            writer.flush()
+
+
+def read(path: str, stop: Event, latencies: list[float]) -> None:
+    """Looks up random climbs until stopped, records the latencies in ms"""
+    rng = random.Random(0)
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30) as conn:
+        while not stop.is_set():
+            start = time.perf_counter()
+            conn.execute("SELECT * FROM climbs WHERE id = ?", (rng.randrange(1, NR_OF_GYMS + 1) * 100_000,)).fetchall()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+def seed(path: str) -> None:
+    """Adds one climb per gym, so the reader has data from the start"""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO climbs (id, gym_id, grade) VALUES (?, ?, 500)",
+            [(gym_id * 100_000, gym_id) for gym_id in range(1, NR_OF_GYMS + 1)],
+        )
+
+
+def run(ingest: Callable[[str], None], wal: bool) -> tuple[float, float, float]:
+    """Returns the rows per second of the ingest and the p99 and max latency of the reader in ms"""
+    path = DATA_DB
+    try:
+        create_data_db(path)
+        if not wal:
+            # The journal mode can only be left with no other connection open
+            gc.collect()
+            with sqlite3.connect(path) as conn:
+                conn.execute("PRAGMA journal_mode = DELETE")
+
+        seed(path)
+
+        stop = Event()
+        latencies: list[float] = []
+        reader = Thread(target=read, args=(path, stop, latencies))
+        reader.start()
+
+        start = time.perf_counter()
+        ingest(path)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        reader.join()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return NR_OF_GYMS * CLIMBS_PER_GYM / elapsed, quantiles[98], max(latencies)
+
+
+def changed(rows: list[tuple], seed: int) -> list[tuple]:
+    """Returns the rows with another number of ascends for a fraction of them, like a day at the gyms"""
+    rng = random.Random(seed)
+    return [row[:9] + (row[9] + 1,) + row[10:] if rng.random() < CHANGED_FRACTION else row for row in rows]
+
+
+def night(path: str, slices: list[list[tuple]]) -> tuple[int, int, float, int]:
+    """Ingests the slices with the writer
+
+    Returns:
+        tuple: The rows written and skipped, the seconds and the peak size of the WAL in bytes
+    """
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    start = time.perf_counter()
+    with database.StaticDataWriter(path) as writer:
+        for rows in slices:
+            writer.add_climbs(rows)
+            writer.flush()
+
+    return writer.rows, writer.skipped, time.perf_counter() - start, os.path.getsize(f"{path}-wal")
+
+
+def nights() -> None:
+    print(f"{'night':>28} {'written':>9} {'skipped':>9} {'seconds':>8} {'WAL peak (KiB)':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.db")
+        create_data_db(path)
+
+        for label, slices in (
+            ("first", [rows for _, rows in SLICES]),
+            ("unchanged", [rows for _, rows in SLICES]),
+            (f"{CHANGED_FRACTION:.0%} of the climbs changed", [changed(rows, i) for i, (_, rows) in enumerate(SLICES)]),
+        ):
+            written, skipped, seconds, wal = night(path, slices)
+            print(f"{label:>28} {written:>9} {skipped:>9} {seconds:>8.2f} {wal / 1024:>15.0f}")
+
+
+def main() -> None:
+    with DATA_DIRECTORY:
+        compare()
+
+
+def compare() -> None:
+    print(f"Ingesting {NR_OF_GYMS} gyms with {CLIMBS_PER_GYM} climbs, {GYMS_PER_SLICE} gyms per slice")
+    print(f"{'path':>28} {'rows/s':>9} {'reader p99 (ms)':>16} {'reader max (ms)':>16}")
+
+    for label, ingest, wal in (
+        ("helpers, rollback journal", ingest_helpers, False),
+        ("static data writer", ingest_writer, True),
+    ):
+        rows_per_second, p99, worst = run(ingest, wal)
+        print(f"{label:>28} {rows_per_second:>9.0f} {p99:>16.2f} {worst:>16.2f}")
+
+    print()
+    nights()
+
+
+if __name__ == "__main__":
+    main()
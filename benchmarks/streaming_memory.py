@@ -0,0 +1,108 @@
+"""
+Compares the peak memory of fetching and storing a gym with 200k climbs, buffered and streamed.
+
+The buffered path decodes the whole response into a list of dicts and converts it to a second
+list of tuples before it is written. The streamed path parses the response while it arrives and
+feeds the converted climbs to executemany in chunks. The stub server runs in a separate process,
+so only the memory of the fetch is traced.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+from itertools import chain
+
+import httpx
+
+
+PORT = 8768
+NR_OF_CLIMBS = 200_000
+CHUNK_SIZES = (1_000, 5_000, 20_000)
+
+# The fetch layer reads its base url when it is imported
+os.environ["TOPLOGGER_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+
+from src.custom_types import ClimbsJson  # noqa: E402
+from src.cython_modules import api  # noqa: E402
+
+
+INSERT_CLIMBS_QUERY = "INSERT INTO climbs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def store(rows: Iterable[ClimbsJson]) -> None:
+    with sqlite3.connect(":memory:") as conn:
+        conn.execute(
+            "CREATE TABLE climbs (id, gym_id, type, start, end, wall_id, grade, auto, stability, ascends, opinion)"
+        )
+        conn.executemany(INSERT_CLIMBS_QUERY, rows)
+        conn.commit()
+
+
+def run_buffered() -> None:
+    store(api.fetch_climbs({1}))
+
+
+def run_streamed(chunk_size: int) -> None:
+    store(chain.from_iterable(api.fetch_climbs_streamed({1}, False, chunk_size)))
+
+
+def traced(function: Callable[..., None], *args: object) -> tuple[float, float]:
+    """Returns the peak traced memory in MiB and the wall time in seconds of the function"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed
+
+
+def wait_for_server() -> None:
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/v1/gyms.json")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("The stub server did not start")
+
+
+def main() -> None:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.stub_server",
+            "--port",
+            str(PORT),
+            "--latency",
+            "0",
+            "--climbs-per-gym",
+            str(NR_OF_CLIMBS),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server()
+
+        print(f"Fetching and storing a gym with {NR_OF_CLIMBS} climbs")
+        print(f"{'path':>26} {'peak (MiB)':>11} {'seconds':>8}")
+
+        peak, elapsed = traced(run_buffered)
+        print(f"{'buffered':>26} {peak:>11.1f} {elapsed:>8.2f}")
+
+        for chunk_size in CHUNK_SIZES:
+            peak, elapsed = traced(run_streamed, chunk_size)
+            label = f"streamed, {chunk_size} per chunk"
+            print(f"{label:>26} {peak:>11.1f} {elapsed:>8.2f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+A local stand-in for the TopLogger API, so the fetch layer can be exercised without hitting TopLogger.
+
+The server answers the endpoints the application uses with deterministic synthetic data after a
+configurable latency. It records the number of requests and the peak number of requests in flight.
+
+Run it on its own and point the application at it with the TOPLOGGER_BASE_URL environment variable:
+
+    python -m benchmarks.stub_server --port 8765 --latency 0.05
+    TOPLOGGER_BASE_URL=http://127.0.0.1:8765 flask --app src.main run
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+
+
+ROUTES = (
+    (re.compile(r"^/v1/gyms\.json$"), "gyms"),
+    (re.compile(r"^/v1/gyms/(\d+)/walls\.json$"), "walls"),
+    (re.compile(r"^/v1/gyms/(\d+)/climbs\.json$"), "climbs"),
+    (re.compile(r"^/v1/gyms/(\d+)/ranked_gym_users\.json$"), "users"),
+    (re.compile(r"^/v1/ascends\.json$"), "ascends"),
+    (re.compile(r"^/v1/opinions\.json$"), "opinions"),
+)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StubData:
+    """Generates the synthetic responses of the stub server
+
+    The ascends and opinions are filtered on the time they were updated and paginated, when the
+    request asks for it.
+
+    Attributes:
+        nr_of_gyms (int): Number of gyms
+        climbs_per_gym (int): Number of climbs per gym
+        walls_per_gym (int): Number of walls per gym
+        recent_per_gym (int): Number of ascends and opinions per gym that were updated when the data was created
+    """
+
+    def __init__(
+        self, nr_of_gyms: int = 50, climbs_per_gym: int = 250, walls_per_gym: int = 20, recent_per_gym: int = 0
+    ) -> None:
+        self.nr_of_gyms = nr_of_gyms
+        self.climbs_per_gym = climbs_per_gym
+        self.walls_per_gym = walls_per_gym
+        self.recent_per_gym = recent_per_gym
+        self.created = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+    def gyms(self) -> list[dict]:
+        return [
+            {
+                "id": gym_id,
+                "name": f"Gym {gym_id}",
+                "id_name": f"gym-{gym_id}",
+                "nr_of_climbs": self.climbs_per_gym,
+                "nr_of_boulders": self.climbs_per_gym // 2,
+                "nr_of_routes": self.climbs_per_gym - self.climbs_per_gym // 2,
+                "country": "NL",
+            }
+            for gym_id in range(1, self.nr_of_gyms + 1)
+        ]
+
+    def walls(self, gym_id: int) -> list[dict]:
+        return [{"id": gym_id * 1000 + i, "name": f"Wall {i}", "gym_id": gym_id} for i in range(self.walls_per_gym)]
+
+    def climbs(self, gym_id: int) -> list[dict]:
+        rng = random.Random(gym_id)
+        return [
+            {
+                "id": gym_id * 100_000 + i,
+                "gym_id": gym_id,
+                "climb_type": "boulder" if i % 2 else "route",
+                "date_live_start": "2024-01-01T10:00:00.000+01:00",
+                "date_live_end": "",
+                "wall_id": gym_id * 1000 + rng.randrange(self.walls_per_gym),
+                "grade": f"{rng.uniform(4, 8):.2f}",
+                "auto_grade": True,
+                "grade_stability": rng.random(),
+                "nr_of_ascends": rng.randrange(100),
+                "average_opinion": rng.uniform(1, 5),
+            }
+            for i in range(self.climbs_per_gym)
+        ]
+
+    def users(self, gym_id: int) -> list[dict]:
+        return [{"uid": gym_id * 1000 + i, "full_name": f" Climber {i} "} for i in range(100)]
+
+    def updated_at(self, i: int, date: str) -> str:
+        """The last climbs of a gym were updated recently, the others when they were logged"""
+        return self.created if i >= self.climbs_per_gym - self.recent_per_gym else date
+
+    def ascends(self, filters: dict) -> list[dict]:
+        rng = random.Random(filters.get("user", {}).get("uid", 0))
+        ascends = []
+        for gym_id in filters.get("climb", {}).get("gym_id", []):
+            for i in range(0, self.climbs_per_gym, 3):
+                date = f"2024-0{rng.randrange(1, 10)}-15T12:00:00.000+01:00"
+                ascends.append(
+                    {
+                        "id": gym_id * 100_000 + i,
+                        "climb_id": gym_id * 100_000 + i,
+                        "date_logged": date,
+                        "updated_at": self.updated_at(i, date),
+                        "checks": rng.randrange(1, 4),
+                    }
+                )
+        return ascends
+
+    def opinions(self, filters: dict) -> list[dict]:
+        rng = random.Random(filters.get("user", {}).get("uid", 0))
+        return [
+            {
+                "id": gym_id * 100_000 + i,
+                "climb_id": gym_id * 100_000 + i,
+                "updated_at": self.updated_at(i, "2024-01-15T12:00:00.000+01:00"),
+                "project": False,
+                "voted_renew": False,
+                "grade": f"{rng.uniform(4, 8):.2f}",
+                "rating": rng.randrange(1, 6),
+            }
+            for gym_id in filters.get("climb", {}).get("gym_id", [])
+            for i in range(0, self.climbs_per_gym, 7)
+        ]
+
+
+def filter_updated(records: list[dict], filters: dict) -> list[dict]:
+    """Keeps the records that were updated at or after the gte of the updated_at filter, if any"""
+    since = filters.get("updated_at", {}).get("gte")
+    if since is None:
+        return records
+
+    since_time = datetime.fromisoformat(since)
+    return [r for r in records if datetime.fromisoformat(r["updated_at"]) >= since_time]
+
+
+def paginate(records: list[dict], query: dict[str, list[str]]) -> list[dict]:
+    """Returns the requested page of the records, or every record if no page is requested"""
+    if "page" not in query:
+        return records
+
+    size = int(query.get("per_page", ["25"])[0])
+    start = (int(query["page"][0]) - 1) * size
+    return records[start : start + size]
+
+
+class StubServer:
+    """Serves the synthetic TopLogger API on a background thread
+
+    Use it as a context manager, the url of the server is available as the url attribute.
+
+    Attributes:
+        latency (float): Seconds every response is delayed
+        data (StubData): The data of the server
+        requests (int): Number of requests handled
+        max_in_flight (int): Peak number of requests handled at the same time
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.05, data: StubData | None = None) -> None:
+        self.latency = latency
+        self.data = data or StubData()
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = Lock()
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.max_in_flight = 0
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, path: str) -> tuple[int, object]:
+        """Returns the status and the body of the response to the path"""
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        filters = json.loads(query.get("json_params", ["{}"])[0]).get("filters", {})
+
+        for pattern, name in ROUTES:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            if name in ("ascends", "opinions"):
+                return 200, paginate(filter_updated(getattr(self.data, name)(filters), filters), query)
+            return 200, getattr(self.data, name)(*map(int, match.groups()))
+
+        return 404, {"error": "not found"}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                with stub._lock:
+                    stub.requests += 1
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+
+                try:
+                    time.sleep(stub.latency)
+                    status, body = stub.respond(self.path)
+                    payload = json.dumps(body).encode()
+
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+            def log_message(self, *_: object) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every response is delayed")
+    parser.add_argument("--climbs-per-gym", type=int, default=250)
+    args = parser.parse_args()
+
+    with StubServer(args.port, args.latency, StubData(climbs_per_gym=args.climbs_per_gym)) as server:
+        print(f"Serving the TopLogger stub on {server.url}, press Ctrl+C to stop")
+        try:
+            server._thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+End-to-end benchmark suite, on generated databases and against the local TopLogger stub.
+
+The suite generates the databases at the selected scale, starts the stub and times the refresh of
+the user data, the rebuild of the main table, the aggregates, every statistic and visualization,
+the minification and the full Flask requests of a dashboard and its chart data. Every benchmark
+is run a number of times after a warm-up, and the median, minimum and maximum in milliseconds are
+written as JSON. With --compare, the medians are compared with an earlier result and the exit code
+is 1 when one of them regressed by more than the threshold and the floor.
+
+    python -m benchmarks.suite [--scale small|medium|large] [--repeats 10] [--latency 0.0]
+        [--output bench_results.json] [--compare baseline.json] [--threshold 0.2] [--floor 0.05]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from shutil import copyfile
+from typing import Any
+from unittest import mock
+
+PORT = 8770
+
+# The fetch layer and the app read their configuration when they are imported, the databases are
+# generated in the data directory of the app
+DATA_DIRECTORY = tempfile.TemporaryDirectory(prefix="bench-")
+os.environ["DATA_DIRECTORY"] = DATA_DIRECTORY.name
+os.environ["TOPLOGGER_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["TOPLOGGER_RATE_LIMIT"] = "0"
+os.environ["BACKGROUND_REFRESH"] = "0"
+os.environ.pop("PROD", None)
+
+from benchmarks.generator import Dataset, Scale, age_sync_state, generate  # noqa: E402
+from benchmarks.stub_server import StubData, StubServer  # noqa: E402
+from src import database  # noqa: E402
+from src.custom_types import ClimbType  # noqa: E402
+from src.cython_modules import statistics_processor, visualizations  # noqa: E402
+from src.cython_modules.aggregates import Aggregates, load_aggregates  # noqa: E402
+from src.cython_modules.engine import GradingSystem, update_user_data  # noqa: E402
+from src.cython_modules.utils import minify  # noqa: E402
+
+
+SCALES = {
+    "small": Scale(nr_of_gyms=5, climbs_per_gym=500, nr_of_users=3, ascends_per_user=300),
+    "medium": Scale(nr_of_gyms=20, climbs_per_gym=2000, nr_of_users=5, ascends_per_user=1500),
+    "large": Scale(nr_of_gyms=50, climbs_per_gym=6000, nr_of_users=5, ascends_per_user=6000),
+}
+
+CLIMB_TYPE: ClimbType = "boulder"
+GRADING_SYSTEM = "french"
+DAY = 86400
+
+# The statistics of the dashboard, the helpers they share are timed as part of them. The statistics
+# per wall are only shown on the dashboard of a single gym, they are timed with the aggregates of one
+STATISTICS = (
+    "top_grade",
+    "number_of_ascends",
+    "flash_rate",
+    "max_grade_over_time",
+    "ascends_over_time",
+    "ascends_per_grade",
+    "flash_rate_per_grade",
+    "grading_accuracy",
+    "rating_accuracy",
+    "number_of_ascends_per_wall",
+    "number_of_ascends_per_gym",
+    "max_grade_per_wall",
+    "max_grade_per_gym",
+    "flash_rate_per_wall",
+    "flash_rate_per_gym",
+    "rating_per_ascends_type",
+    "rating_per_wall",
+    "rating_per_gym",
+)
+
+
+class Suite:
+    """Runs the benchmarks and collects their timings
+
+    Attributes:
+        repeats (int): Timed runs per benchmark
+        results (dict): The timings per benchmark
+    """
+
+    def __init__(self, repeats: int) -> None:
+        self.repeats = repeats
+        self.results: dict[str, dict[str, float]] = {}
+
+    def measure(self, name: str, function: Callable[[], object], setup: Callable[[], object] | None = None) -> None:
+        """Times the function after a warm-up run, the setup runs before every run and is not timed"""
+        timings = []
+        for run in range(self.repeats + 1):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            if run:
+                timings.append((time.perf_counter() - start) * 1000)
+
+        self.results[name] = {
+            "median_ms": round(statistics.median(timings), 4),
+            "min_ms": round(min(timings), 4),
+            "max_ms": round(max(timings), 4),
+            "runs": len(timings),
+        }
+        print(f"{name:>48} {self.results[name]['median_ms']:>12.3f} {self.results[name]['min_ms']:>12.3f}")
+
+
+class Recorder:
+    """Stands in for a module and records the arguments of the first call of every function"""
+
+    def __init__(self, module: Any) -> None:
+        self.module = module
+        self.calls: dict[str, tuple[tuple, dict]] = {}
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        function = getattr(self.module, name)
+
+        def record(*args: Any, **kwargs: Any) -> Any:
+            self.calls.setdefault(name, (args, kwargs))
+            return function(*args, **kwargs)
+
+        return record
+
+
+def bench_user_data(suite: Suite, dataset: Dataset) -> None:
+    uid = dataset.uids[0]
+    new_uid = dataset.uids.stop + 1000
+    gyms = dataset.scale.user_gyms(uid)
+
+    def new_user() -> None:
+        with sqlite3.connect(dataset.user_db(new_uid)) as conn:
+            update_user_data(conn, new_uid, CLIMB_TYPE, gyms, True)
+
+    def reset_new_user() -> None:
+        copyfile(dataset.default_user_db, dataset.user_db(new_uid))
+        with sqlite3.connect(dataset.update_db) as conn:
+            conn.execute("DELETE FROM user_sync_state WHERE uid = ?", (new_uid,))
+            conn.commit()
+
+    def returning_user() -> None:
+        with sqlite3.connect(dataset.user_db(uid)) as conn:
+            update_user_data(conn, uid, CLIMB_TYPE, gyms, False)
+
+    suite.measure("update_user_data.new_user", new_user, reset_new_user)
+    suite.measure("update_user_data.delta", returning_user, lambda: age_sync_state(dataset, uid, DAY))
+    suite.measure("update_user_data.fresh", returning_user)
+
+    # The other benchmarks read the data of the user as generated
+    age_sync_state(dataset, uid, 0)
+
+
+def bench_main_table(suite: Suite, dataset: Dataset) -> tuple[Aggregates, Aggregates]:
+    uid = dataset.uids[-1]
+    gyms = dataset.scale.user_gyms(uid)
+    system = GradingSystem(CLIMB_TYPE, GRADING_SYSTEM)
+
+    with sqlite3.connect(dataset.user_db(uid)) as conn:
+        suite.measure(
+            "enrich_user_table_and_get_ascends.rebuild",
+            lambda: database.enrich_user_table_and_get_ascends(conn, CLIMB_TYPE, gyms),
+            lambda: database.bump_user_versions(conn, gyms),
+        )
+        suite.measure(
+            "enrich_user_table_and_get_ascends.up_to_date",
+            lambda: database.enrich_user_table_and_get_ascends(conn, CLIMB_TYPE, gyms),
+        )
+        suite.measure("load_aggregates", lambda: load_aggregates(conn.cursor(), CLIMB_TYPE, gyms, system.indices))
+        return (
+            load_aggregates(conn.cursor(), CLIMB_TYPE, gyms, system.indices),
+            load_aggregates(conn.cursor(), CLIMB_TYPE, gyms[:1], system.indices),
+        )
+
+
+def bench_statistics(suite: Suite, aggregates: Aggregates, gym_aggregates: Aggregates) -> None:
+    system = GradingSystem(CLIMB_TYPE, GRADING_SYSTEM)
+
+    def arguments(name: str) -> tuple[Aggregates, GradingSystem]:
+        return (gym_aggregates if name.endswith("_per_wall") else aggregates), system
+
+    for name in STATISTICS:
+        function, args = getattr(statistics_processor, name), arguments(name)
+        suite.measure(f"statistics_processor.{name}", lambda: function(*args))
+
+    # The visualizations are timed with the arguments the statistics pass them
+    recorder = Recorder(visualizations)
+    with mock.patch.object(statistics_processor, "vis", recorder):
+        for name in STATISTICS:
+            getattr(statistics_processor, name)(*arguments(name))
+
+    for name, (args, kwargs) in sorted(recorder.calls.items()):
+        function = getattr(visualizations, name)
+        suite.measure(f"visualizations.{name}", lambda: function(*args, **kwargs))
+
+
+def bench_requests(suite: Suite, dataset: Dataset) -> None:
+    from src import main
+
+    uid = dataset.uids[-1]
+    gyms = ",".join(map(str, dataset.scale.user_gyms(uid)))
+    client = main.app.test_client()
+    cookies = {"climb_type": CLIMB_TYPE, "grading_system": GRADING_SYSTEM, "gyms": gyms, "name": "Bench"}
+    for name, value in cookies.items():
+        client.set_cookie(name, value)
+
+    def get(url: str) -> Callable[[], None]:
+        def request() -> None:
+            response = client.get(url)
+            response.get_data()
+            response.close()
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} answered {response.status_code}")
+
+        return request
+
+    with mock.patch.dict(main.app.config, DASHBOARD_CHARTS="api"):
+        suite.measure("flask.dashboard", get(f"/{uid}"))
+        suite.measure(
+            "flask.visuals_api",
+            get(f"/api/visuals/{uid}?climb_type={CLIMB_TYPE}&grading_system={GRADING_SYSTEM}&gyms={gyms}"),
+        )
+        suite.measure("flask.dashboard.refresh", get(f"/{uid}"), lambda: age_sync_state(dataset, uid, DAY))
+        age_sync_state(dataset, uid, 0)
+
+    with mock.patch.dict(main.app.config, DASHBOARD_CHARTS="inline"):
+        suite.measure("flask.dashboard.inline", get(f"/{uid}"))
+
+        # The page as it is minified when it is not streamed
+        with mock.patch.dict(main.app.config, STREAM_DASHBOARD=False):
+            with mock.patch.object(main, "minify", wraps=minify) as minify_page:
+                get(f"/{uid}")()
+        # The first page, the dashboards of the gyms are rendered and minified after it
+        page = minify_page.call_args_list[0].args[0]
+
+    suite.measure("minify.dashboard", lambda: minify(page))
+
+
+def compare(
+    results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], threshold: float, floor: float
+) -> int:
+    """Prints the change of the medians against the baseline. A benchmark regressed when its median grew by
+    more than the threshold and by more than the floor in milliseconds, below which the changes are noise.
+
+    Returns:
+        int: Number of benchmarks that regressed by more than the threshold
+    """
+    regressions = 0
+    print(f"\n{'benchmark':>48} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        before, now = baseline[name]["median_ms"], result["median_ms"]
+        change = now / before - 1 if before else 0.0
+        regressed = change > threshold and now - before > floor
+        regressions += regressed
+        print(f"{name:>48} {before:>12.3f} {now:>12.3f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub waits before it answers")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier result to compare the medians with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change of a median that regresses")
+    parser.add_argument("--floor", type=float, default=0.05, help="milliseconds a median must grow to regress")
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    suite = Suite(args.repeats)
+    data = StubData(nr_of_gyms=scale.nr_of_gyms, climbs_per_gym=scale.climbs_per_gym, walls_per_gym=scale.walls_per_gym)
+
+    with DATA_DIRECTORY as directory, StubServer(PORT, args.latency, data):
+        dataset = generate(directory, scale)
+
+        print(f"{'benchmark':>48} {'median (ms)':>12} {'min (ms)':>12}")
+        bench_user_data(suite, dataset)
+        bench_statistics(suite, *bench_main_table(suite, dataset))
+        bench_requests(suite, dataset)
+
+    output = {
+        "meta": {
+            "scale": args.scale,
+            "size": scale.as_dict(),
+            "repeats": args.repeats,
+            "latency": args.latency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": suite.results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"\nWrote {len(suite.results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline["meta"]["size"] != output["meta"]["size"]:
+            print("The baseline was measured at another scale, the medians are not comparable")
+            sys.exit(2)
+        sys.exit(1 if compare(suite.results, baseline["results"], args.threshold, args.floor) else 0)
+
+
+if __name__ == "__main__":
+    main()
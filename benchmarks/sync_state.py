@@ -0,0 +1,183 @@
+"""
+Compares the lookup of the gyms to refresh on the log of user updates and on the sync state,
+with a log of 10 million historical updates.
+
+The log is queried like the engine did, with the max of the updates of every requested gym,
+once without an index, as it was deployed, and once with the covering index. The log is then
+compacted into the sync state, which is queried with the lookup of the engine. The recording of
+a refresh is measured as an append to the log and as an upsert of the sync state.
+
+    python -m benchmarks.sync_state [--rows 10000000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+
+# The database module reads the paths of the databases when it is imported, the log is created in a
+# directory of its own
+DATA_DIRECTORY = tempfile.TemporaryDirectory(prefix="sync-state-")
+os.environ["DATA_DIRECTORY"] = DATA_DIRECTORY.name
+
+from scripts.compact_user_updates import compact_user_updates  # noqa: E402
+from src import database  # noqa: E402
+from src.cython_modules.constants import UPDATE_DB  # noqa: E402
+
+
+NR_OF_USERS = 100_000
+NR_OF_GYMS = 50
+GYMS_PER_REQUEST = 3
+YEAR = 365 * 86400
+
+LOG_QUERY = """
+    WITH requested_gyms AS (
+        {gym_ids_union}
+    )
+    SELECT
+        rg.gym_id,
+        CASE
+            WHEN MAX(uu.update_timestamp) IS NULL THEN 1
+            WHEN MAX(uu.update_timestamp) < strftime('%s','now') - 604800 THEN 1
+            WHEN MAX(uu.update_timestamp) < strftime('%s','now') - 43200 THEN 0
+        END AS update_size
+    FROM requested_gyms rg
+    LEFT JOIN user_updates uu
+        ON rg.gym_id = uu.gym_id AND uu.uid = ? AND uu.type = ?
+    GROUP BY rg.gym_id
+    HAVING update_size IS NOT NULL;
+"""
+
+
+def create_log(path: str, rows: int) -> None:
+    """Creates the log of user updates as it was deployed, with a year of synthetic updates"""
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE user_updates (
+                update_timestamp UNSIGNED INTEGER,
+                type TEXT,
+                gym_id INTEGER,
+                uid INTEGER
+            )
+            """
+        )
+        # Deterministic, spread over the users, gyms and the past year
+        conn.execute(
+            """
+            WITH RECURSIVE n (i) AS (
+                SELECT 0
+                UNION ALL
+                SELECT i + 1 FROM n WHERE i < ? - 1
+            )
+            INSERT INTO user_updates
+            SELECT
+                strftime('%s','now') - (i * 2654435761) % ?,
+                CASE WHEN i % 3 THEN 'boulder' ELSE 'route' END,
+                1 + (i * 7919) % ?,
+                (i * 104729) % ?
+            FROM n
+            """,
+            (rows, YEAR, NR_OF_GYMS, NR_OF_USERS),
+        )
+        conn.commit()
+
+
+def requests(n: int) -> list[tuple[int, tuple[int, ...]]]:
+    rng = random.Random(0)
+    return [
+        (rng.randrange(NR_OF_USERS), tuple(rng.sample(range(1, NR_OF_GYMS + 1), GYMS_PER_REQUEST))) for _ in range(n)
+    ]
+
+
+def time_lookups(lookup: Callable[[int, tuple[int, ...]], object], n: int) -> tuple[float, float]:
+    """Returns the median and p99 latency of the lookups in ms"""
+    latencies = []
+    for uid, gym_ids in requests(n):
+        start = time.perf_counter()
+        lookup(uid, gym_ids)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if len(latencies) == 1:
+        return latencies[0], latencies[0]
+    return statistics.median(latencies), statistics.quantiles(latencies, n=100, method="inclusive")[98]
+
+
+def log_lookup(path: str) -> Callable[[int, tuple[int, ...]], object]:
+    def lookup(uid: int, gym_ids: tuple[int, ...]) -> object:
+        gym_ids_union = " UNION ALL ".join(f"SELECT {gym_id} AS gym_id" for gym_id in gym_ids)
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+            return conn.execute(LOG_QUERY.format(gym_ids_union=gym_ids_union), (uid, "boulder")).fetchall()
+
+    return lookup
+
+
+def time_writes(write: Callable[[int, tuple[int, ...]], None], n: int) -> float:
+    """Returns the mean latency of recording a refresh in ms"""
+    start = time.perf_counter()
+    for uid, gym_ids in requests(n):
+        write(uid, gym_ids)
+    return (time.perf_counter() - start) / n * 1000
+
+
+def log_append(path: str) -> Callable[[int, tuple[int, ...]], None]:
+    def write(uid: int, gym_ids: tuple[int, ...]) -> None:
+        with sqlite3.connect(path) as conn:
+            conn.executemany(
+                "INSERT INTO user_updates VALUES (strftime('%s','now'), ?, ?, ?)",
+                [("boulder", gym_id, uid) for gym_id in gym_ids],
+            )
+            conn.commit()
+
+    return write
+
+
+def report(label: str, latencies: tuple[float, float], write: float, path: str) -> None:
+    median, p99 = latencies
+    print(f"{label:>28} {median:>12.3f} {p99:>10.3f} {write:>11.3f} {os.path.getsize(path) / 2**20:>11.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="number of logged updates")
+    parser.add_argument("--lookups", type=int, default=1_000, help="number of indexed lookups to time")
+    args = parser.parse_args()
+
+    with DATA_DIRECTORY:
+        path = UPDATE_DB
+
+        start = time.perf_counter()
+        create_log(path, args.rows)
+        print(f"Created a log of {args.rows} updates in {time.perf_counter() - start:.1f} seconds")
+
+        print(f"{'lookup':>28} {'median (ms)':>12} {'p99 (ms)':>10} {'write (ms)':>11} {'size (MiB)':>11}")
+
+        # Every unindexed lookup scans the whole log, a few of them show the cost
+        report("log, no index", time_lookups(log_lookup(path), 5), time_writes(log_append(path), 100), path)
+
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                'CREATE INDEX "user_updates_index" ON "user_updates" ("uid", "type", "gym_id", "update_timestamp")'
+            )
+        lookups = time_lookups(log_lookup(path), args.lookups)
+        report("log, covering index", lookups, time_writes(log_append(path), 100), path)
+
+        start = time.perf_counter()
+        logged, synced = compact_user_updates(path)
+        print(f"Compacted {logged} updates into {synced} rows in {time.perf_counter() - start:.1f} seconds")
+
+        lookups = time_lookups(
+            lambda uid, gym_ids: database.retrieve_user_update_sizes(uid, "boulder", gym_ids), args.lookups
+        )
+        write = time_writes(
+            lambda uid, gym_ids: database.record_user_sync(uid, "boulder", (), gym_ids, int(time.time())), 100
+        )
+        report("sync state", lookups, write, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,30 @@
+import argparse
+import heapq
 import os
 import sys
 import logging
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime as dt, timedelta as td
-from typing import Annotated, Callable, TypedDict
+from typing import TypedDict
 
 from pytz import utc, country_timezones, timezone
 
-from database import retrieve_all_gyms
-
-directory = os.path.dirname(os.path.realpath(__file__))
+# The modules are imported from the project directory, the cronjob runs the script by its path
+directory = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 if directory not in sys.path:
     sys.path.append(directory)
 
-from cython_modules.engine import update_climbs, update_gyms, update_walls
-from cython_modules.constants import LOG_DIRECTORY
+from src.database import StaticDataWriter, StaticUpdateCheckpoint, retrieve_all_gyms  # noqa: E402
+from src.cython_modules.engine import update_climbs, update_gyms, update_walls  # noqa: E402
+from src.cython_modules.constants import (  # noqa: E402
+    LOG_DIRECTORY,
+    STATIC_UPDATE_ATTEMPTS,
+    STATIC_UPDATE_CONCURRENCY,
+    STATIC_UPDATE_HISTORY,
+    STATIC_UPDATE_RESUME_WINDOW,
+    STATIC_UPDATE_RETRY_DELAY,
+)
 
 logging.basicConfig(
     filename=os.path.join(LOG_DIRECTORY, dt.now().strftime("%Y-%m-%d") + ".log"),
@@ -24,44 +34,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-MINUTES_DELAY = 3
-
-
-u16 = Annotated[int, "Unsigned 16-bit integer"]
+# Seconds the flush or checkpoint of a gym waits for the flush of another gym
+FLUSH_TIMEOUT = 60.0
 
 
 class Job(TypedDict):
-    function: Callable[[set[u16], int], None] | Callable[[set[u16]], None]
+    gym_id: int
     run_date: dt
-    args: tuple[set[u16], int] | tuple[set[u16]]
-
-
-def custom_array_split[T](array: list[T], sections: int) -> list[list[T]]:
-    """Function that splits an array into a number of sections
-
-    Arguments:
-        array (list): List of items to split
-        sections (int): Number of sections
-
-    Returns:
-        list: List of sections
-    """
-    if sections <= 0:
-        raise ValueError("Number of sections must be a positive integer.")
-
-    n = len(array)
-    # Determine the size of each chunk
-    quotient, remainder = divmod(n, sections)
-
-    # Build the indices to split the array
-    split_indices = []
-    start = 0
-    for i in range(sections):
-        end = start + quotient + (1 if i < remainder else 0)
-        split_indices.append(array[start:end])
-        start = end
-
-    return split_indices
+    attempts: int
 
 
 def parse_offset(offset: str) -> td:
@@ -118,101 +98,183 @@ def divide_gyms_into_timezones(gyms: list[tuple]) -> dict[td, list[int]]:
     return timezones_updates
 
 
+def next_run_window(now: dt, utc_based_hour: int, offset: td) -> dt:
+    """Function that returns the run window of a timezone, the hour shifted by the offset of the timezone.
+    The window is the one closest to now, so every window of a run falls within half a day of its start.
+    A window that has passed is due right away.
+
+    Arguments:
+        now (dt): Start of the run
+        utc_based_hour (int): Hour in utc for the database update
+        offset (td): Offset of the timezone
+
+    Returns:
+        dt: Start of the run window
+    """
+    window = now.replace(hour=utc_based_hour, minute=0, second=0, microsecond=0) + offset
+    while window < now - td(hours=12):
+        window += td(days=1)
+    while window >= now + td(hours=12):
+        window -= td(days=1)
+
+    return window
+
+
 def create_jobs_for_gyms(timezones_updates: dict[td, list[int]], utc_based_hour: int) -> list[Job]:
-    """Function that creates the jobs for the scheduler
+    """Function that creates a job per gym, due at the run window of the timezone of the gym
 
-    Args:
+    Arguments:
         timezones_updates (dict): Dictionary of timezone offsets and gym ids
-        utc_based_hour (int): Hour in utc for the database update. Defaults to 4.
+        utc_based_hour (int): Hour in utc for the database update
 
     Returns:
         list: List of jobs for the scheduler
     """
-    jobs = []
+    now = dt.now(utc)
+    jobs: list[Job] = []
 
     for offset, gym_ids in timezones_updates.items():
+        window = next_run_window(now, utc_based_hour, offset)
 
-        # The base time for the gyms in this time zone
-        # When there are more than 20 gyms, split to prevent overload on the TL servers
-        initial_datetime = dt.now(utc).replace(hour=utc_based_hour, minute=0) + td(days=1) + offset
-        number_of_requests = len(gym_ids) // 10 + (len(gym_ids) > 0)
-
-        # Make sure that the number of request are not even
-        # In this way there is always a request on the 'utc_based_hour'
-        number_of_requests += 0 if number_of_requests % 2 else 1
+        gyms_string = "; ".join(str(_id) for _id in gym_ids)
+        logger.info(f"The following gyms of {offset} will be fetched from {window}: {gyms_string}")
 
-        logger.info(f"Number of requests for {offset}: {number_of_requests}")
-
-        for i, items in enumerate(custom_array_split(gym_ids, number_of_requests)):
-            jobs += create_jobs_batch(initial_datetime, number_of_requests, items, i)
+        jobs += [{"gym_id": gym_id, "run_date": window, "attempts": 0} for gym_id in gym_ids]
 
     return jobs
 
 
-def create_jobs_batch(base_timedelta: dt, number_of_requests: int, gyms: list[int], nr: int) -> list[Job]:
-    """Function that creates jobs for a batch of gyms within a specific timezone
+def update_gym(gym_id: int) -> tuple[int, int]:
+    """Function that fetches the walls and climbs of a gym and merges the changed ones into the static database
 
     Arguments:
-        base_timedelta (dt): Base time for the jobs
-        number_of_requests (int): Number of requests
-        gyms (list): List of gym ids
-        nr (int): Number of the request in the batch
+        gym_id (int): Id of the gym
 
     Returns:
-        list: List of jobs for the scheduler
+        tuple: Number of rows merged and number of unchanged rows skipped
     """
+    with StaticDataWriter(timeout=FLUSH_TIMEOUT) as writer:
+        update_walls({gym_id}, writer)
+        update_climbs({gym_id}, True, writer)
+        return writer.flush(), writer.skipped
 
-    actual_timedelta = base_timedelta + td(minutes=nr - (number_of_requests - 1) / 2 * 30 - 10)
-
-    jobs_batch.append({"function": update_walls, "run_date": actual_timedelta, "args": (set(gyms),)})
-
-    gyms_string = "; ".join(str(_id) for _id in gyms)
-    logger.info(f"The following gyms will be fetched at {actual_timedelta}: {gyms_string}")
-
-    jobs_batch: list[Job] = []
-    for ix in range(len(gyms) // MINUTES_DELAY + len(gyms) % MINUTES_DELAY):
-        gyms_in_request = set(gyms[ix * MINUTES_DELAY : (ix + 1) * MINUTES_DELAY])
-        micro_adjusted_datetime = actual_timedelta + td(minutes=ix)
-
-        jobs_batch.append(
-            {"function": update_climbs, "run_date": micro_adjusted_datetime, "args": (gyms_in_request, 1)}
-        )
 
-    return jobs_batch
+def run_jobs(jobs: list[Job], run_id: int, checkpoint: StaticUpdateCheckpoint, concurrency: int) -> None:
+    """Function that runs the jobs from their run windows, with at most concurrency gyms at the same time.
 
+    A slow gym only occupies one of the slots, the jobs of the other gyms and timezones continue. Every
+    job that finishes or fails is committed to the checkpoint. A failed job is tried again after a delay,
+    until it has used its attempts.
 
-def update_database(utc_based_hour: int = 4) -> None:
-    """Function that is called each day to update all gyms according to their own timezone
+    Arguments:
+        jobs (list): The jobs to run
+        run_id (int): Id of the run in the checkpoint
+        checkpoint (StaticUpdateCheckpoint): Progress of the run
+        concurrency (int): Maximum number of gyms updated at the same time
+    """
+    queue = [(job["run_date"], job["gym_id"]) for job in jobs]
+    heapq.heapify(queue)
+    attempts = {job["gym_id"]: job["attempts"] for job in jobs}
+    running: dict[Future[tuple[int, int]], tuple[int, float, float]] = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="static-update") as pool:
+        while queue or running:
+            now = dt.now(utc)
+            while queue and len(running) < concurrency and queue[0][0] <= now:
+                run_date, gym_id = heapq.heappop(queue)
+                future = pool.submit(update_gym, gym_id)
+                running[future] = (gym_id, (now - run_date).total_seconds(), time.perf_counter())
+
+            # Wait for a job to finish, or for the next job to be due when there is a free slot
+            timeout = (queue[0][0] - now).total_seconds() if queue and len(running) < concurrency else None
+            if not running:
+                time.sleep(max(timeout or 0, 0))
+                continue
+
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                gym_id, late, start = running.pop(future)
+                seconds = time.perf_counter() - start
+                attempts[gym_id] += 1
+
+                try:
+                    rows, skipped = future.result()
+                except Exception as e:
+                    if attempts[gym_id] < STATIC_UPDATE_ATTEMPTS:
+                        retry = dt.now(utc) + td(seconds=STATIC_UPDATE_RETRY_DELAY)
+                        heapq.heappush(queue, (retry, gym_id))
+                        checkpoint.fail(run_id, gym_id, attempts[gym_id], seconds, repr(e), int(retry.timestamp()))
+                        logger.warning(f"Gym {gym_id} failed after {seconds:.1f} seconds, retrying at {retry}: {e!r}")
+                    else:
+                        checkpoint.fail(run_id, gym_id, attempts[gym_id], seconds, repr(e), None)
+                        logger.error(f"Gym {gym_id} failed after {attempts[gym_id]} attempts", exc_info=e)
+                    continue
+
+                checkpoint.finish(run_id, gym_id, attempts[gym_id], seconds, rows, skipped)
+                logger.info(
+                    f"Gym {gym_id}: {rows} rows written and {skipped} unchanged skipped in {seconds:.1f} seconds, "
+                    f"started {late:.0f} seconds after its window"
+                )
+
+
+def update_database(utc_based_hour: int = 4, concurrency: int = STATIC_UPDATE_CONCURRENCY, now: bool = False) -> None:
+    """Function that is called each day to update all gyms according to their own timezone.
+
+    A run that was interrupted within the resume window is resumed with the gyms it did not finish,
+    otherwise a new run is planned.
 
     Keyword Arguments:
         utc_based_hour {int} -- Hour in utc for the database update. Defaults to 4.
+        concurrency {int} -- Maximum number of gyms updated at the same time
+        now {bool} -- Whether to run every job right away, instead of at the run window of its timezone
     """
-    # Get gyms
-    update_gyms()
-
-    gyms = retrieve_all_gyms()
-    timezones_updates = divide_gyms_into_timezones(gyms)
-    to_be_scheduled_jobs = create_jobs_for_gyms(timezones_updates, utc_based_hour)
-    to_be_scheduled_jobs.sort(key=lambda x: x["run_date"])
-
-    logger.info(
-        f"Jobs to be scheduled: \n"
-        + "\n".join([f"{job['run_date']} - {job['function'].__name__}" for job in to_be_scheduled_jobs])
-    )
-
-    for job in to_be_scheduled_jobs:
-        current_time = dt.now(utc)
-        time_difference = (job["run_date"] - current_time).total_seconds()
-        time_difference = time_difference if time_difference > 0 else 0
-
-        logger.info(f"Sleeping for {time_difference} seconds")
-
-        time.sleep(time_difference)
-
-        job["function"](*job["args"])
-        logger.info(f"Job {job['function']} finished at {dt.now(utc)}")
+    started = int(time.time())
+
+    with StaticUpdateCheckpoint(timeout=FLUSH_TIMEOUT) as checkpoint:
+        with StaticDataWriter() as writer:
+            update_gyms(writer)
+
+        unfinished = checkpoint.unfinished_run(started - STATIC_UPDATE_RESUME_WINDOW)
+        if unfinished is not None:
+            run_id, pending = unfinished
+            jobs: list[Job] = [
+                {"gym_id": gym_id, "run_date": dt.fromtimestamp(due, utc), "attempts": attempts}
+                for gym_id, due, attempts in pending
+            ]
+            logger.info(f"Resuming the run of {dt.fromtimestamp(run_id, utc)} with {len(jobs)} pending gyms")
+        else:
+            run_id = started
+            jobs = create_jobs_for_gyms(divide_gyms_into_timezones(retrieve_all_gyms()), utc_based_hour)
+            checkpoint.plan(
+                run_id, ((job["gym_id"], int(job["run_date"].timestamp())) for job in jobs), STATIC_UPDATE_HISTORY
+            )
+            logger.info(f"Planned a run of {len(jobs)} gyms")
+
+        if now:
+            for job in jobs:
+                job["run_date"] = dt.now(utc)
+
+        run_jobs(jobs, run_id, checkpoint, concurrency)
+
+        summary = checkpoint.summary(run_id)
+        done = [job for job in summary if job.status == "done"]
+        failed = [str(job.gym_id) for job in summary if job.status == "failed"]
+        slowest = ", ".join(f"{job.gym_id} ({job.seconds:.1f}s, {job.rows} rows)" for job in done[:5])
+        logger.info(
+            f"Updated {len(done)} of {len(summary)} gyms, {sum(job.rows or 0 for job in done)} rows written and "
+            f"{sum(job.skipped or 0 for job in done)} unchanged skipped in {time.time() - started:.0f} seconds. "
+            f"Slowest gyms: {slowest}"
+        )
+        if failed:
+            logger.error(f"Gave up on the gyms: {', '.join(failed)}")
 
 
 if __name__ == "__main__":
-    update_database()
+    parser = argparse.ArgumentParser(description="Updates the static database, a gym at the night of its timezone")
+    parser.add_argument("--hour", type=int, default=4, help="hour in utc of the update")
+    parser.add_argument("--concurrency", type=int, default=STATIC_UPDATE_CONCURRENCY, help="gyms updated at once")
+    parser.add_argument("--now", action="store_true", help="update every gym right away")
+    args = parser.parse_args()
+
+    update_database(args.hour, args.concurrency, args.now)
     logger.info("Finished updating database")
@@ -0,0 +1,53 @@
+""" Compiles the Cython modules in place
+
+With --profile, the modules are compiled with the profile and linetrace directives and the
+CYTHON_TRACE macros, so cProfile and the line profilers see the Cython functions instead of the
+Python function that called them. The directives on the command line override the ones in the
+headers of the modules, and every module is compiled again, so a normal build after a profiling
+build is a normal build again. The trace hooks only cost time while a profiler is attached, but
+the modules are larger and every call passes them, so production runs a normal build and uses
+the sampling profiler of main.py instead.
+
+    python scripts/build_cython_modules.py [--profile] [--jobs 4]
+"""
+
+import argparse
+import glob
+import os
+
+from Cython.Build.Cythonize import main as cythonize
+
+MODULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "cython_modules", "*.pyx")
+
+# The directives of a profiling build, and the macros that compile the tracing into the C code
+PROFILE_DIRECTIVES = ("profile=True", "linetrace=True", "binding=True")
+PROFILE_MACROS = ("-DCYTHON_TRACE=1", "-DCYTHON_TRACE_NOGIL=1")
+
+
+def build(profile: bool, jobs: int) -> None:
+    """Compiles every Cython module in place
+
+    Arguments:
+        profile (bool): Whether to compile the modules with profiling and line tracing
+        jobs (int): Number of modules compiled in parallel
+    """
+    args = ["-i", "-f", "-j", str(jobs)]
+    if profile:
+        args += ["-X", ",".join(PROFILE_DIRECTIVES)]
+        os.environ["CFLAGS"] = " ".join((os.environ.get("CFLAGS", ""), *PROFILE_MACROS)).strip()
+
+    cythonize(args + sorted(glob.glob(MODULES)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="store_true", help="compile with profiling and line tracing")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    build(args.profile, args.jobs)
+    print(f"Compiled the Cython modules{' for profiling' if args.profile else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+""" Checks that no query of the application scans a full table
+
+Builds populated fixture databases in a temporary directory and runs the database functions,
+the user update check of the engine and the loading of the aggregates on them, recording every
+statement they execute. Every distinct statement is then explained with EXPLAIN QUERY PLAN.
+A plan that scans a table without an index fails the check, unless the scan is listed in
+INTENDED_SCANS. The exit code is 1 when the check fails, so it can guard a deploy.
+
+    python -m scripts.check_query_plans [--verbose]
+"""
+
+import argparse
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from shutil import copyfile
+from types import FrameType
+from typing import Any
+
+# The application reads the paths of its databases from DATA_DIRECTORY when it is imported, the
+# fixture databases are created in a directory of their own
+FIXTURE_DIRECTORY = tempfile.TemporaryDirectory(prefix="query-plans-")
+os.environ["DATA_DIRECTORY"] = FIXTURE_DIRECTORY.name
+
+from scripts.create_databases import (  # noqa: E402
+    create_data_db,
+    create_db_index,
+    create_default_user_db,
+    create_update_db,
+)
+from src import database  # noqa: E402
+from src.custom_types import AscendsJson, ClimbsJson, GymsJson, OpinionsJson, WallsJson  # noqa: E402
+from src.cython_modules.constants import DATA_DB, DEFAULT_USER_DB, UPDATE_DB, USER_DB_FORMAT_STRING  # noqa: E402
+
+
+NR_OF_GYMS = 30
+WALLS_PER_GYM = 20
+CLIMBS_PER_GYM = 1_000
+UID = 42
+USER_GYMS = (1, 2, 3, 4, 5)
+
+# The rows written by the exercise, as the fetch layer converts them
+ASCEND: AscendsJson = (10**6, 100_001, "2024-03-01 10:00:00", "Redpoint")
+OPINION: OpinionsJson = (10**6, 100_001, UID, False, False, 650, 3.0)
+GYM: GymsJson = (1, "Gym 1", "gym-1", 1, 1, 0, "NL")
+WALL: WallsJson = (1000, "Wall", 1)
+CLIMB: ClimbsJson = (100_000, 1, "route", "2024-01-01 10:00:00", "", 1000, 600, True, 0.5, 1, 3.0)
+
+# Tables of which a full scan is the point of the query
+INTENDED_SCANS = {
+    "gyms": "the start page lists every gym",
+    "staged_gyms": "a merge of the static data writer reads its whole batch",
+    "staged_walls": "a merge of the static data writer reads its whole batch",
+    "staged_climbs": "a merge of the static data writer reads its whole batch",
+}
+
+# A plan line that reads a whole table, an automatic index is built by reading the whole table
+FULL_SCAN_PATTERN = re.compile(
+    r"^(?:SCAN (?:\w+\.)?(\w+)(?: AS \w+)?(?: LEFT-JOIN)?$|SEARCH (?:\w+\.)?(\w+) USING AUTOMATIC)"
+)
+ALIAS_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(?:\w+\.)?(\w+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+KEYWORDS = {"WHERE", "ON", "LEFT", "INNER", "JOIN", "GROUP", "ORDER", "LIMIT", "UNION", "USING"}
+LITERAL_PATTERN = re.compile(r"'[^']*'|\b\d+(?:\.\d+)?\b")
+PLANNED_STATEMENTS = ("SELECT", "INSERT", "REPLACE", "UPDATE", "DELETE", "WITH")
+
+
+def populate() -> tuple[str, str, str]:
+    """Creates the static, update and user database in the fixture directory with synthetic data
+
+    Returns:
+        tuple: Paths to the static, update and user database
+    """
+    if os.path.dirname(DATA_DB) != FIXTURE_DIRECTORY.name:
+        raise RuntimeError("The application was imported before DATA_DIRECTORY was set, it uses the real databases")
+
+    data_db, update_db, default_user_db = DATA_DB, UPDATE_DB, DEFAULT_USER_DB
+    user_db = USER_DB_FORMAT_STRING.format(UID)
+    os.makedirs(os.path.dirname(default_user_db), exist_ok=True)
+
+    create_data_db(data_db)
+    create_update_db(update_db)
+    create_default_user_db(default_user_db)
+    create_db_index(data_db)
+    copyfile(default_user_db, user_db)
+
+    rng = random.Random(0)
+    climb_ids = [gym_id * 100_000 + i for gym_id in range(1, NR_OF_GYMS + 1) for i in range(CLIMBS_PER_GYM)]
+
+    with sqlite3.connect(data_db) as conn:
+        conn.executemany(
+            "INSERT INTO gyms VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(g, f"Gym {g}", f"gym-{g}", CLIMBS_PER_GYM, 0, 0, "NL") for g in range(1, NR_OF_GYMS + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO walls (id, name, gym_id) VALUES (?, ?, ?)",
+            [(g * 1000 + w, f"Wall {w}", g) for g in range(1, NR_OF_GYMS + 1) for w in range(WALLS_PER_GYM)],
+        )
+        conn.executemany(
+            "INSERT INTO climbs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+            [
+                (
+                    _id,
+                    _id // 100_000,
+                    "boulder" if _id % 2 else "route",
+                    "2024-01-01 10:00:00",
+                    None,
+                    _id // 100_000 * 1000 + rng.randrange(WALLS_PER_GYM),
+                    rng.randrange(200, 1000),
+                    1,
+                    rng.random(),
+                    rng.randrange(100),
+                    rng.uniform(1, 5),
+                )
+                for _id in climb_ids
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO gym_versions (gym_id, version) VALUES (?, 1)", [(g,) for g in range(1, NR_OF_GYMS + 1)]
+        )
+        conn.commit()
+
+    with sqlite3.connect(update_db) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_sync_state "
+            "VALUES (?1, ?2, ?3, strftime('%s','now') - ?4, NULL, strftime('%s','now') - ?4)",
+            [
+                (uid, rng.choice(("boulder", "route")), rng.randrange(1, NR_OF_GYMS + 1), rng.randrange(10**6))
+                for uid in range(10_000)
+            ],
+        )
+        conn.commit()
+
+    user_climbs = [_id for _id in climb_ids if _id // 100_000 in USER_GYMS]
+    with sqlite3.connect(user_db) as conn:
+        conn.executemany(
+            "INSERT INTO ascends (id, climb_id, date_logged, type) VALUES (?, ?, '2024-02-01 10:00:00', 'Flash')",
+            [(i, _id) for i, _id in enumerate(rng.sample(user_climbs, 2_000))],
+        )
+        conn.executemany(
+            "INSERT INTO opinions VALUES (?, ?, ?, 0, 0, 600, 4)",
+            [(i, _id, UID) for i, _id in enumerate(rng.sample(user_climbs, 1_000))],
+        )
+        conn.commit()
+
+    return data_db, update_db, user_db
+
+
+def exercise(user_db: str) -> list[str]:
+    """Runs the queries of the application on the fixture databases
+
+    Every connection is traced from the first call Python makes on it, the connection to the user
+    database is passed to the engine and is traced up front.
+
+    Arguments:
+        user_db (str): Path to the user database
+
+    Returns:
+        list: The executed statements, with their parameters expanded
+    """
+    from src.cython_modules.aggregates import load_aggregates
+    from src.cython_modules.engine import GradingSystem, update_user_data
+
+    statements: list[str] = []
+
+    def trace(frame: FrameType, event: str, arg: Any) -> None:
+        owner = getattr(arg, "__self__", None) if event == "c_call" else None
+        if isinstance(owner, sqlite3.Cursor):
+            owner = owner.connection
+        if isinstance(owner, sqlite3.Connection):
+            owner.set_trace_callback(statements.append)
+
+    threading.setprofile_all_threads(trace)
+    try:
+        database.retrieve_all_gyms()
+
+        # The user data was updated a moment ago, so the engine only checks the user updates
+        database.record_user_sync(UID, "boulder", USER_GYMS[:1], USER_GYMS[1:], int(time.time()))
+        database.retrieve_last_user_update(UID, "boulder", USER_GYMS)
+        database.retrieve_user_sync_targets(UID, int(time.time()) - 86400)
+        with sqlite3.connect(user_db) as conn:
+            conn.set_trace_callback(statements.append)
+            update_user_data(conn, UID, "boulder", USER_GYMS, False)
+
+            database.add_ascends(conn, [ASCEND])
+            database.add_opinions(conn, [OPINION])
+            database.bump_user_versions(conn, USER_GYMS)
+            database.enrich_user_table_and_get_ascends(conn, "boulder", USER_GYMS)
+            load_aggregates(conn.cursor(), "boulder", USER_GYMS, GradingSystem("boulder", "french").indices)
+            database.prune_ascends_and_opinions(conn, USER_GYMS[:2], range(1_000), range(500))
+
+        database.add_gyms([GYM])
+        database.add_walls([WALL])
+        database.add_climbs([CLIMB])
+        database.bump_gym_versions((1,))
+
+        with database.StaticDataWriter() as writer:
+            writer.add_gyms([GYM])
+            writer.add_walls([WALL])
+            writer.add_climbs([CLIMB])
+
+        run_id = int(time.time())
+        with database.StaticUpdateCheckpoint() as checkpoint:
+            checkpoint.plan(run_id, [(1, run_id), (2, run_id)], 86400)
+            checkpoint.unfinished_run(run_id - 86400)
+            checkpoint.finish(run_id, 1, 1, 0.5, 10, 2)
+            checkpoint.fail(run_id, 2, 1, 0.5, "error", run_id + 300)
+            checkpoint.summary(run_id)
+    finally:
+        threading.setprofile_all_threads(None)
+
+    return statements
+
+
+def distinct_statements(statements: list[str]) -> dict[str, str]:
+    """Returns one statement per query that can be planned, by the query without its literals"""
+    distinct: dict[str, str] = {}
+    for statement in statements:
+        statement = " ".join(statement.split())
+        if statement.upper().startswith(PLANNED_STATEMENTS):
+            distinct.setdefault(LITERAL_PATTERN.sub("?", statement), statement)
+
+    return distinct
+
+
+def full_scans(conn: sqlite3.Connection, statement: str) -> tuple[list[str], list[str]]:
+    """Explains the statement
+
+    Returns:
+        tuple: The lines of the plan and the tables it scans without an index
+    """
+    tables = {
+        name
+        for (schema,) in [("main",), ("master",), ("updates",), ("temp",)]
+        for (name,) in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+    }
+
+    # The plan names a table by its alias, if it has one
+    aliases = {alias: table for table, alias in ALIAS_PATTERN.findall(statement) if alias.upper() not in KEYWORDS}
+
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    scans = []
+    for line in plan:
+        match = FULL_SCAN_PATTERN.match(line)
+        if match is None:
+            continue
+
+        table = aliases.get(match.group(1) or match.group(2), match.group(1) or match.group(2))
+        if table in tables and table not in INTENDED_SCANS:
+            scans.append(table)
+
+    return plan, scans
+
+
+def check(verbose: bool, log: Callable[[str], None] = print) -> bool:
+    with FIXTURE_DIRECTORY:
+        data_db, update_db, user_db = populate()
+        statements = distinct_statements(exercise(user_db))
+
+        # One connection sees every table, the names of the databases do not overlap
+        conn = sqlite3.connect(user_db)
+        conn.execute("ATTACH DATABASE ? AS master", (data_db,))
+        conn.execute("ATTACH DATABASE ? AS updates", (update_db,))
+        for table in ("gyms", "walls", "climbs"):
+            conn.execute(f"CREATE TEMP TABLE staged_{table} AS SELECT * FROM master.{table} WHERE 0")
+
+        failures = 0
+        for statement in statements.values():
+            plan, scans = full_scans(conn, statement)
+            if scans:
+                failures += 1
+                log(f"FULL SCAN of {', '.join(scans)}: {statement[:160]}")
+            elif verbose:
+                log(statement[:160])
+            if scans or verbose:
+                log("\n".join(f"    {line}" for line in plan))
+
+        conn.close()
+
+    log(f"Checked {len(statements)} queries, {failures} scan a full table")
+    return failures == 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every query")
+    args = parser.parse_args()
+
+    sys.exit(0 if check(args.verbose) else 1)
+
+
+if __name__ == "__main__":
+    main()
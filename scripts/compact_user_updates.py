@@ -0,0 +1,113 @@
+""" Compacts the log of user updates into the sync state of the update database
+
+Before the sync state, every refresh appended a row per gym to the user_updates table, which was
+scanned for the last update of a user on every dashboard and preload request. The log is folded
+into one row per user, climb type and gym. A logged update was a full sync when it was the first
+update of the gym or the previous one was more than a week earlier, like the engine decided.
+
+The compaction keeps the latest sync of a row that is in the sync state already, so it can be run
+right before or after the deploy. The log is dropped and the database vacuumed afterwards, unless
+--keep-log is passed.
+
+    python -m scripts.compact_user_updates [--keep-log]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+from src.cython_modules.constants import UPDATE_DB
+from scripts.create_databases import create_update_db
+
+
+COMPACT_QUERY = """
+    INSERT INTO user_sync_state (uid, type, gym_id, last_full_sync, last_partial_sync)
+    SELECT
+        uid,
+        type,
+        gym_id,
+        MAX(CASE WHEN full_sync THEN update_timestamp END),
+        MAX(CASE WHEN NOT full_sync THEN update_timestamp END)
+    FROM (
+        SELECT
+            uid,
+            type,
+            gym_id,
+            update_timestamp,
+            IFNULL(
+                update_timestamp - LAG(update_timestamp) OVER (
+                    PARTITION BY uid, type, gym_id ORDER BY update_timestamp
+                ) > 604800,
+                1
+            ) AS full_sync
+        FROM user_updates
+        WHERE uid IS NOT NULL AND type IS NOT NULL AND gym_id IS NOT NULL AND update_timestamp IS NOT NULL
+    )
+    GROUP BY uid, type, gym_id
+    ON CONFLICT (uid, type, gym_id)
+    DO UPDATE SET
+        last_full_sync = NULLIF(MAX(IFNULL(last_full_sync, 0), IFNULL(EXCLUDED.last_full_sync, 0)), 0),
+        last_partial_sync = NULLIF(MAX(IFNULL(last_partial_sync, 0), IFNULL(EXCLUDED.last_partial_sync, 0)), 0)
+"""
+
+
+def compact_user_updates(path: str = UPDATE_DB, keep_log: bool = False) -> tuple[int, int]:
+    """Folds the log of user updates into the sync state
+
+    Arguments:
+        path (str): Path to the update database
+        keep_log (bool): Whether to keep the log, otherwise it is dropped and the database vacuumed
+
+    Returns:
+        tuple: Number of rows of the log and number of rows of the sync state
+    """
+    create_update_db(path)
+
+    with sqlite3.connect(path) as conn:
+        log = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_updates'").fetchone()
+        if log is None:
+            return 0, conn.execute("SELECT COUNT(*) FROM user_sync_state").fetchone()[0]
+
+        logged = conn.execute("SELECT COUNT(*) FROM user_updates").fetchone()[0]
+
+        # The partitions of the window are read in the order of the index, if the log has one
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS "user_updates_index" '
+            'ON "user_updates" ("uid", "type", "gym_id", "update_timestamp")'
+        )
+        conn.execute(COMPACT_QUERY)
+
+        if not keep_log:
+            conn.execute("DROP TABLE user_updates")
+        conn.commit()
+
+        synced = conn.execute("SELECT COUNT(*) FROM user_sync_state").fetchone()[0]
+
+    if not keep_log:
+        # Outside of a transaction, the pages of the log are returned to the file system
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("VACUUM")
+        conn.close()
+
+    return logged, synced
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep-log", action="store_true", help="keep the user_updates table after the compaction")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    size = os.path.getsize(UPDATE_DB)
+    logged, synced = compact_user_updates(UPDATE_DB, args.keep_log)
+
+    print(
+        f"Compacted {logged} logged updates into {synced} rows of sync state in "
+        f"{time.perf_counter() - start:.1f} seconds, the database went from {size / 2**20:.1f} MiB "
+        f"to {os.path.getsize(UPDATE_DB) / 2**20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
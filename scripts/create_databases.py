@@ -7,10 +7,14 @@ from src.cython_modules.constants import (
     UPDATE_DB,
     DEFAULT_USER_DB,
 )
+from src.database import create_materialization_tables, create_static_update_jobs, create_user_indexes
 
 
-def create_data_db() -> None:
-    with sqlite3.connect(DATA_DB) as conn:
+def create_data_db(path: str = DATA_DB) -> None:
+    with sqlite3.connect(path) as conn:
+        # Readers are not blocked by the nightly writer in WAL mode, the mode is persistent
+        conn.execute("PRAGMA journal_mode = WAL")
+
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS gyms (
@@ -30,7 +34,8 @@ def create_data_db() -> None:
             CREATE TABLE IF NOT EXISTS walls (
                 id INTEGER PRIMARY KEY,
                 name TEXT,
-                gym_id INTEGER
+                gym_id INTEGER,
+                row_hash INTEGER -- Hash of the row as fetched, an unchanged row is not written again
             )
         """
         )
@@ -48,11 +53,27 @@ def create_data_db() -> None:
                 auto_grade BOOL,
                 grade_stability FLOAT,
                 nr_of_ascends INTEGER,
-                average_opinion FLOAT
+                average_opinion FLOAT,
+                row_hash INTEGER -- Hash of the row as fetched, an unchanged row is not written again
             )
         """
         )
 
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_versions (
+                gym_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0, -- Bumped on every refresh that changes the climbs or walls
+                -- Sums of the row hashes of the walls and climbs of the last refresh, NULL when unknown
+                walls_digest INTEGER,
+                climbs_digest INTEGER
+            )
+        """
+        )
+
+        # The progress of the nightly updates, a restarted run resumes from it
+        create_static_update_jobs(conn)
+
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS boulder (
@@ -79,13 +100,24 @@ def create_data_db() -> None:
         """
         )
 
+        # The tables of an earlier deploy have no hashes, their rows are written once more
+        for table, column in (
+            ("walls", "row_hash"),
+            ("climbs", "row_hash"),
+            ("gym_versions", "walls_digest"),
+            ("gym_versions", "climbs_digest"),
+        ):
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+
         conn.commit()
 
 
-def create_default_user_db() -> None:
+def create_default_user_db(path: str = DEFAULT_USER_DB) -> None:
     """This function creates the default user database. This is copied as the user's db
     when the user first visits the site. This skips the need to create the database for every new user"""
-    with sqlite3.connect(DEFAULT_USER_DB) as conn:
+    with sqlite3.connect(path) as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS ascends (
@@ -112,33 +144,49 @@ def create_default_user_db() -> None:
         """
         )
 
+        create_materialization_tables(conn)
+        create_user_indexes(conn)
+
         conn.execute("PRAGMA journal_mode = OFF")
         conn.execute("PRAGMA ignore_check_constraints = ON")
         conn.commit()
 
 
-def create_update_db() -> None:
-    with sqlite3.connect(UPDATE_DB) as conn:
+def create_update_db(path: str = UPDATE_DB) -> None:
+    with sqlite3.connect(path) as conn:
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS user_updates (
-                update_timestamp UNSIGNED INTEGER,
-                type TEXT,
-                gym_id INTEGER,
-                uid INTEGER
-            )
+            CREATE TABLE IF NOT EXISTS user_sync_state (
+                uid INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                gym_id INTEGER NOT NULL,
+                last_full_sync INTEGER, -- Unix time of the last fetch of every ascend and opinion
+                last_partial_sync INTEGER, -- Unix time of the last fetch of the changed ascends and opinions
+                watermark INTEGER, -- Unix time the last fetch started, the next one fetches the changes since
+                PRIMARY KEY (uid, type, gym_id)
+            ) WITHOUT ROWID
         """
         )
+
+        # The sync state of an earlier deploy has no watermarks, its gyms get a full sync first
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(user_sync_state)")}
+        if "watermark" not in columns:
+            conn.execute("ALTER TABLE user_sync_state ADD COLUMN watermark INTEGER")
         conn.commit()
 
 
-def create_db_index() -> None:
-    with sqlite3.connect(DATA_DB) as conn:
-        conn.execute('CREATE UNIQUE INDEX "boulder_index" ON "boulder" ("id" ASC);')
-        conn.execute('CREATE UNIQUE INDEX "route_index" ON "route" ("id" ASC);')
-        conn.execute('CREATE UNIQUE INDEX "climbs_index" ON "climbs" ("id" ASC);')
-        conn.execute('CREATE UNIQUE INDEX "walls_index" ON "walls" ("id" ASC);')
-        conn.execute('CREATE UNIQUE INDEX "gyms_index" ON "gyms" ("id" ASC);')
+def create_db_index(data_db: str = DATA_DB) -> None:
+    """Creates the indexes of the static database. Creating them is idempotent, so this also
+    migrates existing databases to the current set of indexes."""
+    with sqlite3.connect(data_db) as conn:
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS "boulder_index" ON "boulder" ("id" ASC);')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS "route_index" ON "route" ("id" ASC);')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS "climbs_index" ON "climbs" ("id" ASC);')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS "walls_index" ON "walls" ("id" ASC);')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS "gyms_index" ON "gyms" ("id" ASC);')
+        # The main table is joined per gym and climb type, dropping user data selects the climbs of gyms
+        conn.execute('CREATE INDEX IF NOT EXISTS "climbs_gym_id_type_index" ON "climbs" ("gym_id", "type", "id");')
+        conn.execute('CREATE INDEX IF NOT EXISTS "climbs_wall_id_index" ON "climbs" ("wall_id");')
         conn.commit()
 
 
@@ -5,12 +5,14 @@ import os
 from src.cython_modules.constants import (
     DATA_DIRECTORY,
     USER_DATA_DIRECTORY,
+    USER_SHARD_DIRECTORY,
     LOG_DIRECTORY,
+    PROFILE_DIRECTORY,
 )
 
 
 def main() -> None:
-    for directory in [DATA_DIRECTORY, USER_DATA_DIRECTORY, LOG_DIRECTORY]:
+    for directory in [DATA_DIRECTORY, USER_DATA_DIRECTORY, USER_SHARD_DIRECTORY, LOG_DIRECTORY, PROFILE_DIRECTORY]:
         os.makedirs(directory, exist_ok=True)
 
     print("Directories are all in place...")
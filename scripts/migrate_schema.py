@@ -0,0 +1,94 @@
+""" Migrates the existing databases to the current schema
+
+Adds the indexes that were introduced after the databases were created to the static database
+and every user database, including the default one, and the tables and columns that were introduced
+after the static and update databases were created. Every step is idempotent, so the script can be run after every
+deploy. The log of user updates is moved to the sync state by scripts.compact_user_updates.
+
+The main state of the user databases and shards is keyed on the gym and the climb type. A main state that is keyed
+on the gym only is recreated empty, the main table of those gyms is re-joined once on their next request.
+"""
+
+import os
+import sqlite3
+import time
+
+from src.cython_modules.constants import USER_DATA_DIRECTORY, USER_SHARD_DIRECTORY
+from src.database import create_materialization_tables, create_user_indexes
+from src.user_store import SHARD_SCHEMA
+from scripts.create_databases import create_data_db, create_db_index, create_update_db
+
+
+def primary_key(conn: sqlite3.Connection, table: str) -> list[str]:
+    """Returns the columns of the primary key of the table, in the order of the key"""
+    columns = [(row[5], row[1]) for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+    return [name for _, name in sorted(columns)]
+
+
+def migrate_user_dbs(directory: str) -> int:
+    """Adds the missing indexes to the user databases in the directory
+
+    Arguments:
+        directory (str): Directory of the user databases
+
+    Returns:
+        int: Number of migrated user databases
+    """
+    migrated = 0
+    for name in os.listdir(directory):
+        if not name.endswith(".db"):
+            continue
+
+        with sqlite3.connect(os.path.join(directory, name)) as conn:
+            create_user_indexes(conn)
+            if primary_key(conn, "main_state") == ["gym_id"]:
+                conn.execute("DROP TABLE main_state")
+                create_materialization_tables(conn)
+            conn.commit()
+        migrated += 1
+
+    return migrated
+
+
+def migrate_user_shards(directory: str) -> int:
+    """Recreates the main state of the user shards in the directory that is keyed on the gym only
+
+    Arguments:
+        directory (str): Directory of the user shards
+
+    Returns:
+        int: Number of migrated user shards
+    """
+    migrated = 0
+    for name in os.listdir(directory):
+        if not name.endswith(".db"):
+            continue
+
+        with sqlite3.connect(os.path.join(directory, name)) as conn:
+            if primary_key(conn, "shard_main_state") == ["uid", "gym_id"]:
+                conn.execute("DROP TABLE shard_main_state")
+                for query in SHARD_SCHEMA:
+                    conn.execute(query)
+                conn.commit()
+                migrated += 1
+
+    return migrated
+
+
+def main() -> None:
+    start = time.perf_counter()
+    create_data_db()
+    create_db_index()
+    create_update_db()
+    print("Tables and indexes of the static database and tables of the update database are in place...")
+
+    migrated = migrate_user_dbs(USER_DATA_DIRECTORY)
+    print(f"Migrated {migrated} user databases in {time.perf_counter() - start:.1f} seconds")
+
+    if os.path.isdir(USER_SHARD_DIRECTORY):
+        migrated = migrate_user_shards(USER_SHARD_DIRECTORY)
+        print(f"Migrated the main state of {migrated} user shards")
+
+
+if __name__ == "__main__":
+    main()
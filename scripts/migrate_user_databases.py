@@ -0,0 +1,61 @@
+""" Imports the per-user databases into the shards of the sharded user store
+
+Run it before switching the application to the sharded store with USER_STORE=shards. Importing
+is idempotent, the rows of a user in the shard are replaced by those of the user database, so
+the script can be run again for users that refreshed in the meantime.
+"""
+
+import argparse
+import os
+import time
+
+from src.cython_modules.constants import USER_DATA_DIRECTORY, NR_OF_USER_SHARDS, USER_SHARD_DIRECTORY
+from src.user_store import ShardedUserStore
+
+
+def find_user_dbs(directory: str) -> list[tuple[int, str]]:
+    """Finds the per-user databases in the directory, named by the user id
+
+    Arguments:
+        directory (str): Directory of the user databases
+
+    Returns:
+        list: The user id and path of every user database
+    """
+    user_dbs = []
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if extension == ".db" and stem.isdigit():
+            user_dbs.append((int(stem), os.path.join(directory, name)))
+
+    return user_dbs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=NR_OF_USER_SHARDS, help="number of shards, keep it fixed")
+    parser.add_argument("--delete", action="store_true", help="delete every user database once it is imported")
+    args = parser.parse_args()
+
+    os.makedirs(USER_SHARD_DIRECTORY, exist_ok=True)
+    store = ShardedUserStore(args.shards)
+    user_dbs = find_user_dbs(USER_DATA_DIRECTORY)
+
+    start = time.perf_counter()
+    rows = 0
+    for i, (uid, path) in enumerate(user_dbs, 1):
+        rows += store.import_user_db(uid, path)
+        if args.delete:
+            os.remove(path)
+
+        if i % 1000 == 0:
+            print(f"Imported {i} of {len(user_dbs)} user databases...")
+
+    print(
+        f"Imported {len(user_dbs)} user databases with {rows} rows into {args.shards} shards "
+        f"in {time.perf_counter() - start:.1f} seconds"
+    )
+
+
+if __name__ == "__main__":
+    main()
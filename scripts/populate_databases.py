@@ -35,7 +35,7 @@ def populate_static_database() -> None:
     print("Database is populated...")
 
 
-def populate_grade_database() -> None:
+def populate_grade_database(path: str = DATA_DB) -> None:
     insert_boulder_grade_query = """
         INSERT INTO boulder 
         (id, french, french_rounded, v_grade, british) 
@@ -65,7 +65,7 @@ def populate_grade_database() -> None:
         route_grades.append((i, rf.get_closest(i), re.get_closest(i), ru.get_closest(i), ry.get_closest(i)))
 
     # Add the grades to the database
-    with sqlite3.connect(DATA_DB) as conn:
+    with sqlite3.connect(path) as conn:
         conn.executemany(insert_boulder_grade_query, boulder_grades)
         conn.executemany(insert_climb_grade_query, route_grades)
         conn.commit()
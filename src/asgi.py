@@ -0,0 +1,345 @@
+import asyncio
+import contextvars
+import sys
+
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from itertools import chain
+from typing import Any
+
+from src.custom_types import ClimbType
+from src.database import retrieve_last_user_update
+from src.instrumentation import current_request, stage
+from src.main import (
+    ASYNC_REFRESHES,
+    DEFERRED_REFRESH,
+    RefreshDeferred,
+    app,
+    finish_refresh,
+    log_background_refresh,
+    log_coalesced_refresh,
+    refreshes,
+    user_store,
+)
+from src.cython_modules.api import fetch_user_data
+from src.cython_modules.engine import plan_user_update, store_user_update
+from src.cython_modules.constants import (
+    ASGI_THREADS,
+    STALE_WHILE_REVALIDATE,
+    UPSTREAM_LATENCY_BUDGET,
+    USER_REFRESH_DEADLINE,
+)
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+# The key of a refresh: the user id, the climb type and the requested gyms
+RefreshKey = tuple[int, str, frozenset[int]]
+
+
+# Runs the Flask app, the SQLite work and the charts, the event loop only awaits
+pool = ThreadPoolExecutor(ASGI_THREADS, thread_name_prefix="asgi")
+
+# Refreshes that outlast the request that awaited them, in stale-while-revalidate mode, kept until they finish
+background_refreshes: set[asyncio.Task[Any]] = set()
+
+
+async def offload[T](function: Callable[..., T], *args: Any) -> T:
+    """Runs the function on the pool in a copy of the context, like asyncio.to_thread does on the default executor.
+
+    Arguments:
+        function (Callable): The blocking function
+        *args (Any): Arguments of the function
+
+    Returns:
+        Any: The result of the function
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(pool, partial(context.run, function, *args))
+
+
+def store_user_data(
+    uid: int,
+    climb_type: ClimbType,
+    plan: tuple[set[int], set[int], int, int],
+    new_user: bool,
+    ascends: list,
+    opinions: list,
+) -> int:
+    """Writes the fetched user data into the user database, returns the number of written rows"""
+    with user_store.connect(uid) as c:
+        return store_user_update(c, uid, climb_type, plan, new_user, ascends, opinions)
+
+
+async def _refresh_user_data(uid: int, climb_type: ClimbType, requested_gyms: tuple[int, ...]) -> None:
+    """Refreshes the user data like main._refresh_user_data, but awaits the fetch from TopLogger. The
+    lookups and the writes run on the pool.
+
+    The fetch still runs on the loop of the fetch layer, it shares the connections, the rate limit and
+    the fetches in flight with the refreshes of the refresh worker.
+    """
+    with stage("add_user"):
+        new_user = await offload(user_store.add_user, uid)
+
+    plan = await offload(plan_user_update, uid, climb_type, requested_gyms, new_user)
+    if plan is None:
+        return
+
+    with stage("upstream"):
+        future = fetch_user_data(uid, plan[0], plan[1], climb_type, plan[2])
+        # A refresh past its deadline leaves the fetch to finish for the other refreshes that share it,
+        # its update is not recorded, so the next request fetches the data again
+        ascends, opinions, transfer = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), USER_REFRESH_DEADLINE or None
+        )
+
+    written = await offload(store_user_data, uid, climb_type, plan, new_user, ascends, opinions)
+    await offload(finish_refresh, uid, written, transfer.records, transfer.body_bytes)
+
+
+async def refresh_user_data(deferred: RefreshDeferred) -> int | None:
+    """Refreshes the user data of a request like main.refresh_user_data, without blocking a thread on
+    TopLogger. A refresh of the same user data in flight is joined, whether a request or the refresh
+    worker started it.
+
+    Arguments:
+        deferred (RefreshDeferred): The refresh that the request deferred
+
+    Returns:
+        int | None: Unix time of the oldest refresh of the local data if it is served stale, None if
+            the data is up to date
+    """
+    uid, climb_type, requested_gyms = deferred.target
+
+    with stage("refresh"):
+        last_update = None
+        if STALE_WHILE_REVALIDATE:
+            with stage("sync_lookup"):
+                last_update = await offload(retrieve_last_user_update, uid, climb_type, requested_gyms)
+
+        refresh = refreshes.do_async(deferred.key, _refresh_user_data, uid, climb_type, requested_gyms)
+        if last_update is None:
+            _, shared = await refresh
+
+            if shared:
+                log_coalesced_refresh(uid)
+            return None
+
+        task = asyncio.ensure_future(refresh)
+        try:
+            await asyncio.wait_for(asyncio.shield(task), UPSTREAM_LATENCY_BUDGET)
+        except TimeoutError:
+            app.logger.info(f"Refresh of {uid} exceeded the latency budget, the local data is served")
+            background_refreshes.add(task)
+            task.add_done_callback(background_refreshes.discard)
+            task.add_done_callback(partial(log_background_refresh, uid))
+            return last_update
+        except Exception:
+            app.logger.exception(f"Refresh of {uid} failed, the local data is served")
+            return last_update
+
+        return None
+
+
+class WSGIResponse:
+    """Calls the Flask app with the environ and reads the body of its response, on a thread of the pool.
+
+    Attributes:
+        status (int): The status code
+        headers (list): The headers, encoded for ASGI
+    """
+
+    def __init__(self, environ: dict[str, Any]) -> None:
+        self.status = 500
+        self.headers: list[tuple[bytes, bytes]] = []
+        self._written: list[bytes] = []
+        self._body: Iterable[bytes] = app(environ, self.start_response)
+        self._chunks: Iterator[bytes] = chain(self._written, self._body)
+        self._closed = False
+
+    def start_response(self, status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> Callable[..., Any]:
+        # Nothing is sent before the app returns, so a response of an error replaces the response
+        self.status = int(status.split(" ", 1)[0])
+        self.headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        return self._write
+
+    def _write(self, data: bytes) -> None:
+        # The write callable of WSGI, what is written before the app returns is sent ahead of the body
+        self._written.append(data)
+
+    def read(self) -> bytes | None:
+        """Returns the next chunk of the body, the chunks of a streamed dashboard are computed here.
+        Closes the response once the body is read.
+
+        Returns:
+            bytes | None: The chunk, None once the body is read
+        """
+        for chunk in self._chunks:
+            if chunk:
+                return chunk
+
+        self.close()
+        return None
+
+    def close(self) -> None:
+        """Closes the response once, which runs its callbacks, e.g. the caching of the gym dashboards"""
+        if not self._closed:
+            self._closed = True
+            if hasattr(self._body, "close"):
+                self._body.close()
+
+
+def dispatch(environ: dict[str, Any]) -> tuple[WSGIResponse, bytes | None]:
+    """Dispatches the request to the Flask app and reads the first chunk of the body. The response of a
+    request that deferred its refresh is discarded.
+
+    Arguments:
+        environ (dict): The WSGI environ of the request
+
+    Returns:
+        tuple: The response and the first chunk of its body
+    """
+    response = WSGIResponse(environ)
+    if DEFERRED_REFRESH in environ:
+        response.close()
+        return response, None
+
+    return response, response.read()
+
+
+def build_environ(scope: Scope, body: bytes, async_refreshes: dict[RefreshKey, Any]) -> dict[str, Any]:
+    """Builds the WSGI environ of the HTTP request, as in PEP 3333.
+
+    Arguments:
+        scope (dict): The ASGI scope of the request
+        body (bytes): The body of the request
+        async_refreshes (dict): The outcomes of the refreshes awaited for the request, by their key
+
+    Returns:
+        dict: The environ
+    """
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    server = scope.get("server") or ("localhost", 80)
+
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode().decode("latin-1"),
+        "PATH_INFO": path.encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        ASYNC_REFRESHES: async_refreshes,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+
+    for name, value in scope["headers"]:
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = f"HTTP_{key}"
+
+        # Repeated headers are joined, the cookies with the separator of the Cookie header
+        if key in environ:
+            environ[key] += ("; " if key == "HTTP_COOKIE" else ",") + value.decode("latin-1")
+        else:
+            environ[key] = value.decode("latin-1")
+
+    return environ
+
+
+async def read_body(receive: Receive) -> bytes:
+    """Receives the whole body of the request, the bodies of the app are small JSON documents"""
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+
+    return bytes(body)
+
+
+async def handle(scope: Scope, receive: Receive, send: Send) -> None:
+    """Serves a request with the Flask app on the pool.
+
+    A request that needs a refresh of the user data defers it in its first dispatch. The refresh is
+    awaited on the event loop, and the request is dispatched again with its outcome, which does not
+    count its cache lookup and its visit again. Every dispatch and every chunk of the body run in the
+    same context, like the request would in a WSGI thread.
+    """
+    body = await read_body(receive)
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+
+    async_refreshes: dict[RefreshKey, Any] = {}
+    while True:
+        environ = build_environ(scope, body, async_refreshes)
+        response, chunk = await loop.run_in_executor(pool, context.run, dispatch, environ)
+
+        deferred = environ.get(DEFERRED_REFRESH)
+        if deferred is None:
+            break
+
+        # The stages of the refresh are part of the timings of the request
+        current_request.set(context.get(current_request))
+        try:
+            async_refreshes[deferred.key] = await refresh_user_data(deferred)
+        except Exception as e:
+            # The second dispatch raises it, so the error is handled by the app
+            async_refreshes[deferred.key] = e
+
+    try:
+        await send({"type": "http.response.start", "status": response.status, "headers": response.headers})
+        while chunk is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await loop.run_in_executor(pool, context.run, response.read)
+
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        await loop.run_in_executor(pool, context.run, response.close)
+
+
+async def lifespan(receive: Receive, send: Send) -> None:
+    """Acknowledges the startup and the shutdown of the server, the app starts its threads on first use"""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope: Scope, receive: Receive, send: Send) -> None:
+    """The ASGI application. The dashboards, the chart data and the preloads await the refresh of the
+    user data on the event loop, so the threads of the pool are only busy with SQLite, the charts and
+    the templates. Every other request is served by the Flask app on the pool as it is.
+
+    Arguments:
+        scope (dict): The ASGI scope of the connection
+        receive (Callable): Receives the messages of the connection
+        send (Callable): Sends the messages of the connection
+    """
+    if scope["type"] == "http":
+        await handle(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    else:
+        raise ValueError(f"Unsupported ASGI scope type {scope['type']}")
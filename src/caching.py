@@ -0,0 +1,166 @@
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from collections.abc import Iterable, Sequence
+from datetime import datetime as dt, timedelta
+from threading import Lock
+from typing import Any
+
+from flask_caching.backends import MemcachedCache, NullCache
+from flask_caching.backends.base import BaseCache
+
+
+# Bump to invalidate every cached page, e.g. when the layout of the pages changes
+KEY_VERSION = 1
+
+# The memcached server the workers share in production, and the prefix of their keys, the default
+# of Flask-Caching. The cron job writes the versions of the gyms with the same prefix.
+MEMCACHED_SERVERS = ("127.0.0.1:11211",)
+CACHE_KEY_PREFIX = "flask_cache_"
+
+
+def cache_key(kind: str, *parts: Any) -> str:
+    """Creates a cache key from the parts, the same for every worker and every restart.
+
+    Python's hash is salted per process, a key of it is only found by the worker that stored it.
+    The key is a digest of the JSON of the parts instead, which also keeps it within the key
+    length and character set of memcached.
+
+    Arguments:
+        kind (str): Kind of the cached value, the prefix of the key
+        *parts (Any): JSON serializable parts that identify the value
+
+    Returns:
+        str: The cache key
+    """
+    digest = hashlib.sha256(json.dumps([KEY_VERSION, *parts], separators=(",", ":")).encode()).hexdigest()
+    return f"{kind}:{digest}"
+
+
+def create_shared_cache() -> BaseCache:
+    """Creates a client of the cache of the workers for code that runs outside of the app, like the
+    cron job. Without PROD, the workers cache nothing, so neither does the client.
+
+    Returns:
+        BaseCache: The client
+    """
+    if os.getenv("PROD"):
+        return MemcachedCache(list(MEMCACHED_SERVERS), key_prefix=CACHE_KEY_PREFIX)
+
+    return NullCache()
+
+
+def cached_gym_versions(cache: BaseCache, gym_ids: Sequence[int]) -> list[int | None]:
+    """Returns the versions of the static data of the gyms in the cache, part of the keys of the
+    cached pages, in a single round trip. A version that is not in the cache starts at the current
+    time, like the version of the user data.
+
+    Arguments:
+        cache (BaseCache): The cache of the workers
+        gym_ids (Sequence[int]): Gym ids
+
+    Returns:
+        list: The version of every gym, None if nothing is cached
+    """
+    keys = [f"gym-data-version:{gym_id}" for gym_id in gym_ids]
+    versions = cache.get_many(*keys)
+    if None in versions:
+        # Another worker may add a version first, every worker uses the one in the cache
+        for key, version in zip(keys, versions):
+            if version is None:
+                cache.add(key, time.time_ns(), timeout=0)
+        versions = cache.get_many(*keys)
+
+    return versions
+
+
+def bump_cached_gym_versions(cache: BaseCache, gym_ids: Iterable[int]) -> None:
+    """Bumps the versions of the static data of the gyms in the cache, which invalidates the cached
+    pages of the gyms. Bumped after the static data is committed, so a page rendered from the data
+    before the commit is never cached under the new version.
+
+    Arguments:
+        cache (BaseCache): The cache of the workers
+        gym_ids (Iterable[int]): Gym ids
+    """
+    version = time.time_ns()
+    cache.set_many({f"gym-data-version:{gym_id}": version for gym_id in gym_ids}, timeout=0)
+
+
+def etag_of(key: str) -> str:
+    """Returns the entity tag of the value cached under the key.
+
+    The key identifies the user, the parameters and the version of the data, so it identifies the
+    content of a page without rendering it.
+    """
+    return key.rpartition(":")[2][:32]
+
+
+def preload_fingerprint(secret: str | bytes | None, hour: dt) -> str:
+    """Creates the fingerprint of the hour, which the start page passes to the preload requests.
+
+    Arguments:
+        secret (str | bytes | None): Secret key of the application
+        hour (datetime): Time within the hour
+
+    Returns:
+        str: HMAC of the hour
+    """
+    if isinstance(secret, str):
+        secret = secret.encode()
+
+    return hmac.new(secret or b"", hour.strftime("%Y-%m-%d-%H").encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def check_preload_fingerprint(secret: str | bytes | None, fingerprint: Any, now: dt) -> bool:
+    """Checks the fingerprint of a preload request. The fingerprint of the previous hour is valid as
+    well, so a start page loaded just before the hour turns still preloads.
+
+    Arguments:
+        secret (str | bytes | None): Secret key of the application
+        fingerprint (Any): Fingerprint sent by the client
+        now (datetime): Current time
+
+    Returns:
+        bool: True if the fingerprint is valid, False otherwise
+    """
+    if not isinstance(fingerprint, str):
+        return False
+
+    return any(
+        hmac.compare_digest(fingerprint, preload_fingerprint(secret, hour)) for hour in (now, now - timedelta(hours=1))
+    )
+
+
+class CacheStats:
+    """Counts the lookups of the page cache of a worker.
+
+    Attributes:
+        hits (int): Number of pages served from the cache
+        misses (int): Number of pages that were not cached and had to be rendered
+        not_modified (int): Number of requests answered with 304, the client had the page already
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def count(self, outcome: str) -> None:
+        """Counts a lookup, the outcome is the name of one of the counters"""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def as_dict(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.not_modified
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": round((self.hits + self.not_modified) / lookups, 4) if lookups else 0.0,
+            }
@@ -1,4 +1,4 @@
-from typing import Literal, TypedDict
+from typing import Literal, NamedTuple
 from typing_extensions import TypeIs
 
 
@@ -12,52 +12,21 @@ WallsRow = tuple[int, str, int]
 ClimbsRow = tuple[int, int, ClimbType, str, str, int, int, bool, float, int, float]
 
 
-class AscendsJson(TypedDict):
-    id: int
-    climb_id: int
-    date_logged: str
-    type: ClimbType
-    gym_id: int
-
-
-class OpinionsJson(TypedDict):
-    id: int
-    climb_id: int
-    uid: int
-    project: bool
-    voted_renew: bool
-    grade_rating: int
-    rating: float
-
-
-class GymsJson(TypedDict):
-    id: int
-    name: str
-    id_name: str
-    nr_of_climbs: int
-    nr_of_boulders: int
-    nr_of_routes: int
-    country: str
-
-
-class WallsJson(TypedDict):
-    id: int
-    name: str
-    gym_id: int
+# The rows the fetch layer converts the JSON of TopLogger to, in the order of the columns they are written to
+AscendsJson = tuple[int, int, str, str]
+OpinionsJson = tuple[int, int, int, bool, bool, int, float]
+GymsJson = tuple[int, str, str, int, int, int, str]
+WallsJson = tuple[int, str, int]
+ClimbsJson = tuple[int, int, ClimbType, str, str, int, int, bool, float, int, float]
 
 
-class ClimbsJson(TypedDict):
-    id: int
+class StaticUpdateJobRow(NamedTuple):
     gym_id: int
-    type: ClimbType
-    date_live_start: str
-    date_live_end: str
-    wall_id: int
-    grade: int
-    auto_grade: bool
-    grade_stability: float
-    nr_of_ascends: int
-    average_opinion: float
+    status: str
+    attempts: int
+    seconds: float | None
+    rows: int | None
+    skipped: int | None
 
 
 def check_system(system: str) -> TypeIs[System]:
@@ -0,0 +1,24 @@
+# distutils: language=c++
+
+cdef dict TYPE_INDEX
+cdef dict RATING_TYPE_ORDER
+cdef str MAIN_COLUMNS_QUERY
+
+
+cdef object translate(tuple indices, object grade)
+
+
+cdef class Aggregates:
+    cdef readonly tuple gym_ids, columns, indices, flash_rate
+    cdef readonly bint multiple_gyms
+    cdef readonly Py_ssize_t size
+    cdef readonly dict number_of_ascends, top_grade
+    cdef readonly list ascends_per_month, max_grade_per_month, ascends_per_grade, flash_rate_per_grade
+    cdef readonly list grade_pairs, ratings, rating_per_ascend_type
+    cdef readonly list ascends_per_wall, ascends_per_gym, max_grade_per_wall, max_grade_per_gym
+    cdef readonly list flash_rate_per_wall, flash_rate_per_gym, rating_per_wall, rating_per_gym
+
+    cdef void compute(self)
+
+
+cpdef Aggregates load_aggregates(object cursor, str climb_type, tuple gym_ids, tuple indices)
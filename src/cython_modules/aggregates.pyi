@@ -0,0 +1,54 @@
+from sqlite3 import Cursor
+from typing import Any
+
+from src.custom_types import ClimbType
+
+class Aggregates:
+    """Every statistic of the dashboard, computed in a single pass over the main table.
+
+    Each aggregate has the same layout as the result of the SQL query it replaced.
+    """
+
+    gym_ids: tuple[int, ...]
+    columns: tuple[tuple[Any, ...], ...]
+    indices: tuple[int | None, ...]
+    multiple_gyms: bool
+    size: int
+
+    number_of_ascends: dict[str, int]
+    top_grade: dict[str, int]
+    flash_rate: tuple[float | None, float | None, float | None]
+    ascends_per_month: list[tuple[int, int, int, int]]
+    max_grade_per_month: list[tuple[int, int, int, int]]
+    ascends_per_grade: list[tuple[int, int, int, int]]
+    flash_rate_per_grade: list[tuple[int, float, float]]
+    grade_pairs: list[tuple[int, int, int]]
+    ratings: list[tuple[float, float]]
+    rating_per_ascend_type: list[tuple[str, float, int]]
+    ascends_per_wall: list[tuple[str, str, int]]
+    ascends_per_gym: list[tuple[str, str, int]]
+    max_grade_per_wall: list[tuple[str, int, int, int]]
+    max_grade_per_gym: list[tuple[str, int, int, int]]
+    flash_rate_per_wall: list[tuple[str, float, float]]
+    flash_rate_per_gym: list[tuple[str, float, float]]
+    rating_per_wall: list[tuple[str, float, int]]
+    rating_per_gym: list[tuple[str, float, int]]
+
+    def __init__(
+        self, gym_ids: tuple[int, ...], columns: tuple[tuple[Any, ...], ...], indices: tuple[int | None, ...]
+    ) -> None: ...
+
+def load_aggregates(
+    cursor: Cursor, climb_type: ClimbType, gym_ids: tuple[int, ...], indices: tuple[int | None, ...]
+) -> Aggregates:
+    """Loads the rows of the main table of the climb type for the gyms once and computes all aggregates
+
+    Arguments:
+        cursor: The database cursor
+        climb_type: The climb type
+        gym_ids: The gym ids
+        indices: The lookup array from grade value to grade index of the grading system
+
+    Returns:
+        The aggregates of the gyms
+    """
@@ -0,0 +1,320 @@
+# cython: language_level=3, binding=False, boundscheck=False, wraparound=False, initializedcheck=False, nonecheck=False, infer_types=False, profile=False, cdivision=False, type_version_tag=False, unraisable_tracebacks=False
+# distutils: language=c++
+
+from datetime import datetime as dt, timezone
+
+from libc.math cimport floor
+
+
+# Index of every ascend type in the accumulators, ordered from hardest to easiest
+cdef dict TYPE_INDEX = {"Onsight": 0, "Flash": 1, "Redpoint": 2}
+
+# Order in which the rating per ascend type chart shows the ascend types
+cdef dict RATING_TYPE_ORDER = {"Not ascended": 0, "Redpoint": 1, "Flash": 2, "Onsight": 3}
+
+cdef str MAIN_COLUMNS_QUERY = """
+    SELECT gym_id, date_logged, ascend_type, grade, grade_rating, rating, average_opinion, wall_name, gym_name
+    FROM main
+    WHERE gym_id IN {} AND climb_type = ?
+"""
+
+
+cdef double sql_round(double value):
+    """Rounds the value to one decimal in the same way SQLite's ROUND does (half away from zero)
+
+    Arguments:
+        value (double): The value to round
+
+    Returns:
+        double: The rounded value
+    """
+    return floor(value * 10 + 0.5) / 10
+
+
+cdef long long month_timestamp(str date):
+    """Converts the date to the timestamp ApexCharts expects on a datetime axis
+
+    Arguments:
+        date (str): The date in the format YYYY-MM-DD HH:MM:SS
+
+    Returns:
+        long long: The timestamp in milliseconds
+    """
+    return int(dt.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp()) * 1000 + 40000000
+
+
+cdef object translate(tuple indices, object grade):
+    """Translates a TopLogger grade value to the index of the closest grade of a grading system
+
+    Arguments:
+        indices (tuple): The dense lookup array of the grading system
+        grade (object): The grade value or None
+
+    Returns:
+        object: The index or None when the grade has no counterpart in the grading system
+    """
+    if grade is None or grade < 0 or grade >= len(indices):
+        return None
+    return indices[grade]
+
+
+cdef list new_label_accumulator():
+    """Creates the accumulator for a label (wall or gym)
+
+    The layout is: ascends per type (onsight, flash, redpoint), max grade per type (onsight,
+    flash, redpoint), whether a graded climb exists, rating sum and rating count.
+
+    Returns:
+        list: The accumulator
+    """
+    return [0, 0, 0, 0, 0, 0, 0, 0.0, 0]
+
+
+cdef void accumulate_label(dict accumulators, object label, object ascend_type, object grade, object rating):
+    """Adds a single row of the main table to the accumulator of its label
+
+    Arguments:
+        accumulators (dict): The accumulators per label
+        label (object): The wall or gym name
+        ascend_type (object): The ascend type or None
+        grade (object): The grade or None
+        rating (object): The rating or None
+    """
+    cdef list acc
+    cdef unsigned char t
+
+    if label is None:
+        return
+
+    acc = accumulators.get(label)
+    if acc is None:
+        acc = accumulators[label] = new_label_accumulator()
+
+    if ascend_type is not None:
+        t = TYPE_INDEX[ascend_type]
+        acc[t] += 1
+        if grade is not None and grade > acc[3 + t]:
+            acc[3 + t] = grade
+
+    if grade is not None:
+        acc[6] = 1
+
+    if rating is not None:
+        acc[7] += rating
+        acc[8] += 1
+
+
+cdef list ascends_per_label(dict accumulators):
+    """Converts the accumulators to rows of (label, ascend type, count)
+
+    Arguments:
+        accumulators (dict): The accumulators per label
+
+    Returns:
+        list: The rows, sorted by label and ascend type
+    """
+    cdef list rows = []
+    cdef str ascend_type
+
+    for label in sorted(accumulators):
+        acc = accumulators[label]
+        for ascend_type in ("Onsight", "Flash", "Redpoint"):
+            if acc[TYPE_INDEX[ascend_type]]:
+                rows.append((label, ascend_type, acc[TYPE_INDEX[ascend_type]]))
+
+    return rows
+
+
+cdef list max_grade_per_label(dict accumulators):
+    """Converts the accumulators to rows of (label, redpoint, flash, onsight) stacked max grades
+
+    Arguments:
+        accumulators (dict): The accumulators per label
+
+    Returns:
+        list: The rows, sorted by label
+    """
+    return [(label, max(0, acc[5] - acc[4] - acc[3]), max(0, acc[4] - acc[3]), acc[3])
+            for label, acc in sorted(accumulators.items()) if acc[6]]
+
+
+cdef list flash_rate_per_label(dict accumulators):
+    """Converts the accumulators to rows of (label, onsight rate, flash rate)
+
+    Arguments:
+        accumulators (dict): The accumulators per label
+
+    Returns:
+        list: The rows, sorted by label
+    """
+    cdef list rows = []
+    cdef long total
+
+    for label, acc in sorted(accumulators.items()):
+        total = acc[0] + acc[1] + acc[2]
+        if total:
+            rows.append((label, sql_round(acc[0] / total * 100), sql_round(acc[1] / total * 100)))
+
+    return rows
+
+
+cdef list rating_per_label(dict accumulators):
+    """Converts the accumulators to rows of (label, average rating, number of ratings)
+
+    Arguments:
+        accumulators (dict): The accumulators per label
+
+    Returns:
+        list: The rows, sorted by label
+    """
+    return [(label, acc[7] / acc[8], acc[8]) for label, acc in sorted(accumulators.items()) if acc[8]]
+
+
+cdef class Aggregates:
+    """Every statistic of the dashboard, computed in a single pass over the main table
+
+    The rows of the main table are loaded once into columns. Afterwards, all aggregates are
+    computed in one pass over these columns. Each aggregate has the same layout as the
+    result of the SQL query it replaced, so the statistics processor can consume them as is.
+
+    An ascend always carries a date, thus ascend_type and date_logged are NULL together.
+
+    The main table stores the raw TopLogger grade values, independent of the grading system.
+    They are translated with the lookup array of the grading system while the rows are visited.
+
+    Attributes:
+        gym_ids (tuple): The gym ids the aggregates are computed for
+        multiple_gyms (bint): Whether the aggregates span multiple gyms
+        size (Py_ssize_t): The number of rows in the main table for these gyms
+        columns (tuple): The columns of the main table
+        indices (tuple): The lookup array from grade value to grade index of the grading system
+    """
+
+    def __init__(self, tuple gym_ids, tuple columns, tuple indices):
+        self.gym_ids = gym_ids
+        self.indices = indices
+        self.multiple_gyms = len(gym_ids) > 1
+        self.columns = columns if columns else ((),) * 9
+        self.size = len(self.columns[0])
+        self.compute()
+
+    cdef void compute(self):
+        cdef Py_ssize_t i
+        cdef unsigned char t
+        cdef str month
+        cdef list acc
+        cdef tuple gym_id, date_logged, ascend_type, grade, grade_rating, rating, average_opinion, wall_name, gym_name
+
+        cdef list graded = [0, 0, 0]
+        cdef list max_graded = [None, None, None]
+        cdef list ascended = [0, 0, 0]
+        cdef dict months = {}
+        cdef dict grades = {}
+        cdef dict grade_pairs = {}
+        cdef list ratings = []
+        cdef dict ratings_per_type = {}
+        cdef dict walls = {}
+        cdef dict gyms = {}
+        cdef long total
+        cdef tuple indices = self.indices
+
+        gym_id, date_logged, ascend_type, grade, grade_rating, rating, average_opinion, wall_name, gym_name = self.columns
+
+        for i in range(self.size):
+            g = translate(indices, grade[i])
+            gr = translate(indices, grade_rating[i])
+            a = ascend_type[i]
+            r = rating[i]
+
+            if a is not None:
+                t = TYPE_INDEX[a]
+                ascended[t] += 1
+
+                # Ascends and max grades per month, keyed on the sortable YYYY-MM prefix
+                month = date_logged[i][:7]
+                acc = months.get(month)
+                if acc is None:
+                    acc = months[month] = [date_logged[i], 0, 0, 0, 0, 0, 0]
+                elif date_logged[i] < acc[0]:
+                    acc[0] = date_logged[i]
+                acc[1 + t] += 1
+                if g is not None and g > acc[4 + t]:
+                    acc[4 + t] = g
+
+                if g is not None:
+                    graded[t] += 1
+                    if max_graded[t] is None or g > max_graded[t]:
+                        max_graded[t] = g
+
+                    acc = grades.get(g)
+                    if acc is None:
+                        acc = grades[g] = [0, 0, 0]
+                    acc[t] += 1
+
+            if g is not None and gr is not None:
+                grade_pairs[(g, gr)] = grade_pairs.get((g, gr), 0) + 1
+
+            if r is not None:
+                if average_opinion[i] is not None:
+                    ratings.append((r, sql_round(average_opinion[i])))
+
+                acc = ratings_per_type.get(a or "Not ascended")
+                if acc is None:
+                    acc = ratings_per_type[a or "Not ascended"] = [0.0, 0]
+                acc[0] += r
+                acc[1] += 1
+
+            accumulate_label(walls, wall_name[i], a, g, r)
+            accumulate_label(gyms, gym_name[i], a, g, r)
+
+        self.number_of_ascends = {k: graded[TYPE_INDEX[k]] for k in TYPE_INDEX if graded[TYPE_INDEX[k]]}
+        self.top_grade = {k: max_graded[TYPE_INDEX[k]] for k in TYPE_INDEX if max_graded[TYPE_INDEX[k]] is not None}
+
+        total = ascended[0] + ascended[1] + ascended[2]
+        self.flash_rate = tuple(sql_round(c / total * 100) for c in ascended) if total else (None, None, None)
+
+        self.ascends_per_month = []
+        self.max_grade_per_month = []
+        for month, acc in sorted(months.items()):
+            self.ascends_per_month.append((month_timestamp(acc[0]), acc[3], acc[2], acc[1]))
+            self.max_grade_per_month.append(
+                (month_timestamp(acc[0]), max(0, acc[6] - acc[5] - acc[4]), max(0, acc[5] - acc[4]), acc[4])
+            )
+
+        self.ascends_per_grade = [(g, acc[2], acc[1], acc[0]) for g, acc in sorted(grades.items())]
+        self.flash_rate_per_grade = [
+            (g, sql_round(acc[0] / (acc[0] + acc[1] + acc[2]) * 100), sql_round(acc[1] / (acc[0] + acc[1] + acc[2]) * 100))
+            for g, acc in sorted(grades.items())
+        ]
+
+        self.grade_pairs = [(key[1], key[0], count) for key, count in sorted(grade_pairs.items())]
+        self.ratings = ratings
+        self.rating_per_ascend_type = [
+            (key, acc[0] / acc[1], acc[1])
+            for key, acc in sorted(ratings_per_type.items(), key=lambda item: RATING_TYPE_ORDER[item[0]])
+        ]
+
+        self.ascends_per_wall = ascends_per_label(walls)
+        self.ascends_per_gym = ascends_per_label(gyms)
+        self.max_grade_per_wall = max_grade_per_label(walls)
+        self.max_grade_per_gym = max_grade_per_label(gyms)
+        self.flash_rate_per_wall = flash_rate_per_label(walls)
+        self.flash_rate_per_gym = flash_rate_per_label(gyms)
+        self.rating_per_wall = rating_per_label(walls)
+        self.rating_per_gym = rating_per_label(gyms)
+
+
+cpdef Aggregates load_aggregates(object cursor, str climb_type, tuple gym_ids, tuple indices):
+    """Loads the rows of the main table of the climb type for the gyms once and computes all aggregates
+
+    Arguments:
+        cursor (object): The database cursor
+        climb_type (str): The climb type
+        gym_ids (tuple): The gym ids
+        indices (tuple): The lookup array from grade value to grade index of the grading system
+
+    Returns:
+        Aggregates: The aggregates of the gyms
+    """
+    cursor.execute(MAIN_COLUMNS_QUERY.format(str(gym_ids).replace(',)', ')')), (climb_type,))
+    return Aggregates(gym_ids, tuple(zip(*cursor.fetchall())), indices)
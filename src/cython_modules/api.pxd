@@ -1,5 +1,53 @@
 # distutils: language=c++
 
+cdef frozenset RETRY_STATUSES
+cdef object loop, loop_thread, loop_lock, client
+cdef unsigned short connections_per_host
+cdef dict host_semaphores
+cdef dict in_flight
+cdef object in_flight_lock
 
+
+cdef class TokenBucket:
+    cdef readonly double rate, capacity, tokens, updated
+
+
+cdef TokenBucket bucket
+
+
+cdef class TransferStats:
+    cdef public Py_ssize_t requests, body_bytes, records
+
+
+# The states of the JSON array parser, named after what it expects next
+cdef enum ParserState:
+    OPENING_BRACKET
+    FIRST_ELEMENT
+    SEPARATOR
+    ELEMENT
+    END
+
+
+cdef class JsonArrayParser:
+    cdef readonly object decoder, text_decoder
+    cdef readonly str buffer
+    cdef readonly Py_ssize_t position
+    cdef readonly ParserState state
+
+    cdef void skip_whitespace(self)
+    cpdef list feed(self, bytes data)
+    cpdef void close(self)
+
+
+cdef object create_client(unsigned short max_connections_per_host)
+cdef object get_loop()
+cpdef object submit(object coroutine)
+cpdef object run(object coroutine)
+cpdef void configure_limits(unsigned short max_connections_per_host, double rate, unsigned short burst)
+cdef list _get(str request_url)
+cpdef tuple convert_climb(dict r)
 cdef list convert_response_ascends(list response)
+cpdef tuple convert_ascend(dict r)
 cdef list convert_response_opinions(list response, unsigned long long uid)
+cpdef object fetch_user_data(unsigned long long uid, set gym_ids_full, set gym_ids_partial, str climb_type, long long since=*)
+cpdef void forget_in_flight(tuple key, object future)
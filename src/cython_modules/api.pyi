@@ -1,16 +1,68 @@
-from typing import Any, Annotated, TypeAlias
+from asyncio import Semaphore
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Future
+from typing import Any, Annotated, Coroutine, TypeAlias, TypeVar
 
-from requests import Session
-from httpx import AsyncClient
+from httpx import AsyncClient, Response
 
 from src.custom_types import AscendsJson, ClimbType, GymsJson, WallsJson, OpinionsJson, ClimbsJson
 
 u64: TypeAlias = Annotated[int, "64-bit unsigned integer"]
 u16: TypeAlias = Annotated[int, "16-bit unsigned integer"]
 
-s: Session
+T = TypeVar("T")
+
 client: AsyncClient
 
+class TokenBucket:
+    """Limits the rate of the requests to TopLogger. Every request takes a token, the bucket
+    is refilled with rate tokens per second up to its capacity."""
+
+    rate: float
+    capacity: float
+    tokens: float
+    updated: float
+
+    def __init__(self, rate: float, capacity: u16) -> None: ...
+    async def acquire(self) -> None:
+        """Takes a token from the bucket, waits until one is available if the bucket is empty"""
+
+bucket: TokenBucket
+
+class TransferStats:
+    """Counts what a fetch transferred from TopLogger, so the cost of a refresh can be reported"""
+
+    requests: int
+    body_bytes: int
+    records: int
+
+    def __init__(self) -> None: ...
+
+def submit(coroutine: Coroutine[Any, Any, T]) -> Future[T]:
+    """Submits the coroutine to the loop of the fetch layer without waiting for it"""
+
+def run(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Runs the coroutine on the loop of the fetch layer and waits for its result"""
+
+def configure_limits(max_connections_per_host: u16, rate: float, burst: u16) -> None:
+    """Replaces the limits of the fetch layer, this may only be called while no requests are in flight
+
+    Args:
+      max_connections_per_host {int} -- The number of concurrent requests per host
+      rate {float} -- The number of requests per second, 0 disables the limit
+      burst {int} -- The maximum burst of requests
+
+    """
+
+async def async_get(request_url: str, stats: TransferStats | None = None) -> Any:
+    """Makes the request to the API within the limits of the fetch layer and returns the response"""
+
+async def async_get_pages(request_url: str, stats: TransferStats | None = None) -> list[Any]:
+    """Requests a listing of the API page by page and returns the records of every page"""
+
+async def async_get_all(request_urls: list[str]) -> list[Any]:
+    """Makes the requests to the API concurrently through the fetch layer"""
+
 def fetch_first_name_user(uid: u64) -> str:
     """Get the first name of the user, so the application gives a more personal touch.
 
@@ -81,6 +133,26 @@ def fetch_climbs(gym_ids: set[u16], only_active: bool = False) -> list[ClimbsJso
 
     """
 
+def fetch_climbs_streamed(
+    gym_ids: set[u16], only_active: bool = False, chunk_size: int = ...
+) -> Iterator[list[ClimbsJson]]:
+    """Fetch all climbs from TopLogger and yield them in chunks while the responses are parsed.
+
+    Args:
+      gym_ids {set} -- The internal TopLogger gym ids
+
+    Keyword Arguments:
+      only_active {int} -- Whether to fetch climbs from active climbs only (default: 0)
+      chunk_size {int} -- The maximum number of climbs per chunk (default: STREAM_CHUNK_SIZE)
+
+    Yields:
+        A list of climbs {list}
+
+    """
+
+def convert_climb(r: dict[str, Any]) -> ClimbsJson:
+    """Converts a climb of the API response to a row of the climbs table"""
+
 def fetch_users(gym_id: u64) -> list[tuple[int, str]]:
     """Fetch all users from TopLogger. Executes two requests, one for the climb
     users and one for the boulder users.
@@ -93,13 +165,56 @@ def fetch_users(gym_id: u64) -> list[tuple[int, str]]:
 
     """
 
-async def async_fetch_ascends(encoded_params: str) -> list[AscendsJson]:
+class JsonArrayParser:
+    """Parses a JSON array incrementally from chunks of its UTF-8 encoded body"""
+
+    buffer: str
+    position: int
+    state: int
+
+    def __init__(self) -> None: ...
+    def feed(self, data: bytes) -> list[Any]:
+        """Parses the chunk and returns the elements that are complete"""
+
+    def close(self) -> None:
+        """Checks that the whole array is parsed once the body has ended"""
+
+async def async_open_stream(request_url: str) -> tuple[Response, Semaphore]:
+    """Sends the request within the limits of the fetch layer, without reading the body yet"""
+
+async def async_next_chunk(chunks: AsyncIterator[bytes]) -> bytes | None:
+    """Reads the next chunk of a streamed body"""
+
+async def async_close_stream(response: Response, semaphore: Semaphore) -> None:
+    """Closes the streamed response and frees its slot of the per-host semaphore"""
+
+def stream_body(request_url: str) -> Iterator[bytes]:
+    """Yields the body of the response in chunks, while the request runs on the loop of the fetch layer"""
+
+def iter_converted_chunks(
+    chunks: Iterable[bytes], convert: Callable[[Any], T], chunk_size: int = ...
+) -> Iterator[list[T]]:
+    """Parses a JSON array from the chunks of its body and yields the converted elements in chunks"""
+
+def convert_ascend(r: dict[str, Any]) -> AscendsJson:
+    """Converts an ascend of the API response to a row of the ascends table"""
+
+async def async_fetch_ascends(encoded_params: str, stats: TransferStats | None = None) -> list[AscendsJson]:
     """Fetches the ascends from the API asynchronously."""
 
-async def async_fetch_opinions(encoded_params: str) -> list[OpinionsJson]:
+async def async_fetch_opinions(encoded_params: str, uid: u64, stats: TransferStats | None = None) -> list[OpinionsJson]:
     """Fetches the opinions from the API asynchronously."""
 
 async def async_fetch_user_data(
-    uid: u64, gym_ids_full: set[u16], gym_ids_partial: set[u16], climb_type: ClimbType
-) -> tuple[list[AscendsJson], list[OpinionsJson]]:
+    uid: u64, gym_ids_full: set[u16], gym_ids_partial: set[u16], climb_type: ClimbType, since: int = 0
+) -> tuple[list[AscendsJson], list[OpinionsJson], TransferStats]:
     """Fetches the user data asynchronously. Creates different tasks for the full and partial gyms."""
+
+def fetch_user_data(
+    uid: u64, gym_ids_full: set[u16], gym_ids_partial: set[u16], climb_type: ClimbType, since: int = 0
+) -> Future[tuple[list[AscendsJson], list[OpinionsJson], TransferStats]]:
+    """Submits the fetch of the user data to the fetch layer. An identical fetch that is still in
+    flight is shared instead of fetched twice."""
+
+def forget_in_flight(key: tuple[u64, ClimbType, frozenset[u16], frozenset[u16], int], future: Future[Any]) -> None:
+    """Removes a finished fetch of user data from the fetches in flight"""
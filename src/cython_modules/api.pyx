@@ -1,23 +1,472 @@
 # cython: language_level=3, binding=False, boundscheck=False, wraparound=False, initializedcheck=False, nonecheck=False, infer_types=False, profile=False, cdivision=False, type_version_tag=False, unraisable_tracebacks=False
 # distutils: language=c++
 
-import httpx
 import asyncio
+import codecs
 import json
+import time
+
+import httpx
 
-from urllib.parse import urlencode
+from functools import partial
+from threading import Lock, Thread
+from urllib.parse import urlencode, urlsplit
 from urllib.parse import quote
 from httpx import AsyncHTTPTransport
-from requests import Session
-from requests.adapters import Retry, HTTPAdapter
 
 from src.cython_modules.utils import convert_grade
-from src.cython_modules.constants cimport REQUEST_URL, ASCEND_TYPES
+from src.instrumentation import observe_upstream
+from src.cython_modules.constants cimport (
+    REQUEST_URL,
+    ASCEND_TYPES,
+    INSTRUMENTATION,
+    MAX_CONNECTIONS_PER_HOST,
+    RATE_LIMIT,
+    RATE_LIMIT_BURST,
+    REQUEST_RETRIES,
+    REQUEST_TIMEOUT,
+    STREAM_CHUNK_SIZE,
+    USER_DATA_PAGE_SIZE,
+)
+
+
+cdef class TokenBucket:
+    """Limits the rate of the requests to TopLogger
+
+    The bucket holds at most capacity tokens and is refilled with rate tokens per second. Every
+    request takes a token, when the bucket is empty the request waits until a token is refilled.
+
+    Attributes:
+        rate (double): The number of tokens refilled per second, 0 disables the limit
+        capacity (double): The maximum number of tokens, this is the maximum burst of requests
+        tokens (double): The number of tokens left
+        updated (double): The monotonic time the tokens were last refilled
+    """
+
+    def __init__(self, double rate, unsigned short capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        """Takes a token from the bucket, waits until one is available if the bucket is empty"""
+        cdef double now
+
+        if self.rate <= 0:
+            return
+
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+cdef class TransferStats:
+    """Counts what a fetch transferred from TopLogger, so the cost of a refresh can be reported
+
+    Attributes:
+        requests (Py_ssize_t): The number of requests, retries included
+        body_bytes (Py_ssize_t): The number of bytes of the response bodies
+        records (Py_ssize_t): The number of records in the responses
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.body_bytes = 0
+        self.records = 0
+
+
+# Responses of TopLogger that are worth retrying
+cdef frozenset RETRY_STATUSES = frozenset((500, 502, 503, 504))
+
+# Every request to TopLogger runs on the loop of a dedicated thread, which is started on first use
+cdef object loop = None
+cdef object loop_thread = None
+cdef object loop_lock = Lock()
+
+# The fetch layer, the client keeps the connections alive between requests
+cdef object client = None
+cdef unsigned short connections_per_host = MAX_CONNECTIONS_PER_HOST
+cdef dict host_semaphores = {}
+cdef TokenBucket bucket = TokenBucket(RATE_LIMIT, RATE_LIMIT_BURST)
+
+# Fetches of user data that are in flight, identical fetches share a single future
+cdef dict in_flight = {}
+cdef object in_flight_lock = Lock()
+
+
+cdef object create_client(unsigned short max_connections_per_host):
+    """Creates the HTTP client with a pool of HTTP/2 and keep-alive connections
+
+    Args:
+        max_connections_per_host (unsigned short): The number of connections kept alive per host
+
+    Returns:
+        object: The client
+    """
+    cdef object limits = httpx.Limits(max_keepalive_connections=max_connections_per_host, keepalive_expiry=60)
+    return httpx.AsyncClient(
+        transport=AsyncHTTPTransport(http2=True, limits=limits, retries=3),
+        timeout=REQUEST_TIMEOUT,
+    )
+
+
+cdef object get_loop():
+    """Returns the loop of the fetch layer, starts its thread if it is not running
+
+    The thread is started again when it is not alive, e.g. in a worker process forked after
+    the first fetch. The client and the semaphores are bound to the loop, so they are replaced too.
+
+    Returns:
+        object: The loop
+    """
+    global loop, loop_thread, client
+
+    with loop_lock:
+        if loop_thread is None or not loop_thread.is_alive():
+            loop = asyncio.new_event_loop()
+            loop_thread = Thread(target=loop.run_forever, name="toplogger-fetch", daemon=True)
+            loop_thread.start()
+
+            client = create_client(connections_per_host)
+            host_semaphores.clear()
+
+        return loop
+
+
+cpdef object submit(object coroutine):
+    """Submits the coroutine to the loop of the fetch layer without waiting for it
+
+    Args:
+        coroutine (object): The coroutine
+
+    Returns:
+        object: A concurrent future with the result of the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop())
+
+
+cpdef object run(object coroutine):
+    """Runs the coroutine on the loop of the fetch layer and waits for its result
+
+    Args:
+        coroutine (object): The coroutine
+
+    Returns:
+        object: The result of the coroutine
+    """
+    return submit(coroutine).result()
+
+
+cpdef void configure_limits(unsigned short max_connections_per_host, double rate, unsigned short burst):
+    """Replaces the limits of the fetch layer, this may only be called while no requests are in flight
+
+    Args:
+        max_connections_per_host (unsigned short): The number of concurrent requests per host
+        rate (double): The number of requests per second, 0 disables the limit
+        burst (unsigned short): The maximum burst of requests
+    """
+    global client, connections_per_host, bucket
+
+    if client is not None:
+        run(client.aclose())
+
+    client = create_client(max_connections_per_host)
+    connections_per_host = max_connections_per_host
+    host_semaphores.clear()
+    bucket = TokenBucket(rate, burst)
+
+
+async def async_get(str request_url, TransferStats stats = None):
+    """Makes the request to the API within the limits of the fetch layer and returns the response
+
+    The number of concurrent requests per host is bounded by a semaphore and the rate of the
+    requests by the token bucket. Server errors are retried with an exponential backoff.
+
+    Args:
+        request_url (str): The request url
+        stats (TransferStats): Counts the transfer of the request, if given
+
+    Returns:
+        list: The response
+    """
+    cdef str host = urlsplit(request_url).netloc
+    cdef unsigned char attempt
+    cdef double start
+
+    semaphore = host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = host_semaphores[host] = asyncio.Semaphore(connections_per_host)
+
+    async with semaphore:
+        for attempt in range(REQUEST_RETRIES + 1):
+            await bucket.acquire()
+            start = time.perf_counter()
+            response = await client.get(request_url)
+            if INSTRUMENTATION:
+                observe_upstream(request_url, time.perf_counter() - start)
+            if stats is not None:
+                stats.requests += 1
+                stats.body_bytes += len(response.content)
+
+            if response.status_code not in RETRY_STATUSES or attempt == REQUEST_RETRIES:
+                body = response.json()
+                if stats is not None and isinstance(body, list):
+                    stats.records += len(body)
+                return body
+
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+
+async def async_get_pages(str request_url, TransferStats stats = None):
+    """Requests a listing of the API page by page and returns the records of every page
+
+    The pages are requested one after another, until a page is not full. An endpoint that does not
+    paginate answers with every record at once, or with the same records for every page, which
+    ends the listing as well.
+
+    Args:
+        request_url (str): The request url, with a query string
+        stats (TransferStats): Counts the transfer of the requests, if given
+
+    Returns:
+        list: The records
+    """
+    cdef list records
+    cdef list page
+    cdef unsigned int number = 1
+
+    if USER_DATA_PAGE_SIZE == 0:
+        return await async_get(request_url, stats)
+
+    records = await async_get(f"{request_url}&page=1&per_page={USER_DATA_PAGE_SIZE}", stats)
+    page = records
+    while len(page) == USER_DATA_PAGE_SIZE:
+        number += 1
+        page = await async_get(f"{request_url}&page={number}&per_page={USER_DATA_PAGE_SIZE}", stats)
+        if page and page[0] == records[0]:
+            # The page parameters are ignored, the first page held every record already
+            if stats is not None:
+                stats.records -= len(page)
+            break
+        records.extend(page)
+
+    return records
+
+
+async def async_get_all(list request_urls):
+    """Makes the requests to the API concurrently through the fetch layer
+
+    Args:
+        request_urls (list): The request urls
+
+    Returns:
+        list: The responses, in the same order as the request urls
+    """
+    return await asyncio.gather(*[async_get(request_url) for request_url in request_urls])
+
+
+cdef class JsonArrayParser:
+    """Parses a JSON array incrementally from chunks of its UTF-8 encoded body
+
+    Every call to feed returns the elements of the array that are complete, the remainder is
+    kept until the next chunk arrives. Thus, only a single chunk and a single incomplete element
+    are kept in memory, instead of the whole body. The elements of the arrays of TopLogger are
+    objects, so an element is complete as soon as it decodes.
+
+    Attributes:
+        decoder (object): The JSON decoder
+        text_decoder (object): The incremental UTF-8 decoder, a chunk may end in a multibyte character
+        buffer (str): The text that is not parsed yet
+        position (Py_ssize_t): The position in the buffer up to which it is parsed
+        state (ParserState): What the parser expects next
+    """
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.state = OPENING_BRACKET
+
+    cdef void skip_whitespace(self):
+        while self.position < len(self.buffer) and self.buffer[self.position] in " \t\n\r":
+            self.position += 1
+
+    cpdef list feed(self, bytes data):
+        """Parses the chunk and returns the elements that are complete
+
+        Args:
+            data (bytes): The chunk of the body
+
+        Returns:
+            list: The complete elements
+        """
+        cdef list elements = []
+        cdef Py_ssize_t end
+        cdef str char
+
+        self.buffer = self.buffer[self.position:] + self.text_decoder.decode(data)
+        self.position = 0
+
+        while self.state != END:
+            self.skip_whitespace()
+            if self.position == len(self.buffer):
+                break
 
+            char = self.buffer[self.position]
+            if self.state == OPENING_BRACKET:
+                if char != "[":
+                    raise ValueError("The response is not a JSON array")
+                self.position += 1
+                self.state = FIRST_ELEMENT
 
-cdef object client = httpx.AsyncClient(transport=AsyncHTTPTransport(retries=3))
-cdef object s = Session()
-s.mount('https://', HTTPAdapter(max_retries=Retry(total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])))
+            elif char == "]" and self.state != ELEMENT:
+                self.position += 1
+                self.state = END
+
+            elif self.state == SEPARATOR:
+                if char != ",":
+                    raise ValueError(f"Expected a comma in the JSON array at {self.position}")
+                self.position += 1
+                self.state = ELEMENT
+
+            else:
+                try:
+                    element, end = self.decoder.raw_decode(self.buffer, self.position)
+                except json.JSONDecodeError:
+                    # The element is incomplete, wait for the next chunk
+                    break
+
+                elements.append(element)
+                self.position = end
+                self.state = SEPARATOR
+
+        return elements
+
+    cpdef void close(self):
+        """Checks that the whole array is parsed once the body has ended"""
+        self.buffer = self.buffer[self.position:] + self.text_decoder.decode(b"", True)
+        self.position = 0
+        self.skip_whitespace()
+
+        if self.state != END or self.position != len(self.buffer):
+            raise ValueError("The response ended before the JSON array was complete")
+
+
+async def async_open_stream(str request_url):
+    """Sends the request within the limits of the fetch layer, without reading the body yet
+
+    The request keeps its slot of the per-host semaphore until the stream is closed.
+
+    Args:
+        request_url (str): The request url
+
+    Returns:
+        tuple: The response with the unread body and the semaphore it holds
+    """
+    cdef str host = urlsplit(request_url).netloc
+    cdef unsigned char attempt
+
+    semaphore = host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = host_semaphores[host] = asyncio.Semaphore(connections_per_host)
+
+    await semaphore.acquire()
+    try:
+        for attempt in range(REQUEST_RETRIES + 1):
+            await bucket.acquire()
+            response = await client.send(client.build_request("GET", request_url), stream=True)
+            if response.status_code not in RETRY_STATUSES or attempt == REQUEST_RETRIES:
+                return (response, semaphore)
+
+            await response.aclose()
+            await asyncio.sleep(0.1 * 2 ** attempt)
+    except BaseException:
+        semaphore.release()
+        raise
+
+
+async def async_next_chunk(object chunks):
+    """Reads the next chunk of a streamed body
+
+    Args:
+        chunks (object): The asynchronous iterator over the body
+
+    Returns:
+        bytes: The chunk or None when the body has ended
+    """
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def async_close_stream(object response, object semaphore):
+    """Closes the streamed response and frees its slot of the per-host semaphore
+
+    Args:
+        response (object): The response
+        semaphore (object): The semaphore the response holds
+    """
+    try:
+        await response.aclose()
+    finally:
+        semaphore.release()
+
+
+def stream_body(str request_url):
+    """Yields the body of the response in chunks, while the request runs on the loop of the fetch layer
+
+    Args:
+        request_url (str): The request url
+
+    Yields:
+        bytes: The chunks of the body
+    """
+    response, semaphore = run(async_open_stream(request_url))
+    try:
+        chunks = response.aiter_bytes()
+        while True:
+            data = run(async_next_chunk(chunks))
+            if data is None:
+                break
+            yield data
+    finally:
+        run(async_close_stream(response, semaphore))
+
+
+def iter_converted_chunks(object chunks, object convert, Py_ssize_t chunk_size = STREAM_CHUNK_SIZE):
+    """Parses a JSON array from the chunks of its body and yields the converted elements in chunks
+
+    Args:
+        chunks (object): Iterable with the chunks of the body
+        convert (object): Function that converts an element of the array to a row
+        chunk_size (Py_ssize_t): The maximum number of rows per yielded chunk
+
+    Yields:
+        list: The converted rows
+    """
+    cdef JsonArrayParser parser = JsonArrayParser()
+    cdef list rows = []
+
+    for data in chunks:
+        for element in parser.feed(data):
+            rows.append(convert(element))
+            if len(rows) >= chunk_size:
+                yield rows
+                rows = []
+
+    parser.close()
+    if rows:
+        yield rows
 
 
 cpdef list fetch_gyms():
@@ -48,15 +497,15 @@ cpdef list fetch_walls(set gym_ids):
         list: The walls
     """
 
-    cdef list walls
-    cdef unsigned short gym
-    walls = []
-    for gym in gym_ids:
+    cdef list walls = []
+    cdef list response
+
+    for response in run(async_get_all([f"{REQUEST_URL}/gyms/{gym}/walls.json" for gym in gym_ids])):
         walls += [(
             r["id"],
             r.get("name", "Unknown"),
             r["gym_id"]
-        ) for r in _get(f"{REQUEST_URL}/gyms/{gym}/walls.json")]
+        ) for r in response]
 
     return walls
 
@@ -81,28 +530,60 @@ cpdef list fetch_climbs(set gym_ids, bint only_active = 0):
         }
     """
 
-    cdef unsigned short _id
     cdef list climbs = []
+    cdef list response
 
     json_params = '?json_params=%7B"filters":%7B"deleted":false%7D%7D' if only_active else ''
-    for _id in gym_ids:
-        climbs += [(
-            r["id"],
-            r["gym_id"],
-            r["climb_type"],
-            r.get("date_live_start", "")[:19].replace("T", " "),
-            r.get("date_live_end", "")[:19].replace("T", " "),
-            r.get("wall_id", 0),
-            convert_grade(r.get("grade", "0")),
-            r.get("auto_grade", 0),
-            r.get("grade_stability", ""),
-            r.get("nr_of_ascends", 0),
-            r.get("average_opinion", "")
-        ) for r in _get(f'{REQUEST_URL}/gyms/{_id}/climbs.json{json_params}')
-        ]
+    for response in run(async_get_all([f'{REQUEST_URL}/gyms/{_id}/climbs.json{json_params}' for _id in gym_ids])):
+        climbs += [convert_climb(r) for r in response]
     return climbs
 
 
+def fetch_climbs_streamed(set gym_ids, bint only_active = 0, Py_ssize_t chunk_size = STREAM_CHUNK_SIZE):
+    """Fetches the climbs from the API and yields them in chunks while the responses are parsed.
+
+    Unlike fetch_climbs, the responses are never held in memory as a whole, so the memory is
+    bounded by the chunk size instead of the size of the gyms. The gyms are streamed one by one.
+
+    Args:
+        gym_ids (set): The gym ids to fetch the climbs for
+        only_active (bool): Whether to fetch only active climbs
+        chunk_size (Py_ssize_t): The maximum number of climbs per chunk
+
+    Yields:
+        list: The climbs
+    """
+    json_params = '?json_params=%7B"filters":%7B"deleted":false%7D%7D' if only_active else ''
+    for _id in gym_ids:
+        yield from iter_converted_chunks(
+            stream_body(f'{REQUEST_URL}/gyms/{_id}/climbs.json{json_params}'), convert_climb, chunk_size
+        )
+
+
+cpdef tuple convert_climb(dict r):
+    """Converts a climb of the API response to a row of the climbs table
+
+    Args:
+        r (dict): The climb
+
+    Returns:
+        tuple: The climb
+    """
+    return (
+        r["id"],
+        r["gym_id"],
+        r["climb_type"],
+        r.get("date_live_start", "")[:19].replace("T", " "),
+        r.get("date_live_end", "")[:19].replace("T", " "),
+        r.get("wall_id", 0),
+        convert_grade(r.get("grade", "0")),
+        r.get("auto_grade", 0),
+        r.get("grade_stability", ""),
+        r.get("nr_of_ascends", 0),
+        r.get("average_opinion", "")
+    )
+
+
 cpdef list fetch_users(unsigned short gym_id):
     """Fetches the users from the API.
 
@@ -113,11 +594,16 @@ cpdef list fetch_users(unsigned short gym_id):
         list: The users
     """
 
-    return [[user['uid'], user['full_name'].strip()] for user in _get(f"{REQUEST_URL}/gyms/{gym_id}/ranked_gym_users.json?climbs_type=boulders&ranking_type=grade") + _get(f"{REQUEST_URL}/gyms/{gym_id}/ranked_gym_users.json?climbs_type=routes&ranking_type=grade")]
+    cdef list responses = run(async_get_all([
+        f"{REQUEST_URL}/gyms/{gym_id}/ranked_gym_users.json?climbs_type=boulders&ranking_type=grade",
+        f"{REQUEST_URL}/gyms/{gym_id}/ranked_gym_users.json?climbs_type=routes&ranking_type=grade"
+    ]))
+
+    return [[user['uid'], user['full_name'].strip()] for user in responses[0] + responses[1]]
 
 
 cdef list _get(str request_url):
-    """Actually makes the request to the API and returns the response
+    """Makes a single request to the API through the fetch layer and returns the response
 
     Args:
         request_url (str): The request url
@@ -125,20 +611,21 @@ cdef list _get(str request_url):
     Returns:
         list: The response
     """
-    return s.get(request_url).json()
+    return run(async_get(request_url))
 
 
-async def async_fetch_ascends(encoded_params: str):
+async def async_fetch_ascends(encoded_params: str, TransferStats stats = None):
     """Fetches the ascends from the API asynchronously.
 
     Args:
         encoded_params (str): The encoded parameters
+        stats (TransferStats): Counts the transfer of the requests, if given
 
     Returns:
         list: The ascends
     """
-    response = await client.get(f"{REQUEST_URL}/ascends.json?{encoded_params}&serialize_checks=true")
-    return convert_response_ascends(response.json())
+    response = await async_get_pages(f"{REQUEST_URL}/ascends.json?{encoded_params}&serialize_checks=true", stats)
+    return convert_response_ascends(response)
 
 
 cdef list convert_response_ascends(list response):
@@ -150,26 +637,39 @@ cdef list convert_response_ascends(list response):
     Returns:
         list: The ascends
     """
-    return [(
+    return [convert_ascend(r) for r in response]
+
+
+cpdef tuple convert_ascend(dict r):
+    """Converts an ascend of the API response to a row of the ascends table
+
+    Args:
+        r (dict): The ascend
+
+    Returns:
+        tuple: The ascend
+    """
+    return (
         r["id"],
         r["climb_id"],
         r['date_logged'][:19].replace("T", " "),
         ASCEND_TYPES[r['checks']]
-    ) for r in response]
+    )
 
 
-async def async_fetch_opinions(encoded_params: str, uid: int):
+async def async_fetch_opinions(encoded_params: str, uid: int, TransferStats stats = None):
     """Fetches the opinions from the API asynchronously.
 
     Args:
         encoded_params (str): The encoded parameters
         uid (int): The user id
+        stats (TransferStats): Counts the transfer of the requests, if given
 
     Returns:
         list: The opinions
     """
-    response = await client.get(f"{REQUEST_URL}/opinions.json?{encoded_params}&serialize_checks=true")
-    return convert_response_opinions(response.json(), uid)
+    response = await async_get_pages(f"{REQUEST_URL}/opinions.json?{encoded_params}&serialize_checks=true", stats)
+    return convert_response_opinions(response, uid)
 
 
 cdef list convert_response_opinions(list response, unsigned long long uid):
@@ -193,18 +693,26 @@ cdef list convert_response_opinions(list response, unsigned long long uid):
     ) for r in response]
 
 
-async def async_fetch_user_data(uid: int, gym_ids_full: set, gym_ids_partial: set, climb_type: str):
+async def async_fetch_user_data(uid: int, gym_ids_full: set, gym_ids_partial: set, climb_type: str, since: int = 0):
     """Fetches the user data asynchronously. Creates different tasks for the full and partial gyms.
 
+    Of the full gyms every ascend and opinion is fetched, of the partial gyms only those that
+    changed since the watermark.
+
     Args:
         uid (int): The user id
         gym_ids_full (set): The gym ids to fetch the full data for
-        gym_ids_partial (set): The gym ids to fetch the partial data for
+        gym_ids_partial (set): The gym ids to fetch the changed data for
         climb_type (str): The type of climbs to fetch
+        since (int): Unix time from which on the changes of the partial gyms are fetched
 
     Returns:
-        list: The user data
+        tuple: The ascends, the opinions and the transfer stats of the fetch
     """
+    cdef TransferStats stats = TransferStats()
+    cdef list ascends = []
+    cdef list opinions = []
+
     tasks = []
     if gym_ids_full:
         full_params = urlencode({"json_params": json.dumps({
@@ -215,8 +723,8 @@ async def async_fetch_user_data(uid: int, gym_ids_full: set, gym_ids_partial: se
                 "type": climb_type,
             }
         })}, quote_via=quote)
-        tasks.append(async_fetch_ascends(full_params))
-        tasks.append(async_fetch_opinions(full_params, uid))
+        tasks.append(async_fetch_ascends(full_params, stats))
+        tasks.append(async_fetch_opinions(full_params, uid, stats))
 
     if gym_ids_partial:
         partial_params = urlencode({"json_params": json.dumps({
@@ -224,11 +732,57 @@ async def async_fetch_user_data(uid: int, gym_ids_full: set, gym_ids_partial: se
                 "used": True,
                 "user": {"uid": uid},
                 "climb": {"gym_id": list(gym_ids_partial)},
-                "deleted": True,
                 "type": climb_type,
+                "updated_at": {"gte": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(since))},
             }
         })}, quote_via=quote)
-        tasks.append(async_fetch_ascends(partial_params))
-        tasks.append(async_fetch_opinions(partial_params, uid))
+        tasks.append(async_fetch_ascends(partial_params, stats))
+        tasks.append(async_fetch_opinions(partial_params, uid, stats))
+
+    # The responses alternate between the ascends and the opinions
+    for i, response in enumerate(await asyncio.gather(*tasks)):
+        (opinions if i % 2 else ascends).extend(response)
 
-    return await asyncio.gather(*tasks)
+    return (ascends, opinions, stats)
+
+
+cpdef object fetch_user_data(unsigned long long uid, set gym_ids_full, set gym_ids_partial, str climb_type, long long since = 0):
+    """Submits the fetch of the user data to the fetch layer. An identical fetch that is still in
+    flight, e.g. from a preload of the same dashboard, is shared instead of fetched twice.
+
+    Args:
+        uid (int): The user id
+        gym_ids_full (set): The gym ids to fetch the full data for
+        gym_ids_partial (set): The gym ids to fetch the changed data for
+        climb_type (str): The type of climbs to fetch
+        since (long long): Unix time from which on the changes of the partial gyms are fetched
+
+    Returns:
+        object: A concurrent future with the ascends, the opinions and the transfer stats
+    """
+    cdef tuple key = (uid, climb_type, frozenset(gym_ids_full), frozenset(gym_ids_partial), since)
+
+    with in_flight_lock:
+        future = in_flight.get(key)
+        if future is not None:
+            return future
+
+        future = in_flight[key] = submit(
+            async_fetch_user_data(uid, gym_ids_full, gym_ids_partial, climb_type, since)
+        )
+
+    # Outside the lock, the callback runs right away when the fetch already finished
+    future.add_done_callback(partial(forget_in_flight, key))
+    return future
+
+
+cpdef void forget_in_flight(tuple key, object future):
+    """Removes a finished fetch of user data from the fetches in flight
+
+    Args:
+        key (tuple): The key of the fetch
+        future (object): The finished future
+    """
+    with in_flight_lock:
+        if in_flight.get(key) is future:
+            del in_flight[key]
@@ -2,24 +2,41 @@
 cdef str PROJECT_DIRECTORY
 cdef str DATA_DIRECTORY
 cdef str USER_DATA_DIRECTORY
+cdef str LOG_DIRECTORY
+cdef str PROFILE_DIRECTORY
 cdef str DATA_DB
 cdef str UPDATE_DB
 cdef str DEFAULT_USER_DB
 cdef str USER_DB_FORMAT_STRING
-cdef str JS_VISUAL_PATH_FORMAT_STRING
+cdef str USER_SHARD_DIRECTORY
+cdef str USER_SHARD_FORMAT_STRING
 cdef str DATA_URI
 cdef str GYMS_URI
 cdef str USER_UPDATE_URI
 cdef str CSP_START
 cdef str CSP_ERROR
 cdef str CSP_DASHBOARD_FORMAT_STRING 
+cdef str CSP_DASHBOARD
 cdef dict GRADING_SYSTEMS
 cdef set FORM_FIELDS
-
-
-# Visualizations.pyx
-cdef tuple JS_VISUAL_NAMES
-cdef object CLEAN_JS_PAT
+cdef bint STREAM_DASHBOARD
+cdef str DASHBOARD_CHARTS
+cdef unsigned int DASHBOARD_CACHE_TIMEOUT
+cdef bint STALE_WHILE_REVALIDATE
+cdef double UPSTREAM_LATENCY_BUDGET
+cdef double USER_REFRESH_DEADLINE
+cdef unsigned char NR_OF_REFRESH_WORKERS
+cdef bint BACKGROUND_REFRESH
+cdef double BACKGROUND_REFRESH_RATE
+cdef unsigned short BACKGROUND_REFRESH_BURST
+cdef unsigned int BACKGROUND_REFRESH_LEAD
+cdef unsigned int ACTIVE_USER_WINDOW
+cdef bint INSTRUMENTATION
+cdef str PROFILER_TOKEN
+cdef str PROFILER_SIGNAL
+cdef unsigned short PROFILER_SECONDS
+cdef unsigned short PROFILER_MAX_SECONDS
+cdef double PROFILER_INTERVAL
 
 
 # Statistics processor.pyx
@@ -28,6 +45,12 @@ cdef unsigned char THRESHOLD_RATINGS
 
 # Engine.pyx
 cdef dict SYSTEMS
+cdef unsigned short MIN_GRADE
+cdef unsigned short MAX_GRADE
+cdef unsigned char NR_OF_CHART_GROUPS
+cdef unsigned int USER_DATA_MAX_AGE
+cdef unsigned int USER_RECONCILE_INTERVAL
+cdef unsigned int WATERMARK_OVERLAP
 
 
 # api.pyx
@@ -35,4 +58,27 @@ cdef str VERSION
 cdef str BASE_URL
 cdef str REQUEST_URL
 cdef dict ASCEND_TYPES
+cdef unsigned short MAX_CONNECTIONS_PER_HOST
+cdef double RATE_LIMIT
+cdef unsigned short RATE_LIMIT_BURST
+cdef unsigned char REQUEST_RETRIES
+cdef double REQUEST_TIMEOUT
+cdef Py_ssize_t STREAM_CHUNK_SIZE
+cdef unsigned int USER_DATA_PAGE_SIZE
+
+
+# asgi.py
+cdef unsigned char ASGI_THREADS
+
+
+# user_store.py
+cdef str USER_STORE
+cdef unsigned short NR_OF_USER_SHARDS
+
 
+# update_static_database.py
+cdef unsigned char STATIC_UPDATE_CONCURRENCY
+cdef unsigned char STATIC_UPDATE_ATTEMPTS
+cdef unsigned int STATIC_UPDATE_RETRY_DELAY
+cdef unsigned int STATIC_UPDATE_RESUME_WINDOW
+cdef unsigned int STATIC_UPDATE_HISTORY
@@ -7,14 +7,15 @@ PROJECT_DIRECTORY: Final[str]
 DATA_DIRECTORY: Final[str]
 USER_DATA_DIRECTORY: Final[str]
 LOG_DIRECTORY: Final[str]
+PROFILE_DIRECTORY: Final[str]
 
 DATA_DB: Final[str]
 UPDATE_DB: Final[str]
 
 DEFAULT_USER_DB: Final[str]
 USER_DB_FORMAT_STRING: Final[str]
-
-JS_VISUAL_PATH_FORMAT_STRING: Final[str]
+USER_SHARD_DIRECTORY: Final[str]
+USER_SHARD_FORMAT_STRING: Final[str]
 
 # Database URIs
 DATA_URI: Final[str]
@@ -25,22 +26,65 @@ USER_UPDATE_URI: Final[str]
 CSP_START: Final[str]
 CSP_ERROR: Final[str]
 CSP_DASHBOARD_FORMAT_STRING: Final[str]
-
-# visualization.pyx constants
-JS_VISUAL_NAMES: Final[tuple[str, ...]]
+CSP_DASHBOARD: Final[str]
 
 # statistics processor.pyx constants
 THRESHOLD_RATINGS: Final[int]
 
 # engine.pyx constants
 SYSTEMS: Final[dict[str, dict[str, dict[int, str]]]]
+MIN_GRADE: Final[int]
+MAX_GRADE: Final[int]
+NR_OF_CHART_GROUPS: Final[int]
+USER_DATA_MAX_AGE: Final[int]
+USER_RECONCILE_INTERVAL: Final[int]
+WATERMARK_OVERLAP: Final[int]
 
 # api.pyx constants
 VERSION: Final[str]
 BASE_URL: Final[str]
 REQUEST_URL: Final[str]
 ASCEND_TYPES: Final[dict[int, str]]
+MAX_CONNECTIONS_PER_HOST: Final[int]
+RATE_LIMIT: Final[float]
+RATE_LIMIT_BURST: Final[int]
+REQUEST_RETRIES: Final[int]
+REQUEST_TIMEOUT: Final[float]
+STREAM_CHUNK_SIZE: Final[int]
+USER_DATA_PAGE_SIZE: Final[int]
 
 # main.py constants
 GRADING_SYSTEMS: Final[dict[System, set[str]]]
 FORM_FIELDS: Final[set[str]]
+STREAM_DASHBOARD: Final[bool]
+DASHBOARD_CHARTS: Final[str]
+DASHBOARD_CACHE_TIMEOUT: Final[int]
+STALE_WHILE_REVALIDATE: Final[bool]
+UPSTREAM_LATENCY_BUDGET: Final[float]
+USER_REFRESH_DEADLINE: Final[float]
+NR_OF_REFRESH_WORKERS: Final[int]
+BACKGROUND_REFRESH: Final[bool]
+BACKGROUND_REFRESH_RATE: Final[float]
+BACKGROUND_REFRESH_BURST: Final[int]
+BACKGROUND_REFRESH_LEAD: Final[int]
+ACTIVE_USER_WINDOW: Final[int]
+INSTRUMENTATION: Final[bool]
+PROFILER_TOKEN: Final[str]
+PROFILER_SIGNAL: Final[str]
+PROFILER_SECONDS: Final[int]
+PROFILER_MAX_SECONDS: Final[int]
+PROFILER_INTERVAL: Final[float]
+
+# asgi.py constants
+ASGI_THREADS: Final[int]
+
+# user_store.py constants
+USER_STORE: Final[str]
+NR_OF_USER_SHARDS: Final[int]
+
+# update_static_database.py constants
+STATIC_UPDATE_CONCURRENCY: Final[int]
+STATIC_UPDATE_ATTEMPTS: Final[int]
+STATIC_UPDATE_RETRY_DELAY: Final[int]
+STATIC_UPDATE_RESUME_WINDOW: Final[int]
+STATIC_UPDATE_HISTORY: Final[int]
@@ -2,22 +2,23 @@
 # distutils: language=c++
 
 import os
-import re
 
 
 # Project paths
 cdef str PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(__file__))
-cdef str DATA_DIRECTORY = os.path.join(PROJECT_DIRECTORY, "data")
+# The databases, logs and profiles, the scripts and benchmarks point it at databases of their own
+cdef str DATA_DIRECTORY = os.getenv("DATA_DIRECTORY", os.path.join(PROJECT_DIRECTORY, "data"))
 cdef str USER_DATA_DIRECTORY = os.path.join(DATA_DIRECTORY, "user databases")
 cdef str LOG_DIRECTORY = os.path.join(DATA_DIRECTORY, "logs")
+cdef str PROFILE_DIRECTORY = os.path.join(DATA_DIRECTORY, "profiles")
 
 cdef str DATA_DB = os.path.join(DATA_DIRECTORY, "data.db")
 cdef str UPDATE_DB = os.path.join(DATA_DIRECTORY, "updates.db")
 
 cdef str DEFAULT_USER_DB = os.path.join(USER_DATA_DIRECTORY, "default_user.db")
 cdef str USER_DB_FORMAT_STRING = os.path.join(USER_DATA_DIRECTORY, "{}.db")
-
-cdef str JS_VISUAL_PATH_FORMAT_STRING = os.path.join(PROJECT_DIRECTORY, 'visuals', '{}.js')
+cdef str USER_SHARD_DIRECTORY = os.path.join(USER_DATA_DIRECTORY, "shards")
+cdef str USER_SHARD_FORMAT_STRING = os.path.join(USER_SHARD_DIRECTORY, "{}.db")
 
 # Database URIs
 cdef str DATA_URI = rf"file:{DATA_DB}?mode=ro"
@@ -28,29 +29,13 @@ cdef str USER_UPDATE_URI = rf"file:{UPDATE_DB}?mode=ro#user_updates"
 cdef str CSP_START = "default-src 'self'; img-src 'self'; script-src 'self' https://code.jquery.com https://cdnjs.cloudflare.com/ajax/libs/apexcharts/3.43.0/apexcharts.min.js 'sha256-5VWfW+C81JGn+ecvhWvwNSBRjrBUw91+zOefqi5fCo0=' 'sha256-aDVVMAay2NANFRPzq3S+H/U++HC/cROM0caCSNpShsY='; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src https://fonts.gstatic.com;"
 cdef str CSP_ERROR = "default-src 'self'; img-src 'self'; script-src 'self' https://code.jquery.com https://cdnjs.cloudflare.com/ajax/libs/apexcharts/3.43.0/apexcharts.min.js 'sha256-5VWfW+C81JGn+ecvhWvwNSBRjrBUw91+zOefqi5fCo0='; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src https://fonts.googleapis.com;"
 cdef str CSP_DASHBOARD_FORMAT_STRING = "default-src 'self'; img-src 'self' https://cdn1.toplogger.nu/; script-src 'self' https://code.jquery.com https://cdnjs.cloudflare.com/ajax/libs/apexcharts/3.43.0/apexcharts.min.js 'sha256-5VWfW+C81JGn+ecvhWvwNSBRjrBUw91+zOefqi5fCo0=' 'nonce-{}'; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src https://fonts.gstatic.com;"
+# The dashboard without inline scripts, its charts are rendered by a static script from the visuals API
+cdef str CSP_DASHBOARD = "default-src 'self'; img-src 'self' https://cdn1.toplogger.nu/; script-src 'self' https://code.jquery.com https://cdnjs.cloudflare.com/ajax/libs/apexcharts/3.43.0/apexcharts.min.js 'sha256-5VWfW+C81JGn+ecvhWvwNSBRjrBUw91+zOefqi5fCo0='; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src https://fonts.gstatic.com;"
 
 
 # File specific constants
 #########################
 
-# visualization.pyx
-cdef tuple JS_VISUAL_NAMES = (
-    'Ascends over time',
-    'Ascends per grade',
-    'Ascends per X',
-    'Flash rate',
-    'Flash rate per X',
-    'Grading accuracy',
-    'Max grade over time',
-    'Max grade per X',
-    'Rating accuracy',
-    'Rating per X'
-)
-
-# This regex pattern is used to remove all comments and unnecessary whitespace from the javascript code.
-cdef CLEAN_JS_PAT = re.compile(r"(?s)\s{2,}|/\*.*?\*/|//[^\r\n]*")
-
-
 # statistics processor.pyx
 cdef unsigned char THRESHOLD_RATINGS = 10
 
@@ -58,14 +43,41 @@ cdef unsigned char THRESHOLD_RATINGS = 10
 # engine.pyx
 cdef dict SYSTEMS = {'boulder': {'french': {250: '2', 275: '2+', 300: '3A', 333: '3B', 367: '3C', 400: '4A', 433: '4B', 467: '4C', 500: '5A', 517: '5A+', 533: '5B', 550: '5B+', 567: '5C', 583: '5C+', 600: '6A', 617: '6A+', 633: '6B', 650: '6B+', 667: '6C', 683: '6C+', 700: '7A', 717: '7A+', 733: '7B', 750: '7B+', 767: '7C', 783: '7C+', 800: '8A', 817: '8A+', 833: '8B', 850: '8B+', 867: '8C', 883: '8C+', 900: '9A', 917: '9A+', 933: '9B', 950: '9B+'}, 'french_rounded': {250: '2', 275: '2+', 300: '3', 333: '3+', 367: '4-', 400: '4', 433: '4+', 467: '5-', 500: '5', 550: '5+', 600: '6A', 617: '6A+', 633: '6B', 650: '6B+', 667: '6C', 683: '6C+', 700: '7A', 717: '7A+', 733: '7B', 750: '7B+', 767: '7C', 783: '7C+', 800: '8A', 817: '8A+', 833: '8B', 850: '8B+', 867: '8C', 883: '8C+', 900: '9A', 917: '9A+', 933: '9B', 950: '9B+'}, 'v_grade': {300: 'VB', 350: 'V0-', 400: 'V0', 450: 'V0+', 500: 'V1', 550: 'V2', 600: 'V3', 633: 'V4', 667: 'V5', 700: 'V6', 720: 'V7', 740: 'V8', 760: 'V9', 780: 'V10', 800: 'V11', 817: 'V12', 833: 'V13', 850: 'V14', 867: 'V15', 883: 'V16', 900: 'V17'}, 'british': {200: 'B0', 300: 'B1', 383: 'B2', 500: 'B3', 600: 'B4', 628: 'B5', 656: 'B6', 683: 'B7', 711: 'B8', 739: 'B9', 767: 'B10', 787: 'B11', 808: 'B12', 829: 'B13', 850: 'B14', 867: 'B15', 883: 'B16', 900: 'B17'}}, 'route': {'french': {250: '2', 300: '3a', 333: '3b', 367: '3c', 400: '4a', 433: '4b', 467: '4c', 500: '5a', 517: '5a+', 533: '5b', 550: '5b+', 567: '5c', 583: '5c+', 600: '6a', 617: '6a+', 633: '6b', 650: '6b+', 667: '6c', 683: '6c+', 700: '7a', 717: '7a+', 733: '7b', 750: '7b+', 767: '7c', 783: '7c+', 800: '8a', 817: '8a+', 833: '8b', 850: '8b+', 867: '8c', 883: '8c+', 900: '9a', 917: '9a+', 933: '9b', 950: '9b+'}, 'ewbank': {200: '7', 300: '8', 333: '9', 367: '10', 400: '11', 433: '12', 466: '13', 500: '14', 533: '15', 567: '16', 600: '17', 617: '18', 633: '19', 650: '20', 667: '21', 683: '22', 700: '23', 717: '24', 733: '25', 750: '26', 767: '27', 783: '28', 800: '29', 817: '30', 833: '31', 850: '32', 867: '33', 883: '34', 900: '35', 917: '36', 933: '37', 950: '38'}, 'uiaa': {200: 'III', 300: 'IV-', 344: 'IV', 389: 'IV+', 433: 'V-', 467: 'V', 492: 'V+', 521: 'VI-', 550: 'VI', 578: 'VI+', 606: 'VII-', 633: 'VII', 656: 'VII+', 678: 'VIII-', 700: 'VIII', 722: 'VIII+', 744: 'IX-', 767: 'IX', 789: 'IX+', 811: 'X-', 833: 'X', 856: 'X+', 878: 'XI-', 900: 'XI', 922: 'XI+', 944: 'XII-'}, 'yds': {200: '5.3', 300: '5.4', 400: '5.5', 433: '5.6', 467: '5.7', 500: '5.8', 533: '5.9', 567: '5.10a', 600: '5.10b', 617: '5.10c', 633: '5.10d', 650: '5.11a', 667: '5.11b', 683: '5.11c', 700: '5.11d', 717: '5.12a', 733: '5.12b', 750: '5.12c', 767: '5.12d', 783: '5.13a', 800: '5.13b', 817: '5.13c', 833: '5.13d', 850: '5.14a', 867: '5.14b', 883: '5.14c', 900: '5.14d', 917: '5.15a', 933: '5.15b', 950: '5.15c'}}}
 
+# Range of the TopLogger grade values, grades outside this range have no counterpart in a grading system
+cdef unsigned short MIN_GRADE = 200
+cdef unsigned short MAX_GRADE = 1000
+
+# Number of groups of charts the dashboard fetches in parallel from the visuals API
+cdef unsigned char NR_OF_CHART_GROUPS = 3
+
+# Seconds after which a request syncs the user data of a gym again
+cdef unsigned int USER_DATA_MAX_AGE = 43200
+
+# Seconds between the reconciliations of the user data of a gym, a full fetch that also finds the deleted
+# ascends and opinions. In between, only the ascends and opinions changed since the watermark of the gym are fetched
+cdef unsigned int USER_RECONCILE_INTERVAL = int(os.getenv("USER_RECONCILE_INTERVAL", "2592000"))
+
+# Seconds a fetch of the changes reaches back before the watermark, for the clock skew with TopLogger
+cdef unsigned int WATERMARK_OVERLAP = 3600
+
 
 
 # api.pyx
 cdef str VERSION = "v1"
-cdef str BASE_URL = "https://api.toplogger.nu"
+cdef str BASE_URL = os.getenv("TOPLOGGER_BASE_URL", "https://api.toplogger.nu")
 cdef str REQUEST_URL = str(f"{BASE_URL}/{VERSION}")
 cdef dict ASCEND_TYPES = {1: "Redpoint", 2: "Flash", 3: "Onsight"}
 
+# Limits of the fetch layer, every request to TopLogger passes through them
+cdef unsigned short MAX_CONNECTIONS_PER_HOST = int(os.getenv("TOPLOGGER_MAX_CONNECTIONS_PER_HOST", "8"))
+cdef double RATE_LIMIT = float(os.getenv("TOPLOGGER_RATE_LIMIT", "20"))  # Requests per second, 0 disables the limit
+cdef unsigned short RATE_LIMIT_BURST = int(os.getenv("TOPLOGGER_RATE_LIMIT_BURST", "20"))
+cdef unsigned char REQUEST_RETRIES = 5
+cdef double REQUEST_TIMEOUT = 30.0
+cdef Py_ssize_t STREAM_CHUNK_SIZE = 5000  # Rows per chunk of a streamed response
+# Records per page of the ascends and opinions of a user, 0 to request them in a single response
+cdef unsigned int USER_DATA_PAGE_SIZE = int(os.getenv("TOPLOGGER_PAGE_SIZE", "1000"))
+
 
 # main.py
 cdef dict GRADING_SYSTEMS = {
@@ -75,5 +87,82 @@ cdef dict GRADING_SYSTEMS = {
 
 cdef set FORM_FIELDS = {"uid", "climb-type", "grading-system", "remember-me", "name"}
 
+# Send the dashboard in chunks, the stats row first and every chart as soon as it is computed
+cdef bint STREAM_DASHBOARD = os.getenv("STREAM_DASHBOARD", "1") != "0"
+
+# Where the dashboard gets its charts, "api" to fetch the chart data from the visuals API or "inline" to render them in the page
+cdef str DASHBOARD_CHARTS = os.getenv("DASHBOARD_CHARTS", "api")
+
+# Seconds a dashboard and its chart data stay cached. The keys change with the user and static data,
+# so the timeout only bounds how long the user data of a page that is not preloaded goes unchecked
+cdef unsigned int DASHBOARD_CACHE_TIMEOUT = 21600
+
+# Render the dashboard of a user with local data right away when the refresh is slow or fails, the refresh continues in the background
+cdef bint STALE_WHILE_REVALIDATE = os.getenv("STALE_WHILE_REVALIDATE", "0") != "0"
+
+# Seconds a request of a user with local data waits for the refresh, in stale-while-revalidate mode
+cdef double UPSTREAM_LATENCY_BUDGET = float(os.getenv("UPSTREAM_LATENCY_BUDGET", "1.5"))
+
+# Seconds after which the refresh of a user gives up on the TopLogger API, 0 to wait for it
+cdef double USER_REFRESH_DEADLINE = float(os.getenv("USER_REFRESH_DEADLINE", "60"))
+
+# Threads that run the refreshes in the background
+cdef unsigned char NR_OF_REFRESH_WORKERS = 4
+
+# Refresh the user data of active users in the background, before a request finds it expired
+cdef bint BACKGROUND_REFRESH = os.getenv("BACKGROUND_REFRESH", "1") != "0"
+
+# Background refreshes per second and their maximum burst, per process. 0 disables the limit
+cdef double BACKGROUND_REFRESH_RATE = float(os.getenv("BACKGROUND_REFRESH_RATE", "0.5"))
+cdef unsigned short BACKGROUND_REFRESH_BURST = 10
+
+# Seconds before the user data expires that it is refreshed in the background
+cdef unsigned int BACKGROUND_REFRESH_LEAD = 3600
+
+# Seconds after the last visit of a user that the user data is kept fresh in the background
+cdef unsigned int ACTIVE_USER_WINDOW = int(os.getenv("ACTIVE_USER_WINDOW", "604800"))
+
+# Time the stages of every request into a Server-Timing header and the histograms served at /metrics
+cdef bint INSTRUMENTATION = os.getenv("INSTRUMENTATION", "0") != "0"
+
+# Bearer token of the admin endpoint that profiles the worker, the endpoint does not exist without it
+cdef str PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+
+# Name of the signal, e.g. SIGUSR2, on which a worker profiles itself, no handler is installed without it
+cdef str PROFILER_SIGNAL = os.getenv("PROFILER_SIGNAL", "")
+
+# Seconds of a profile of the signal handler and the default of the endpoint, and the most the endpoint allows
+cdef unsigned short PROFILER_SECONDS = int(os.getenv("PROFILER_SECONDS", "30"))
+cdef unsigned short PROFILER_MAX_SECONDS = 300
+
+# Seconds between the samples of a profile
+cdef double PROFILER_INTERVAL = 0.01
+
+
+# asgi.py
+# Threads per worker that run the views, the SQLite work and the charts, while the event loop awaits TopLogger
+cdef unsigned char ASGI_THREADS = int(os.getenv("ASGI_THREADS", "8"))
+
+
+# user_store.py
+# Backend of the user data, "files" for a database per user or "shards" for the sharded store
+cdef str USER_STORE = os.getenv("USER_STORE", "files")
+cdef unsigned short NR_OF_USER_SHARDS = int(os.getenv("USER_STORE_SHARDS", "16"))
+
+
+# update_static_database.py
+# Gyms updated at the same time by the nightly run, the requests also pass the limits of the fetch layer
+cdef unsigned char STATIC_UPDATE_CONCURRENCY = int(os.getenv("STATIC_UPDATE_CONCURRENCY", "4"))
+
+# Attempts of the update of a gym and the seconds between them
+cdef unsigned char STATIC_UPDATE_ATTEMPTS = 3
+cdef unsigned int STATIC_UPDATE_RETRY_DELAY = 300
+
+# Seconds after its start that a run is resumed by a restart, a later start plans a new run
+cdef unsigned int STATIC_UPDATE_RESUME_WINDOW = 72000
+
+# Seconds the progress of a run is kept
+cdef unsigned int STATIC_UPDATE_HISTORY = 2592000
+
 
 
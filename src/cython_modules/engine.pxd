@@ -2,12 +2,16 @@
 
 cdef tuple SINGLE_GYM_CHART_FUNCTIONS
 cdef tuple MULTIPLE_GYM_VISUALS
+cdef tuple SINGLE_GYM_CHART_GROUPS
+cdef tuple MULTIPLE_GYM_CHART_GROUPS
+cdef dict CHART_STAGES
 cdef dict GRADING_SYSTEMS
-cdef object loop
 cdef str USER_UPDATES_QUERY
 
 
 cdef class GradingSystem:
     cdef readonly str climb_type
-    cdef readonly tuple integers, strings, ascend_types, ascend_colors
+    cdef readonly tuple integers, strings, ascend_types, ascend_colors, indices
     cdef readonly bint route
+
+    cdef tuple build_indices(self)
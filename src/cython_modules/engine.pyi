@@ -1,7 +1,9 @@
-from typing import Annotated, TypeAlias
+from collections.abc import Iterator
+from typing import Annotated, Any, TypeAlias
 from sqlite3 import Connection
 
-from src.custom_types import ClimbType, GymsRow
+from src.custom_types import AscendsJson, ClimbType, GymsRow, OpinionsJson
+from src.database import StaticDataWriter
 
 u64: TypeAlias = Annotated[int, "64-bit unsigned integer"]
 u16: TypeAlias = Annotated[int, "16-bit unsigned integer"]
@@ -13,16 +15,41 @@ class GradingSystem:
     ascend_types: tuple[str, ...]
     ascend_colors: tuple[str, ...]
     route: bool
+    indices: tuple[int | None, ...]
 
     def __init__(self, climb_type: ClimbType, grading_system: str) -> None: ...
     def get_closest(self, item: u16) -> int | None: ...
 
-def update_climbs(requested_gyms: set[u16], only_active: bool) -> None: ...
-def update_walls(requested_gyms: set[u16]) -> None: ...
-def update_gyms() -> None: ...
+def update_climbs(requested_gyms: set[u16], only_active: bool, writer: StaticDataWriter | None = None) -> None: ...
+def update_walls(requested_gyms: set[u16], writer: StaticDataWriter | None = None) -> None: ...
+def update_gyms(writer: StaticDataWriter | None = None) -> None: ...
+def plan_user_update(
+    uid: u64, climb_type: ClimbType, requested_gyms: tuple[u16, ...], db_didnt_existed: bool, max_age: int = ...
+) -> tuple[set[u16], set[u16], int, int] | None: ...
+def store_user_update(
+    conn: Connection,
+    uid: u64,
+    climb_type: ClimbType,
+    plan: tuple[set[u16], set[u16], int, int],
+    db_didnt_existed: bool,
+    ascends: list[AscendsJson],
+    opinions: list[OpinionsJson],
+) -> int: ...
 def update_user_data(
-    conn: Connection, uid: u64, climb_type: ClimbType, requested_gyms: tuple[u16, ...], db_didnt_existed: bool
-) -> None: ...
+    conn: Connection,
+    uid: u64,
+    climb_type: ClimbType,
+    requested_gyms: tuple[u16, ...],
+    db_didnt_existed: bool,
+    deadline: float = 0,
+    max_age: int = ...,
+) -> tuple[int, int, int]: ...
 def create_visuals(
     conn: Connection, uid: u64, gwa: list[GymsRow], climb_type: ClimbType, grading_system: str
-) -> tuple[list[str], list[tuple[str, str]]]: ...
+) -> tuple[list[str], list[dict[str, Any]]]: ...
+def iter_visuals(
+    conn: Connection, uid: u64, gwa: list[GymsRow], climb_type: ClimbType, grading_system: str, group: int | None = None
+) -> Iterator[list[str] | dict[str, Any]]: ...
+def iter_chart_groups(
+    conn: Connection, uid: u64, gwa: list[GymsRow], climb_type: ClimbType, grading_system: str
+) -> Iterator[list[str] | list[dict[str, Any]]]: ...
@@ -1,15 +1,19 @@
 # cython: language_level=3, binding=False, boundscheck=False, wraparound=False, initializedcheck=False, nonecheck=False, infer_types=False, profile=False, cdivision=False, type_version_tag=False, unraisable_tracebacks=False
 # distutils: language=c++
 
-import asyncio
+import time
 
+from itertools import chain
 from threading import Thread
 
-from src.cython_modules.api import async_fetch_user_data, fetch_climbs, fetch_walls, fetch_gyms
+from src.cython_modules.api import fetch_user_data, fetch_climbs_streamed, fetch_walls, fetch_gyms
 from src.cython_modules import statistics_processor as stats
+from src.cython_modules.aggregates import load_aggregates
 from src.cython_modules.constants import SYSTEMS
+from src.cython_modules.constants cimport MIN_GRADE, MAX_GRADE, NR_OF_CHART_GROUPS, USER_DATA_MAX_AGE, WATERMARK_OVERLAP
 
-from src.database import add_climbs, add_walls, add_gyms, add_ascends, add_opinions, add_user_update, drop_ascends_and_opinions, retrieve_user_updates
+from src.database import add_climbs, add_walls, add_gyms, add_ascends, add_opinions, bump_gym_versions, bump_user_versions, prune_ascends_and_opinions, record_user_sync, retrieve_user_update_sizes
+from src.instrumentation import stage
 
 # Define the wanted visuals for faster looping and access
 cdef tuple SINGLE_GYM_CHART_FUNCTIONS = (
@@ -41,6 +45,27 @@ cdef tuple MULTIPLE_GYM_VISUALS = (
     stats.flash_rate_per_gym
 )
 
+
+cdef tuple split_in_groups(tuple functions):
+    """ Splits the chart functions in NR_OF_CHART_GROUPS groups of consecutive charts
+
+    Arguments:
+        functions (tuple): The chart functions
+
+    Returns:
+        tuple: The groups of chart functions
+    """
+    cdef Py_ssize_t size = -(-len(functions) // NR_OF_CHART_GROUPS)
+    return tuple(functions[i * size:(i + 1) * size] for i in range(NR_OF_CHART_GROUPS))
+
+
+# The dashboard fetches the groups of charts in parallel
+cdef tuple SINGLE_GYM_CHART_GROUPS = split_in_groups(SINGLE_GYM_CHART_FUNCTIONS)
+cdef tuple MULTIPLE_GYM_CHART_GROUPS = split_in_groups(MULTIPLE_GYM_VISUALS)
+
+# The name of every chart function in the timings of a request
+cdef dict CHART_STAGES = {func: f"chart.{func.__name__}" for func in SINGLE_GYM_CHART_FUNCTIONS + MULTIPLE_GYM_VISUALS}
+
 # Initialize the grading systems for faster access
 cdef dict GRADING_SYSTEMS = {
     ("boulder", "french"): GradingSystem("boulder", "french"),
@@ -53,72 +78,174 @@ cdef dict GRADING_SYSTEMS = {
     ("route", "yds"): GradingSystem("route", "yds")
 }
 
-cdef object loop = asyncio.new_event_loop()
-
-cdef str USER_UPDATES_QUERY = """
-    WITH requested_gyms AS (
-        {}
-    )
-    SELECT
-        rg.gym_id,
-        CASE
-            WHEN MAX(uu.update_timestamp) IS NULL THEN 1
-            WHEN MAX(uu.update_timestamp) < strftime('%s','now') - 604800 THEN 1
-            WHEN MAX(uu.update_timestamp) < strftime('%s','now') - 43200 THEN 0
-        END AS update_size
-    FROM requested_gyms rg
-    LEFT JOIN user_updates uu
-        ON rg.gym_id = uu.gym_id AND uu.uid = ? AND uu.type = ?
-    GROUP BY rg.gym_id
-    HAVING update_size IS NOT NULL;
-"""
-
-
-cpdef void update_climbs(set requested_gyms, bint only_active):
-    add_climbs(fetch_climbs(requested_gyms, only_active))
-
-cpdef void update_walls(set requested_gyms):
+
+cpdef void update_climbs(set requested_gyms, bint only_active, object writer = None):
+    # Stream the climbs into the database, big gyms return tens of thousands of climbs
+    cdef object climbs = chain.from_iterable(fetch_climbs_streamed(requested_gyms, only_active))
+
+    # The writer of a cron run stages the climbs and bumps the versions when it flushes
+    if writer is not None:
+        writer.add_climbs(climbs)
+        return
+
+    add_climbs(climbs)
+    bump_gym_versions(requested_gyms)
+
+cpdef void update_walls(set requested_gyms, object writer = None):
+    if writer is not None:
+        writer.add_walls(fetch_walls(requested_gyms))
+        return
+
     add_walls(fetch_walls(requested_gyms))
+    bump_gym_versions(requested_gyms)
+
+cpdef void update_gyms(object writer = None):
+    if writer is not None:
+        writer.add_gyms(fetch_gyms())
+        return
 
-cpdef void update_gyms():
     add_gyms(fetch_gyms())
 
-cpdef void update_user_data(object conn, unsigned long long uid, str climb_type, tuple requested_gyms, bint db_didnt_existed):
+cpdef tuple plan_user_update(unsigned long long uid, str climb_type, tuple requested_gyms, bint db_didnt_existed, unsigned int max_age = USER_DATA_MAX_AGE):
+    """ Plans the fetch of the user data of the gyms that have updates since the last fetch
+
+    Of a gym that was synced before, only the ascends and opinions that changed since its watermark
+    are fetched. Every ascend and opinion is fetched for a new gym and for the scheduled
+    reconciliation, which also deletes the rows that were deleted at TopLogger.
+
+    Arguments:
+        uid (unsigned long long): The id of the user
+        climb_type (str): The type of the climb
+        requested_gyms (tuple): The ids of the requested gyms
+        db_didnt_existed (bint): Whether the user is new, then the data of every gym is fetched
+        max_age (unsigned int): Seconds after which the data of a gym is synced again
+
+    Returns:
+        tuple: The gyms to fetch fully, the gyms to fetch the changes of, the time from which on the
+            changes are fetched and the time of the sync. None if no gym has to be fetched
+    """
     cdef set gyms_big_update = set()
     cdef set gyms_small_update = set()
-    cdef dict gyms_update_database
-    cdef list response_big = [[], []]
-    cdef list response_small = [[], []]
-    cdef bint delete = 0
+    cdef long long since = 0
 
     if db_didnt_existed:
         gyms_big_update = set(requested_gyms)
     else:
-        gym_ids_union = ' UNION ALL '.join([f"SELECT {gym_id} AS gym_id" for gym_id in requested_gyms])
-        for g in retrieve_user_updates(USER_UPDATES_QUERY.format(gym_ids_union=gym_ids_union), (uid, climb_type)):
+        with stage("sync_lookup"):
+            sizes = retrieve_user_update_sizes(uid, climb_type, requested_gyms, max_age)
+
+        for g in sizes:
             if g[1] == 1:
                 gyms_big_update.add(g[0])
             else:
                 gyms_small_update.add(g[0])
-
-        if gyms_big_update:
-            delete = 1
+                # A single fetch for the changes of every gym, from the oldest watermark on
+                since = g[2] if since == 0 else min(since, g[2])
 
     if not (gyms_big_update or gyms_small_update):
-        return
+        return None
+
+    if gyms_small_update:
+        since = max(since - WATERMARK_OVERLAP, 0)
+
+    # A fetch in flight that is joined started earlier, the overlap of the watermark covers the difference
+    return (gyms_big_update, gyms_small_update, since, int(time.time()))
+
+
+cpdef Py_ssize_t store_user_update(object conn, unsigned long long uid, str climb_type, tuple plan, bint db_didnt_existed, list ascends, list opinions):
+    """ Writes the fetched user data into the user database and records the sync of its gyms
+
+    Rows that are stored already, unchanged, are not written. The main table is only marked as
+    outdated when rows changed.
+
+    Arguments:
+        conn (object): The connection to the user database
+        uid (unsigned long long): The id of the user
+        climb_type (str): The type of the climb
+        plan (tuple): The plan of the fetch, see plan_user_update
+        db_didnt_existed (bint): Whether the user is new
+        ascends (list): The fetched ascends
+        opinions (list): The fetched opinions
+
+    Returns:
+        Py_ssize_t: The number of written rows
+    """
+    cdef set gyms_big_update = plan[0]
+    cdef set gyms_small_update = plan[1]
+    cdef Py_ssize_t changed = 0
+
+    with stage("add_ascends"):
+        changed = add_ascends(conn, ascends)
+    with stage("add_opinions"):
+        changed += add_opinions(conn, opinions)
+
+    if gyms_big_update and not db_didnt_existed:
+        # The big update fetched every ascend and opinion of its gyms, the rows it misses were deleted
+        with stage("prune"):
+            changed += prune_ascends_and_opinions(
+                conn, gyms_big_update, [a[0] for a in ascends], [o[0] for o in opinions]
+            )
+
+    if changed:
+        bump_user_versions(conn, gyms_big_update.union(gyms_small_update))
+
+    record_user_sync(uid, climb_type, gyms_big_update, gyms_small_update, plan[3])
+
+    return changed
+
+
+cpdef tuple update_user_data(object conn, unsigned long long uid, str climb_type, tuple requested_gyms, bint db_didnt_existed, double deadline = 0, unsigned int max_age = USER_DATA_MAX_AGE):
+    """ Fetches the user data of the gyms that have updates since the last fetch into the user database
+
+    Arguments:
+        conn (object): The connection to the user database
+        uid (unsigned long long): The id of the user
+        climb_type (str): The type of the climb
+        requested_gyms (tuple): The ids of the requested gyms
+        db_didnt_existed (bint): Whether the user is new, then the data of every gym is fetched
+        deadline (double): Seconds to wait for the TopLogger API, 0 to wait until it responds
+        max_age (unsigned int): Seconds after which the data of a gym is synced again
 
-    while loop.is_running():
-        pass
+    Raises:
+        TimeoutError: The TopLogger API did not respond within the deadline
 
-    response = loop.run_until_complete(async_fetch_user_data(uid, gyms_big_update, gyms_small_update, climb_type))
+    Returns:
+        tuple: The number of written rows, of fetched records and of fetched bytes
+    """
+    cdef tuple plan = plan_user_update(uid, climb_type, requested_gyms, db_didnt_existed, max_age)
+    cdef object future
+    cdef list ascends
+    cdef list opinions
+    cdef object transfer
+    cdef Py_ssize_t changed
 
-    if delete:
-        drop_ascends_and_opinions(conn, gyms_big_update)
+    if plan is None:
+        return (0, 0, 0)
 
-    add_ascends(conn, response[0])
-    add_opinions(conn, response[1])
+    # The fetch runs on the loop of the fetch layer, an identical fetch in flight is shared
+    with stage("upstream"):
+        future = fetch_user_data(uid, plan[0], plan[1], climb_type, plan[2])
+        # A caller past its deadline leaves the fetch to finish for the other callers that share it,
+        # its update is not recorded, so the next request fetches the data again
+        ascends, opinions, transfer = future.result(deadline if deadline > 0 else None)
 
-    add_user_update(uid, climb_type, gyms_big_update.union(gyms_small_update))
+    changed = store_user_update(conn, uid, climb_type, plan, db_didnt_existed, ascends, opinions)
+    return (changed, transfer.records, transfer.body_bytes)
+
+
+cdef object chart(object func, object aggregates, object GS):
+    """ Computes a chart, timed as a stage of the request
+
+    Arguments:
+        func (object): The chart function
+        aggregates (object): The aggregates of the main table
+        GS (object): The grading system
+
+    Returns:
+        dict: The chart data, None if there is no data for the chart
+    """
+    with stage(CHART_STAGES[func]):
+        return func(aggregates, GS)
 
 
 cpdef tuple create_visuals(object conn, unsigned long long uid, list gwa, str climb_type, str grading_system):
@@ -138,29 +265,84 @@ cdef tuple _create_visuals(object conn, unsigned long long uid, list gwa, str cl
     Returns:
         tuple: The static stats and the visuals
     """
-    cdef list static_stats
-    cdef list visuals = []
+    cdef object visuals = iter_visuals(conn, uid, gwa, climb_type, grading_system)
+    cdef list static_stats = next(visuals)
+
+    return (static_stats, list(visuals))
+
+
+def iter_visuals(object conn, unsigned long long uid, list gwa, str climb_type, str grading_system, object group = None):
+    """ Creates the visuals for the dashboard one by one, so they can be sent as soon as they are ready
+
+    The main table is read when the static stats are requested, the charts are computed from the
+    aggregates in memory. The connection can thus be closed once the static stats are yielded.
+
+    Arguments:
+        conn (object): The connection to the database
+        uid (unsigned long long): The id of the user
+        gwa (list): The gyms with ascends
+        climb_type (str): The type of the climb
+        grading_system (str): The grading system
+        group (int | None): The group of charts to create, None for every chart
+
+    Yields:
+        list | dict: The static stats, then the chart data of every visual
+    """
     cdef object func
-    cdef str gym_sql_string
+    cdef object aggregates
+    cdef tuple functions
 
     cdef object GS = GRADING_SYSTEMS[(climb_type, grading_system)]
 
-    # Create the string that we can inject into the SQL query
-    gym_sql_string = str(tuple(g[0] for g in gwa)).replace(',)', ')')
-
-    # Create the cursor
-    c = conn.cursor()
+    # Load the main table once, every statistic and chart is computed from these aggregates
+    with stage("aggregates"):
+        aggregates = load_aggregates(conn.cursor(), climb_type, tuple(g[0] for g in gwa), GS.indices)
 
     # Create the stats for the first row
-    static_stats = stats.number_of_ascends(c, uid, gym_sql_string, GS) + stats.top_grade(c, uid, gym_sql_string, GS)
+    with stage("stats"):
+        static_stats = stats.number_of_ascends(aggregates, GS) + stats.top_grade(aggregates, GS)
+    yield static_stats
 
-    # Create all charts, if there is only one gym, we loop over the single gym charts, otherwise we loop over the multiple gym charts
-    for func in SINGLE_GYM_CHART_FUNCTIONS if len(gwa) == 1 else MULTIPLE_GYM_VISUALS:
-        viz = func(c, uid, gym_sql_string, GS)
+    # Create the charts, if there is only one gym, we loop over the single gym charts, otherwise we loop over the multiple gym charts
+    if group is None:
+        functions = SINGLE_GYM_CHART_FUNCTIONS if len(gwa) == 1 else MULTIPLE_GYM_VISUALS
+    else:
+        functions = (SINGLE_GYM_CHART_GROUPS if len(gwa) == 1 else MULTIPLE_GYM_CHART_GROUPS)[group]
+
+    for func in functions:
+        viz = chart(func, aggregates, GS)
         if viz: 
-            visuals.append(viz)
+            yield viz
+
 
-    return (static_stats, visuals)
+def iter_chart_groups(object conn, unsigned long long uid, list gwa, str climb_type, str grading_system):
+    """ Creates the static stats and the charts of every group from a single read of the main table
+
+    Arguments:
+        conn (object): The connection to the database
+        uid (unsigned long long): The id of the user
+        gwa (list): The gyms with ascends
+        climb_type (str): The type of the climb
+        grading_system (str): The grading system
+
+    Yields:
+        list: The static stats, then the chart data of the visuals of every group
+    """
+    cdef object func
+    cdef object aggregates
+    cdef tuple functions
+
+    cdef object GS = GRADING_SYSTEMS[(climb_type, grading_system)]
+
+    with stage("aggregates"):
+        aggregates = load_aggregates(conn.cursor(), climb_type, tuple(g[0] for g in gwa), GS.indices)
+
+    with stage("stats"):
+        static_stats = stats.number_of_ascends(aggregates, GS) + stats.top_grade(aggregates, GS)
+    yield static_stats
+
+    for functions in SINGLE_GYM_CHART_GROUPS if len(gwa) == 1 else MULTIPLE_GYM_CHART_GROUPS:
+        yield [viz for viz in (chart(func, aggregates, GS) for func in functions) if viz]
 
 
 cdef class GradingSystem:
@@ -173,6 +355,8 @@ cdef class GradingSystem:
         ascend_types (tuple): The types of the ascends
         ascend_colors (tuple): The colors of the ascends
         route (bint): Whether the climb is a route
+        indices (tuple): The index of the closest integer for every grade value up to MAX_GRADE,
+            None for grade values below MIN_GRADE
     """
 
     def __cinit__(self, climb_type: str, grading_system: str):
@@ -182,6 +366,29 @@ cdef class GradingSystem:
         self.ascend_types = ("Flash", "Redpoint") if climb_type == "boulder" else ("Onsight", "Flash", "Redpoint")
         self.ascend_colors = ("#df007a", "#ffa4ff") if climb_type == "boulder" else ("#B50060", "#df007a", "#ffa4ff")
         self.route = climb_type == "route"
+        self.indices = self.build_indices()
+
+    cdef tuple build_indices(self):
+        """Builds the dense lookup array from grade value to the index of the closest integer
+
+        The integers are sorted, so a single sweep over the grade values suffices. The next
+        integer is taken as soon as it is strictly closer, thus ties go to the lower integer,
+        as they did with the linear scan.
+
+        Returns:
+            tuple: The index per grade value
+        """
+        cdef list indices = [None] * MIN_GRADE
+        cdef Py_ssize_t i = 0
+        cdef Py_ssize_t last = len(self.integers) - 1
+        cdef unsigned short grade
+
+        for grade in range(MIN_GRADE, MAX_GRADE + 1):
+            while i < last and abs(self.integers[i + 1] - grade) < abs(self.integers[i] - grade):
+                i += 1
+            indices.append(i)
+
+        return tuple(indices)
 
     def get_closest(self, unsigned short item):
         """Gets the closest integer to the item
@@ -193,5 +400,5 @@ cdef class GradingSystem:
             int: The closest integer
         """
         if item == 0: return
+        if MIN_GRADE <= item <= MAX_GRADE: return self.indices[item]
         return min(range(len(self.integers)), key=lambda i: abs(self.integers[i] - item))
-
@@ -1,2 +1 @@
-cdef list retrieve_data(object cursor, str q)
 cdef list create_series(bint route)
@@ -1,214 +1,182 @@
-from ctypes import c_uint64 as u64
-from sqlite3 import Cursor
+from types import ModuleType
+from typing import Any
 
+from src.cython_modules.aggregates import Aggregates
 from src.cython_modules.engine import GradingSystem
 
-def top_grade(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> list[tuple[str, str]]:
+# The visualizations module, which creates the charts of the statistics
+vis: ModuleType
+
+def top_grade(aggregates: Aggregates, system: GradingSystem) -> list[tuple[str, str]]:
     """Retrieves the top grade for each ascend type and returns the stats
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
         list: The top grade for each ascend type
     """
 
-def number_of_ascends(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> list[tuple[str, str]]:
+def number_of_ascends(aggregates: Aggregates, system: GradingSystem) -> list[tuple[str, str]]:
     """Retrieves the number of ascends for each ascend type and returns the stats
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
         list: The number of ascends for each ascend type
     """
 
-def flash_rate(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def flash_rate(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the flash rate for each ascend type and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the flash rate for each ascend type
+        dict: The visual with the flash rate for each ascend type
     """
 
-def max_grade_over_time(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def max_grade_over_time(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the max grade over time and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the max grade over time
+        dict: The visual with the max grade over time
     """
 
-def ascends_over_time(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple:
+def ascends_over_time(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the ascends over time and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the ascends over time
+        dict: The visual with the ascends over time
     """
 
-def ascends_per_grade(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def ascends_per_grade(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the ascends per grade and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the ascends per grade
+        dict: The visual with the ascends per grade
     """
 
-def flash_rate_per_grade(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def flash_rate_per_grade(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Wrapper function which uses the flash_rate_per_x to retrieve the flash rate per grade
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the flash rate per grade
+        dict: The visual with the flash rate per grade
     """
 
-def grading_accuracy(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def grading_accuracy(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the grading accuracy and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the grading accuracy
+        dict: The visual with the grading accuracy
     """
 
-def rating_accuracy(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def rating_accuracy(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the rating accuracy and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the rating accuracy
+        dict: The visual with the rating accuracy
     """
 
-def number_of_ascends_per_x(cursor: Cursor, uid: u64, query: str, system: GradingSystem) -> tuple:
+def number_of_ascends_per_x(data: list[tuple], system: GradingSystem) -> tuple:
     """Retrieves the number of ascends per x and returns the data
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        query (str): The query
+        data (list): The aggregated rows
         system (GradingSystem): The system
 
     Returns:
         tuple: The data with the number of ascends per x
     """
 
-def number_of_ascends_per_wall(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def number_of_ascends_per_wall(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the number of ascends per wall and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the number of ascends per wall
+        dict: The visual with the number of ascends per wall
     """
 
-def number_of_ascends_per_gym(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def number_of_ascends_per_gym(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the number of ascends per gym and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the number of ascends per gym
+        dict: The visual with the number of ascends per gym
     """
 
-def max_grade_per_x(cursor: Cursor, uid: u64, sql_gyms: str, query: str, system: GradingSystem) -> tuple:
+def max_grade_per_x(data: list[tuple], system: GradingSystem) -> tuple:
     """Retrieves the max grade per x and returns the data
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
-        query (str): The query
+        data (list): The aggregated rows
         system (GradingSystem): The system
 
     Returns:
         tuple: The data with the max grade per x
     """
 
-def max_grade_per_wall(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def max_grade_per_wall(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the max grade per wall and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the max grade per wall
+        dict: The visual with the max grade per wall
     """
 
-def max_grade_per_gym(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def max_grade_per_gym(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the max grade per gym and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the max grade per gym
+        dict: The visual with the max grade per gym
     """
 
-def flash_rate_per_x(
-    cursor: Cursor, uid: u64, sql_gyms: str, query: str, system: GradingSystem, label_is_grade: bool = False
-) -> tuple:
+def flash_rate_per_x(data: list[tuple], system: GradingSystem, label_is_grade: bool = False) -> tuple:
     """Retrieves the flash rate per x and returns the data
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
-        query (str): The query
+        data (list): The aggregated rows
         system (GradingSystem): The system
         label_is_grade (bool): Whether the labels are grades
 
@@ -216,81 +184,68 @@ def flash_rate_per_x(
         tuple: The data with the flash rate per x
     """
 
-def flash_rate_per_wall(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def flash_rate_per_wall(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the flash rate per wall and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the flash rate per wall
+        dict: The visual with the flash rate per wall
     """
 
-def flash_rate_per_gym(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def flash_rate_per_gym(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the flash rate per gym and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the flash rate per gym
+        dict: The visual with the flash rate per gym
     """
 
-def rating_per_x(cursor: Cursor, uid: u64, sql_gyms: str, query: str, system: GradingSystem) -> tuple:
+def rating_per_x(data: list[tuple], system: GradingSystem) -> tuple:
     """Retrieves the rating per x and returns the data
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
-        query (str): The query
+        data (list): The aggregated rows
         system (GradingSystem): The system
 
     Returns:
         tuple: The data with the rating per x
     """
 
-def rating_per_ascends_type(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def rating_per_ascends_type(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the rating per ascend type and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the rating per ascend type
+        dict: The visual with the rating per ascend type
     """
 
-def rating_per_wall(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def rating_per_wall(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the rating per wall and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the rating per wall
+        dict: The visual with the rating per wall
     """
 
-def rating_per_gym(cursor: Cursor, uid: u64, sql_gyms: str, system: GradingSystem) -> tuple[str, str]:
+def rating_per_gym(aggregates: Aggregates, system: GradingSystem) -> dict[str, Any] | None:
     """Retrieves the rating per gym and returns the visual
 
     Arguments:
-        cursor (Cursor): The database cursor
-        uid (u64): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (GradingSystem): The system
 
     Returns:
-        tuple: The visual with the rating per gym
+        dict: The visual with the rating per gym
     """
@@ -2,23 +2,10 @@
 # distutils: language=c++
 
 from src.cython_modules import visualizations as vis
+from src.cython_modules.aggregates cimport Aggregates
 from src.cython_modules.constants cimport THRESHOLD_RATINGS
 
 
-cdef list retrieve_data(object cursor, str q):
-    """Retrieves the data from the database
-
-    Arguments:
-        cursor (object): The database cursor
-        q (str): The query to execute
-
-    Returns:
-        list: The data from the database
-    """
-    cursor.execute(q)
-    return cursor.fetchall()
-
-
 cdef list create_series(bint route):
     """Creates the series for the chart
 
@@ -40,76 +27,49 @@ cdef list create_series(bint route):
     ]
 
 
-cpdef list top_grade(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef list top_grade(Aggregates aggregates, object system):
     """Retrieves the top grade for each ascend type and returns the stats
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
         list: The top grade for each ascend type
     """
-    cdef dict result = {item[0]: item[1] for item in retrieve_data(cursor, f"""
-        SELECT ascend_type, MAX(grade)
-        FROM main
-        WHERE grade IS NOT NULL
-        AND gym_id IN {sql_gyms}
-        GROUP BY ascend_type
-    """)}
+    cdef dict result = aggregates.top_grade
 
     return [(system.strings[result[ascend_type]], f"Max grade {ascend_type.lower()}")
             for ascend_type in system.ascend_types[::-1] if ascend_type in result]
 
 
-cpdef list number_of_ascends(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef list number_of_ascends(Aggregates aggregates, object system):
     """Retrieves the number of ascends for each ascend type and returns the stats
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
         list: The number of ascends for each ascend type
     """
-    cdef dict result = {item[0]: item[1] for item in retrieve_data(cursor, f"""
-        SELECT ascend_type, COUNT(ascend_type)
-        FROM main
-        WHERE grade IS NOT NULL
-        AND gym_id IN {sql_gyms}
-        GROUP BY ascend_type
-    """)}
+    cdef dict result = aggregates.number_of_ascends
 
     return [(result[ascend_type], f"{ascend_type} tops")
             for ascend_type in system.ascend_types[::-1] if ascend_type in result]
 
 
-cpdef tuple flash_rate(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict flash_rate(Aggregates aggregates, object system):
     """Retrieves the flash rate for each ascend type and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the flash rate for each ascend type
+        dict: The visual with the flash rate for each ascend type
     """
-    cdef list series = list(retrieve_data(cursor, f"""
-        SELECT
-            ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END)  / COUNT(*) * 100, 1),
-            ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1),
-            ROUND(SUM(CASE WHEN ascend_type = 'Redpoint' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
-        FROM main
-        WHERE date_logged IS NOT NULL
-            AND ascend_type IS NOT NULL
-            AND gym_id IN {sql_gyms}
-    """)[0])
+    cdef list series = list(aggregates.flash_rate)
 
     # Cut off the onsight rate if the climb type is not route
     series = series[system.climb_type != "route":]
@@ -118,32 +78,20 @@ cpdef tuple flash_rate(object cursor, unsigned long long uid, str sql_gyms, obje
 
 
 
-cpdef tuple max_grade_over_time(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict max_grade_over_time(Aggregates aggregates, object system):
     """Retrieves the max grade over time and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the max grade over time
+        dict: The visual with the max grade over time
     """
     cdef unsigned short i
     cdef bint route = system.route
 
-    cdef list data = retrieve_data(cursor, f"""
-        SELECT CAST(strftime('%s', date_logged) * 1000 + 40000000 AS INTEGER),
-           IFNULL(MAX(0, MAX(CASE WHEN ascend_type = 'Redpoint' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)), 0) AS Redpoint,
-           IFNULL(MAX(0, MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)), 0) AS Flash,
-           IFNULL(MAX(0, MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)), 0) AS Onsight
-        FROM main
-        WHERE date_logged IS NOT NULL
-        AND gym_id IN {sql_gyms}
-        GROUP BY strftime('%m-%Y', date_logged)
-        ORDER BY CAST(strftime('%s', date_logged) AS INTEGER) ASC;
-    """)
+    cdef list data = aggregates.max_grade_per_month
 
     if len(data) <= 2: return None
 
@@ -202,30 +150,17 @@ cpdef tuple max_grade_over_time(object cursor, unsigned long long uid, str sql_g
         _max=_max - _min)
 
 
-cpdef tuple ascends_over_time(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict ascends_over_time(Aggregates aggregates, object system):
     """Retrieves the ascends over time and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the ascends over time
+        dict: The visual with the ascends over time
     """
-    cdef list data = retrieve_data(cursor, f"""
-        SELECT
-            CAST(strftime('%s', date_logged) * 1000 + 40000000 AS INTEGER),
-            SUM(CASE WHEN ascend_type = 'Redpoint' THEN 1 ELSE 0 END),
-            SUM(CASE WHEN ascend_type = 'Flash' THEN 1 ELSE 0 END),
-            SUM(CASE WHEN ascend_type = 'Onsight' THEN 1 ELSE 0 END)
-        FROM main
-        WHERE date_logged IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY strftime('%m-%Y', date_logged)
-        ORDER BY CAST(strftime('%s', date_logged) AS INTEGER) ASC;
-    """)
+    cdef list data = aggregates.ascends_per_month
 
     if len(data) <= 1: return None
 
@@ -250,29 +185,17 @@ cpdef tuple ascends_over_time(object cursor, unsigned long long uid, str sql_gym
     )
 
 
-cpdef tuple ascends_per_grade(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict ascends_per_grade(Aggregates aggregates, object system):
     """Retrieves the ascends per grade and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the ascends per grade
+        dict: The visual with the ascends per grade
     """
-    cdef list data = retrieve_data(cursor, f"""
-        SELECT grade,
-        SUM(CASE WHEN ascend_type = 'Redpoint' THEN 1 ELSE 0 END),
-        SUM(CASE WHEN ascend_type = 'Flash' THEN 1 ELSE 0 END),
-        SUM(CASE WHEN ascend_type = 'Onsight' THEN 1 ELSE 0 END)
-        FROM main
-        WHERE grade IS NOT NULL
-        AND ascend_type IS NOT NULL
-        AND gym_id IN {sql_gyms}
-        GROUP BY grade
-    """)
+    cdef list data = aggregates.ascends_per_grade
 
     if len(data) <= 1: return None
 
@@ -297,69 +220,38 @@ cpdef tuple ascends_per_grade(object cursor, unsigned long long uid, str sql_gym
     )
 
 
-cpdef tuple flash_rate_per_grade(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict flash_rate_per_grade(Aggregates aggregates, object system):
     """Wrapper function which uses the flash_rate_per_x to retrieve the flash rate per grade
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the flash rate per grade
+        dict: The visual with the flash rate per grade
     """
-    cdef object structured_data = flash_rate_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-            grade,
-            ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END)  / COUNT(*) * 100, 1),
-            ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
-        FROM main
-        WHERE date_logged IS NOT NULL
-            AND ascend_type IS NOT NULL
-	        AND grade IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            grade
-        ORDER BY
-            grade ASC;
-    """, system, 1)
+    cdef object structured_data = flash_rate_per_x(aggregates.flash_rate_per_grade, system, 1)
     if structured_data is None: return None
     return vis.flash_rate_per_x(name="Flash rate per grade", series=structured_data[0], colors=structured_data[1], labels=structured_data[2])
 
 
 
 
-cpdef tuple grading_accuracy(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict grading_accuracy(Aggregates aggregates, object system):
     """Retrieves the grading accuracy and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the grading accuracy
+        dict: The visual with the grading accuracy
     """
     cdef unsigned char x, y
     cdef unsigned char _min = 100
     cdef unsigned char _max = 0
 
-    cdef list data = retrieve_data(cursor, f"""
-        SELECT
-            grade_rating,
-            grade,
-            COUNT(*)
-        FROM main
-        WHERE
-            grade IS NOT NULL
-            AND grade_rating IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            grade,
-            grade_rating
-    """)
+    cdef list data = aggregates.grade_pairs
 
     if len(data) < THRESHOLD_RATINGS: return None
 
@@ -403,17 +295,8 @@ cpdef tuple grading_accuracy(object cursor, unsigned long long uid, str sql_gyms
     )
 
 
-cpdef tuple rating_accuracy(object cursor, unsigned long long uid, str sql_gyms, object system):
-    cdef list data = retrieve_data(cursor, f"""
-        SELECT
-            rating,
-            ROUND(average_opinion, 1)
-        FROM main
-        WHERE
-            rating IS NOT NULL
-            AND average_opinion IS NOT NULL
-            AND gym_id IN {sql_gyms}
-    """)
+cpdef dict rating_accuracy(Aggregates aggregates, object system):
+    cdef list data = aggregates.ratings
 
     if len(data) < THRESHOLD_RATINGS: return None
 
@@ -428,13 +311,11 @@ cpdef tuple rating_accuracy(object cursor, unsigned long long uid, str sql_gyms,
     return vis.rating_accuracy(series=[{"name": "ratings", "data": series}], counts=counts, colors=colors)
 
 
-cpdef tuple number_of_ascends_per_x(object cursor, unsigned long long uid, unicode query, object system):
+cpdef tuple number_of_ascends_per_x(list data, object system):
     """Retrieves the number of ascends per x and returns the data
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        query (str): The query
+        data (list): The aggregated rows
         system (object): The system
 
     Returns:
@@ -442,8 +323,6 @@ cpdef tuple number_of_ascends_per_x(object cursor, unsigned long long uid, unico
     """
     cdef unsigned short i
 
-    cdef list data = retrieve_data(cursor, query)
-
     if len(data) <= 1: return None
 
     cdef bint route = system.route
@@ -470,88 +349,47 @@ cpdef tuple number_of_ascends_per_x(object cursor, unsigned long long uid, unico
 
 
 
-cpdef tuple number_of_ascends_per_wall(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict number_of_ascends_per_wall(Aggregates aggregates, object system):
     """Retrieves the number of ascends per wall and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the number of ascends per wall
+        dict: The visual with the number of ascends per wall
     """
-    if "," in sql_gyms: return None
-
-    cdef object structured_data = number_of_ascends_per_x(cursor, uid, f"""
-        SELECT
-            wall_name,
-            ascend_type,
-            COUNT(id)
-        FROM main
-        WHERE
-            gym_id IN {sql_gyms}
-            AND ascend_type IS NOT NULL
-        GROUP BY
-            wall_name,
-            ascend_type
-        ORDER BY
-            wall_name,
-            CASE WHEN ascend_type = 'Onsight' THEN 0
-            WHEN ascend_type = 'Flash' THEN 1
-            ELSE 2 END
-    """, system)
+    if aggregates.multiple_gyms: return None
+
+    cdef object structured_data = number_of_ascends_per_x(aggregates.ascends_per_wall, system)
     if structured_data is None: return None
 
     return vis.ascends_per_x(name="Ascends per wall", series=structured_data[0], colors=structured_data[1], x_axis_labels=structured_data[2])
 
 
-cpdef tuple number_of_ascends_per_gym(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict number_of_ascends_per_gym(Aggregates aggregates, object system):
     """Retrieves the number of ascends per gym and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the number of ascends per gym
+        dict: The visual with the number of ascends per gym
     """
-    if "," not in sql_gyms: return None
-
-    cdef object structured_data = number_of_ascends_per_x(cursor, uid, f"""
-        SELECT
-            gym_name,
-            ascend_type,
-            COUNT(id)
-        FROM main
-        WHERE
-            ascend_type IS NOT NULL
-        GROUP BY
-            gym_name,
-            ascend_type
-        ORDER BY
-            gym_name,
-            CASE
-                WHEN ascend_type = 'Onsight' THEN 0
-                WHEN ascend_type = 'Flash' THEN 1
-                ELSE 2 END
-    """, system)
+    if not aggregates.multiple_gyms: return None
+
+    cdef object structured_data = number_of_ascends_per_x(aggregates.ascends_per_gym, system)
     if structured_data is None: return None
 
     return vis.ascends_per_x(name="Ascends per gym", series=structured_data[0], colors=structured_data[1], x_axis_labels=structured_data[2])
 
 
-cpdef tuple max_grade_per_x(object cursor, unsigned long long uid, str sql_gyms, unicode query, object system):
+cpdef tuple max_grade_per_x(list data, object system):
     """Retrieves the max grade per x and returns the data
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
-        query (str): The query
+        data (list): The aggregated rows
         system (object): The system
 
     Returns:
@@ -559,7 +397,6 @@ cpdef tuple max_grade_per_x(object cursor, unsigned long long uid, str sql_gyms,
     """
     cdef unsigned short i
 
-    cdef list data = retrieve_data(cursor, query)
     if len(data) <= 1: return None
 
     cdef bint route = system.route
@@ -606,81 +443,48 @@ cpdef tuple max_grade_per_x(object cursor, unsigned long long uid, str sql_gyms,
     return (series, list(system.ascend_colors), x_axis_labels, list(system.strings[_min: _max]), _min, _max - _min)
 
 
-cpdef tuple max_grade_per_wall(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict max_grade_per_wall(Aggregates aggregates, object system):
     """Retrieves the max grade per wall and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the max grade per wall
+        dict: The visual with the max grade per wall
     """
 
-    if "," in sql_gyms: return None
-
-    cdef object structured_data = max_grade_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-            wall_name,
-            MAX(0, MAX(CASE WHEN ascend_type = 'Redpoint' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)),
-            MAX(0, MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)),
-            MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)
-        FROM main
-        WHERE
-            grade IS NOT NULL
-            AND wall_name IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            wall_name
-    """, system)
+    if aggregates.multiple_gyms: return None
+
+    cdef object structured_data = max_grade_per_x(aggregates.max_grade_per_wall, system)
     if structured_data is None: return None
 
     return vis.max_grade_per_x(name="Max grade per wall", series=structured_data[0], colors=structured_data[1], x_axis_labels=structured_data[2], y_axis_labels=structured_data[3], _min=structured_data[4], _max=structured_data[5])
 
 
-cpdef tuple max_grade_per_gym(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict max_grade_per_gym(Aggregates aggregates, object system):
     """Retrieves the max grade per gym and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the max grade per gym
+        dict: The visual with the max grade per gym
     """
-    if "," not in sql_gyms: return None
-
-    cdef object structured_data = max_grade_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-            gym_name,
-            MAX(0, MAX(CASE WHEN ascend_type = 'Redpoint' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)),
-            MAX(0, MAX(CASE WHEN ascend_type = 'Flash' THEN grade ELSE 0 END) - MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)),
-            MAX(CASE WHEN ascend_type = 'Onsight' THEN grade ELSE 0 END)
-        FROM main
-        WHERE
-            grade IS NOT NULL
-            AND gym_name IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            gym_name
-    """, system)
+    if not aggregates.multiple_gyms: return None
+
+    cdef object structured_data = max_grade_per_x(aggregates.max_grade_per_gym, system)
     if structured_data is None: return None
 
     return vis.max_grade_per_x(name="Max grade per gym", series=structured_data[0], colors=structured_data[1], x_axis_labels=structured_data[2], y_axis_labels=structured_data[3], _min=structured_data[4], _max=structured_data[5])
 
 
-cpdef tuple flash_rate_per_x(object cursor, unsigned long long uid, str sql_gyms, unicode query, object system, bint label_is_grade = 0):
+cpdef tuple flash_rate_per_x(list data, object system, bint label_is_grade = 0):
     """Retrieves the flash rate per x and returns the data
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
-        query (str): The query
+        data (list): The aggregated rows
         system (object): The system
 
     Keyword Arguments:
@@ -691,9 +495,6 @@ cpdef tuple flash_rate_per_x(object cursor, unsigned long long uid, str sql_gyms
     """
     cdef unsigned short i
 
-    # Retrieve the data from the database
-    cdef list data = retrieve_data(cursor, query)
-
     # The minimum walls is 3, otherwise the graph is not worth showing
     if len(data) <= 1: return None
 
@@ -711,123 +512,69 @@ cpdef tuple flash_rate_per_x(object cursor, unsigned long long uid, str sql_gyms
     return (series, list(system.ascend_colors), labels)
 
 
-cpdef tuple flash_rate_per_wall(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict flash_rate_per_wall(Aggregates aggregates, object system):
     """Retrieves the flash rate per wall and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the flash rate per wall
+        dict: The visual with the flash rate per wall
     """
-    if "," in sql_gyms: return None
-
-    cdef object structured_data = flash_rate_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-		    wall_name,
-            ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END)  / COUNT(*) * 100, 1),
-            ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
-        FROM main
-        WHERE date_logged IS NOT NULL
-            AND ascend_type IS NOT NULL
-	        AND wall_name IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            wall_name
-        ORDER BY
-            wall_name ASC;
-    """, system)
+    if aggregates.multiple_gyms: return None
+
+    cdef object structured_data = flash_rate_per_x(aggregates.flash_rate_per_wall, system)
     if structured_data is None: return None
 
 
     return vis.flash_rate_per_x(name="Flash rate per wall", series=structured_data[0], colors=structured_data[1], labels=structured_data[2])
 
 
-cpdef tuple flash_rate_per_gym(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict flash_rate_per_gym(Aggregates aggregates, object system):
     """Retrieves the flash rate per gym and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the flash rate per gym
+        dict: The visual with the flash rate per gym
     """
-    if "," not in sql_gyms: return None
-
-    cdef object structured_data = flash_rate_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-		    gym_name,
-            ROUND(SUM(CASE WHEN ascend_type = 'Onsight' THEN 1.0 ELSE 0.0 END)  / COUNT(*) * 100, 1),
-            ROUND(SUM(CASE WHEN ascend_type = 'Flash' THEN 1.0 ELSE 0.0 END) / COUNT(*) * 100, 1)
-        FROM main
-        WHERE date_logged IS NOT NULL
-            AND ascend_type IS NOT NULL
-	        AND gym_name IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            gym_name
-        ORDER BY
-            gym_name ASC;
-    """, system)
+    if not aggregates.multiple_gyms: return None
+
+    cdef object structured_data = flash_rate_per_x(aggregates.flash_rate_per_gym, system)
     if structured_data is None: return None
 
     return vis.flash_rate_per_x(name="Flash rate per gym", series=structured_data[0], colors=structured_data[1], labels=structured_data[2])
 
 
-cpdef tuple rating_per_x(object cursor, unsigned long long uid, str sql_gyms, unicode query, object system):
+cpdef tuple rating_per_x(list data, object system):
     """Retrieves the rating per x and returns the data
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
-        query (str): The query
+        data (list): The aggregated rows
         system (object): The system
 
     Returns:
         tuple: The data with the rating per x
     """
-    cdef list data = retrieve_data(cursor, query)
     if len(data) <= 1: return None
 
     return ({"name": "ratings", "data": [d[1] for d in data]}, [d[0] for d in data])
 
 
-cpdef tuple rating_per_ascends_type(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict rating_per_ascends_type(Aggregates aggregates, object system):
     """Retrieves the rating per ascend type and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the rating per ascend type
+        dict: The visual with the rating per ascend type
     """
-    cdef object structured_data = rating_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-            IFNULL(ascend_type, "Not ascended"),
-            AVG(rating),
-            COUNT(rating)
-        FROM main
-        WHERE
-            gym_id IN {sql_gyms}
-            AND rating IS NOT NULL
-        GROUP BY
-            IFNULL(ascend_type, "Not ascended")
-        ORDER BY
-            CASE WHEN ascend_type = 'Onsight' THEN 3
-            WHEN ascend_type = 'Flash' THEN 2
-            WHEN ascend_type = 'Redpoint' THEN 1
-            ELSE 0 END
-    """, system)
+    cdef object structured_data = rating_per_x(aggregates.rating_per_ascend_type, system)
     if structured_data is None: return None
 
     color_scheme = {"Onsight": "#B50060", "Flash": "#df007a", "Redpoint": "#ffa4ff", "Not ascended": "#aaaaaa"}
@@ -836,62 +583,35 @@ cpdef tuple rating_per_ascends_type(object cursor, unsigned long long uid, str s
     return vis.rating_per_x(name="Rating per ascend type", series=[structured_data[0]], labels=structured_data[1])
 
 
-cpdef tuple rating_per_wall(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict rating_per_wall(Aggregates aggregates, object system):
     """Retrieves the rating per wall and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the rating per wall
+        dict: The visual with the rating per wall
     """
-    if "," in sql_gyms: return None
-
-    cdef object structured_data = rating_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-            wall_name,
-            AVG(rating),
-            COUNT(rating)
-        FROM main
-        WHERE
-            rating IS NOT NULL
-            AND wall_name IS NOT NULL
-            AND gym_id IN {sql_gyms}
-        GROUP BY
-            wall_name
-    """, system)
+    if aggregates.multiple_gyms: return None
+
+    cdef object structured_data = rating_per_x(aggregates.rating_per_wall, system)
     if structured_data is None: return None
 
     return vis.rating_per_x(name="Rating per wall", series=[structured_data[0]], labels=structured_data[1])
 
-cpdef tuple rating_per_gym(object cursor, unsigned long long uid, str sql_gyms, object system):
+cpdef dict rating_per_gym(Aggregates aggregates, object system):
     """Retrieves the rating per gym and returns the visual
 
     Arguments:
-        cursor (object): The database cursor
-        uid (unsigned long long): The user id
-        sql_gyms (str): The gym ids
+        aggregates (Aggregates): The aggregates of the main table
         system (object): The system
 
     Returns:
-        tuple: The visual with the rating per gym
+        dict: The visual with the rating per gym
     """
-    if "," not in sql_gyms: return None
-
-    cdef object structured_data = rating_per_x(cursor, uid, sql_gyms, f"""
-        SELECT
-            gym_name,
-            AVG(rating),
-            COUNT(rating)
-        FROM main
-        WHERE
-            rating IS NOT NULL
-            AND gym_name IS NOT NULL
-        GROUP BY
-            gym_name
-    """, system)
+    if not aggregates.multiple_gyms: return None
+
+    cdef object structured_data = rating_per_x(aggregates.rating_per_gym, system)
     if structured_data is None: return None
     return vis.rating_per_x(name="Rating per gym", series=[structured_data[0]], labels=structured_data[1])
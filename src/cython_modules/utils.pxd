@@ -3,3 +3,4 @@
 cdef object pat1
 cdef object pat2
 cdef object pat3
+cdef str FLUSH_MARKER
@@ -1,10 +1,12 @@
 import re
+from collections.abc import Iterable, Iterator
 
 from custom_types import GymsRow
 
 pat1: re.Pattern[str]
 pat2: re.Pattern[str]
 pat3: re.Pattern[str]
+FLUSH_MARKER: str
 
 def filter_gyms(all_gyms: list[GymsRow], gym_ids: set[int], gym: str | None) -> list[GymsRow]:
     """Filters the gyms based on the gym_ids and the gym name
@@ -31,9 +33,19 @@ def minify(html: str) -> str:
         The minified html code
     """
 
+def minify_chunks(pieces: Iterable[str]) -> Iterator[str]:
+    """Minifies streamed html code in chunks that end at the flush markers
+
+    Arguments:
+        pieces: The html code, as rendered by a template stream
+
+    Yields:
+        The minified html code up to the next flush marker, or the end of the html code
+    """
+
 def filter_remembered_users(
     remembered_users: list[str], last_remembered_user: str
-) -> tuple[list[str], list[tuple[str, str, str]]]:
+) -> tuple[list[str], list[tuple[str, list[str]]]]:
     """Filters the remembered users if the last remembered user is not empty
 
     If the last remembered user is not empty, it will be added to the list of remembered users.
@@ -7,6 +7,9 @@ cdef object pat1 = re.compile(r'\s+')
 cdef object pat2 = re.compile(r'<!--.*?-->', flags=re.DOTALL)
 cdef object pat3 = re.compile(r'>\s+<')
 
+# Templates mark where a streamed response may be flushed with this comment, minify removes it
+cdef str FLUSH_MARKER = '<!--flush-->'
+
 
 cpdef list filter_gyms(list all_gyms, set gym_ids, object gym):
     """Filters the gyms based on the gym_ids and the gym name
@@ -37,6 +40,38 @@ cpdef str minify(str html):
     return pat3.sub('><', pat2.sub('',  pat1.sub(' ', html)))
 
 
+def minify_chunks(object pieces):
+    """Minifies streamed html code in chunks that end at the flush markers
+
+    Arguments:
+        pieces (Iterable): The html code, as rendered by a template stream
+
+    Yields:
+        str: The minified html code up to the next flush marker, or the end of the html code
+    """
+    cdef list pending = []
+    cdef list parts
+    cdef object piece
+    cdef object part
+
+    # The marker is static template text, so it is never split over two pieces. The pieces can
+    # be Markup, joining them gives plain html code without escaping it. The markers are placed
+    # between tags, so the whitespace around them is stripped as minify does within a chunk.
+    for piece in pieces:
+        if FLUSH_MARKER not in piece:
+            pending.append(piece)
+            continue
+
+        parts = piece.split(FLUSH_MARKER)
+        pending.append(parts[0])
+        for part in parts[1:]:
+            yield minify(''.join(pending)).strip()
+            pending = [part]
+
+    if pending:
+        yield minify(''.join(pending)).strip()
+
+
 cpdef tuple filter_remembered_users(list remembered_users, str last_remembered_user):
     """Filters the remembered users if the last remembered user is not empty
 
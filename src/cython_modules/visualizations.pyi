@@ -1,4 +1,6 @@
-def ascends_per_grade(series: list, colors: list[str], x_axis_labels: list[str]) -> tuple[str, str]:
+from typing import Any
+
+def ascends_per_grade(series: list, colors: list[str], x_axis_labels: list[str]) -> dict[str, Any]:
     """Create the ascends per grade visual.
 
     Args:
@@ -7,10 +9,10 @@ def ascends_per_grade(series: list, colors: list[str], x_axis_labels: list[str])
         x_axis_labels: The labels of the x axis
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
-def ascends_over_time(series: list, colors: list[str], x_axis_labels: list[str]) -> tuple[str, str]:
+def ascends_over_time(series: list, colors: list[str], x_axis_labels: list[str]) -> dict[str, Any]:
     """Create the ascends over time visual.
 
     Args:
@@ -19,12 +21,12 @@ def ascends_over_time(series: list, colors: list[str], x_axis_labels: list[str])
         x_axis_labels: The labels of the x axis
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
 def max_grade_over_time(
     series: list, colors: list[str], y_axis_labels: list[str], x_axis_labels: list[str], _max: int
-) -> tuple[str, str]:
+) -> dict[str, Any]:
     """Create the max grade over time visual.
 
     Args:
@@ -35,10 +37,10 @@ def max_grade_over_time(
         _max: The maximum value of the y axis
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
-def rating_accuracy(series: list, counts: list[int], colors: list[str]) -> tuple[str, str]:
+def rating_accuracy(series: list, counts: list[int], colors: list[str]) -> dict[str, Any]:
     """Create the rating accuracy visual.
 
     Args:
@@ -47,12 +49,12 @@ def rating_accuracy(series: list, counts: list[int], colors: list[str]) -> tuple
         colors: The colors of the series
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
 def grading_accuracy(
     series: list, axis_labels: list[str], counts: list[int], colors: list[str], _min: int, _max: int
-) -> tuple[str, str]:
+) -> dict[str, Any]:
     """Create the grading accuracy visual.
 
     Args:
@@ -64,10 +66,10 @@ def grading_accuracy(
         _max: The maximum value of the y axis
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
-def ascends_per_x(name: str, series: list, colors: list[str], x_axis_labels: list[str]) -> tuple[str, str]:
+def ascends_per_x(name: str, series: list, colors: list[str], x_axis_labels: list[str]) -> dict[str, Any]:
     """Create the ascends per x visual.
 
     Args:
@@ -77,12 +79,12 @@ def ascends_per_x(name: str, series: list, colors: list[str], x_axis_labels: lis
         x_axis_labels: The labels of the x axis
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
 def max_grade_per_x(
     name: str, series: list, colors: list[str], x_axis_labels: list[str], y_axis_labels: list[str], _min: int, _max: int
-) -> tuple[str, str]:
+) -> dict[str, Any]:
     """Create the max grade per x visual.
 
     Args:
@@ -95,10 +97,10 @@ def max_grade_per_x(
         _max: The maximum value of the y axis
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
-def flash_rate(series: list, labels: list[str], colors: list[str]) -> tuple[str, str]:
+def flash_rate(series: list, labels: list[str], colors: list[str]) -> dict[str, Any]:
     """Create the flash rate visual.
 
     Args:
@@ -107,10 +109,10 @@ def flash_rate(series: list, labels: list[str], colors: list[str]) -> tuple[str,
         colors: The colors of the series
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
-def flash_rate_per_x(name: str, series: list, labels: list[str], colors: list[str]) -> tuple[str, str]:
+def flash_rate_per_x(name: str, series: list, labels: list[str], colors: list[str]) -> dict[str, Any]:
     """Create the flash rate per x visual.
 
     Args:
@@ -120,10 +122,10 @@ def flash_rate_per_x(name: str, series: list, labels: list[str], colors: list[st
         colors: The colors of the series
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
 
-def rating_per_x(name: str, series: list, labels: list[str]) -> tuple[str, str]:
+def rating_per_x(name: str, series: list, labels: list[str]) -> dict[str, Any]:
     """Create the rating per x visual.
 
     Args:
@@ -132,5 +134,5 @@ def rating_per_x(name: str, series: list, labels: list[str]) -> tuple[str, str]:
         labels: The labels of the series
 
     Returns:
-        A tuple containing the chart id and the javascript code
+        The chart data, rendered by static/js/charts.js
     """
@@ -1,7 +1,10 @@
+import json
 import sqlite3
 
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from hashlib import blake2b
 from os.path import exists
+from time import perf_counter
 from typing import Any, Iterable
 from shutil import copyfile
 
@@ -12,8 +15,27 @@ from src.cython_modules.constants import (
     GYMS_URI,
     USER_UPDATE_URI,
     DATA_URI,
+    MIN_GRADE,
+    MAX_GRADE,
+    USER_RECONCILE_INTERVAL,
+    USER_DATA_MAX_AGE,
 )
-from src.custom_types import AscendsJson, ClimbType, ClimbsJson, GymsJson, GymsRow, OpinionsJson, System, WallsJson
+from src.caching import bump_cached_gym_versions, create_shared_cache
+from src.custom_types import (
+    AscendsJson,
+    ClimbType,
+    ClimbsJson,
+    GymsJson,
+    GymsRow,
+    OpinionsJson,
+    StaticUpdateJobRow,
+    WallsJson,
+)
+from src.instrumentation import begin_write
+
+
+# The cache of the workers, the versions of the gyms in it are bumped along with the ones in the static database
+cache = create_shared_cache()
 
 
 def copy_user_db(db_path: str) -> bool:
@@ -32,138 +54,335 @@ def copy_user_db(db_path: str) -> bool:
     return db_not_exists
 
 
-def add_user_update(uid: int, climb_type: ClimbType, gym_ids: Iterable[int]) -> None:
-    """Adds a user update to the update database. This is used to keep track of which gyms
-    have been updated for a specific user.
+def record_user_sync(
+    uid: int, climb_type: ClimbType, full_gym_ids: Iterable[int], partial_gym_ids: Iterable[int], watermark: int
+) -> None:
+    """Records a sync of the user data in the update database. This is used to keep track of which
+    gyms have been updated for a specific user.
+
+    The sync state holds a single row per user, climb type and gym, with the time of the last full
+    and the last partial sync, so it does not grow with every refresh. The watermark is the time
+    the fetch started, the next partial sync fetches the ascends and opinions changed since then.
 
     Arguments:
         uid (int): User id
         climb_type (ClimbType): Climb type
-        gym_ids (Iterable[int]): Gym ids
+        full_gym_ids (Iterable[int]): Gym ids of which every ascend and opinion was fetched
+        partial_gym_ids (Iterable[int]): Gym ids of which the changed ascends and opinions were fetched
+        watermark (int): Unix time the fetch started
     """
+    query = """
+        INSERT INTO user_sync_state (uid, type, gym_id, last_full_sync, last_partial_sync, watermark)
+        VALUES (
+            ?1, ?2, ?3,
+            CASE WHEN ?4 THEN strftime('%s','now') END,
+            CASE WHEN NOT ?4 THEN strftime('%s','now') END,
+            ?5
+        )
+        ON CONFLICT (uid, type, gym_id)
+        DO UPDATE SET
+            last_full_sync = IFNULL(EXCLUDED.last_full_sync, last_full_sync),
+            last_partial_sync = IFNULL(EXCLUDED.last_partial_sync, last_partial_sync),
+            watermark = MAX(IFNULL(watermark, 0), EXCLUDED.watermark)
+    """
+    params = [(uid, climb_type, _id, 1, watermark) for _id in full_gym_ids]
+    params += [(uid, climb_type, _id, 0, watermark) for _id in partial_gym_ids]
 
-    query = """INSERT INTO user_updates (update_timestamp, type, gym_id, uid) 
-               VALUES (strftime('%s','now'), ?,?,?)
-               """
     with sqlite3.connect(UPDATE_DB) as conn:
-        conn.executemany(query, [(climb_type, _id, uid) for _id in gym_ids])
+        conn.executemany(query, params)
         conn.commit()
 
 
-def drop_ascends_and_opinions(conn: sqlite3.Connection, gyms: tuple[int]) -> None:
-    """Drops the ascends and opinions table from the user database
+def prune_ascends_and_opinions(
+    conn: sqlite3.Connection, gyms: Iterable[int], ascend_ids: Iterable[int], opinion_ids: Iterable[int]
+) -> int:
+    """Deletes the ascends and opinions of the gyms that are not in the full data of these gyms.
 
     This is sometimes necessary when a user has deleted an ascend opinion
     after this application fetched the data.
 
     Arguments:
         conn (sqlite3.Connection): Connection to the user database
-        gyms (tuple): Gym ids
+        gyms (Iterable[int]): Gym ids of which the full data was fetched
+        ascend_ids (Iterable[int]): Ids of the fetched ascends of these gyms
+        opinion_ids (Iterable[int]): Ids of the fetched opinions of these gyms
+
+    Returns:
+        int: Number of deleted rows
     """
     gyms_str = str(tuple(gyms)).replace(",)", ")")
+    changes = conn.total_changes
 
-    conn.execute(f'ATTACH DATABASE "{DATA_DB}" AS master')
-    conn.execute(
-        f"""
-            DELETE FROM ascends 
+    try:
+        conn.execute(f'ATTACH DATABASE "{DATA_DB}" AS master')
+    except sqlite3.OperationalError:
+        pass
+
+    begin_write(conn)
+    for table, ids in (("ascends", ascend_ids), ("opinions", opinion_ids)):
+        conn.execute(
+            f"""
+            DELETE FROM {table}
             WHERE climb_id IN (
-                SELECT id 
-                FROM master.climbs 
+                SELECT id
+                FROM master.climbs
                 WHERE gym_id IN {gyms_str}
             )
-        """
-    )
-    conn.execute(
-        f"""
-        DELETE FROM opinions 
-        WHERE climb_id IN (
-            SELECT id 
-            FROM master.climbs 
-            WHERE gym_id IN {gyms_str}
+            AND id NOT IN (SELECT value FROM json_each(?))
+            """,
+            (json.dumps(list(ids)),),
         )
-    """
-    )
     conn.commit()
+    conn.execute("DETACH DATABASE master")
 
+    return conn.total_changes - changes
 
-def add_ascends(conn: sqlite3.Connection, _json: list[AscendsJson]) -> None:
+
+def add_ascends(conn: sqlite3.Connection, _json: Iterable[AscendsJson]) -> int:
     """Adds ascends to the user database. If the ascend already exists, it will update the
     climb id, date logged and type.
 
+    The ascends are replaced instead of upserted, since the sharded user store serves the
+    tables as views, which do not support upserts. The ascend id determines the other columns.
+    Ascends that are stored already, unchanged, are skipped, so the number of changed rows tells
+    whether the data of the user changed.
+
     Arguments:
-        _json (list): List with ascend data
+        _json (Iterable): Ascend data, a generator is consumed row by row
 
+    Returns:
+        int: Number of added or changed ascends
     """
     query = """
-    INSERT INTO ascends (id, climb_id, date_logged, type) 
-    VALUES (?, ?, ?, ?)
-    ON CONFLICT (id)
-    DO UPDATE SET
-    (climb_id, date_logged, type) = (EXCLUDED.climb_id, EXCLUDED.date_logged, EXCLUDED.type)
+    INSERT OR REPLACE INTO ascends (id, climb_id, date_logged, type)
+    SELECT ?1, ?2, ?3, ?4
+    WHERE NOT EXISTS (
+        SELECT 1 FROM ascends WHERE id = ?1 AND climb_id IS ?2 AND date_logged IS ?3 AND type IS ?4
+    )
     """
 
+    # Counted on the connection, the changes made by the triggers of the sharded user store included
+    changes = conn.total_changes
+    begin_write(conn)
     conn.executemany(query, _json)
     conn.commit()
+    return conn.total_changes - changes
 
 
-def add_opinions(conn: sqlite3.Connection, _json: list[OpinionsJson]) -> None:
+def add_opinions(conn: sqlite3.Connection, _json: list[OpinionsJson]) -> int:
     """Adds opinions to the user database. If the opinion already exists, it will update the
-    project, voted renew, grade rating and rating.
+    project, voted renew, grade rating and rating. Like the ascends, the opinions are replaced
+    and unchanged opinions are skipped.
 
     Arguments:
         _json (list): List with opinion data
+
+    Returns:
+        int: Number of added or changed opinions
     """
 
-    query = """INSERT INTO opinions 
-              (id, climb_id, uid, project, voted_renew, grade_rating, rating) 
-              VALUES (?,?,?,?,?,?,?)
-              ON CONFLICT (id)
-              DO UPDATE SET
-              (project, voted_renew, grade_rating, rating)
-              = (EXCLUDED.project, EXCLUDED.voted_renew, EXCLUDED.grade_rating, EXCLUDED.rating)
-              """
+    query = """
+    INSERT OR REPLACE INTO opinions (id, climb_id, uid, project, voted_renew, grade_rating, rating)
+    SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7
+    WHERE NOT EXISTS (
+        SELECT 1 FROM opinions
+        WHERE id = ?1 AND climb_id IS ?2 AND uid IS ?3 AND project IS ?4 AND voted_renew IS ?5
+            AND grade_rating IS ?6 AND rating IS ?7
+    )
+    """
 
+    changes = conn.total_changes
+    begin_write(conn)
     conn.executemany(query, _json)
     conn.commit()
+    return conn.total_changes - changes
 
 
-def enrich_user_table_and_get_ascends(
-    conn: sqlite3.Connection, climb_type: ClimbType, system: System, gyms: tuple[int, ...]
-) -> set[int]:
-    """Enriches the user database with the data from the static database. This is done by
-    joining the tables of the static database with the tables of the user database. The
-    enriched data is stored in the main table. This table is used to retrieve the data for the
-    statistics.
+def create_materialization_tables(conn: sqlite3.Connection) -> None:
+    """Creates the tables of the user database that keep the main table materialized.
+
+    The main table holds the enriched rows of every gym the user requested, with the raw grade
+    values so the rows are independent of the grading system. The main state table records,
+    per gym and climb type, with which data versions the rows in the main table were built.
+    The user versions table is bumped every time the ascends or opinions of a gym are upserted.
 
     Arguments:
         conn (sqlite3.Connection): Connection to the user database
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS main (
+            id BIGINT,
+            climb_id BIGINT,
+            date_logged DATE,
+            ascend_type VARCHAR(8),
+            gym_id INTEGER,
+            grade INTEGER,
+            climb_type VARCHAR(7),
+            average_opinion FLOAT,
+            date_live_start DATE,
+            date_live_end DATE,
+            wall_name TEXT,
+            gym_name TEXT,
+            project BOOL,
+            voted_renew BOOL,
+            grade_rating INTEGER,
+            rating FLOAT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS main_gym_id_index ON main (gym_id)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS main_state (
+            gym_id INTEGER NOT NULL,
+            climb_type VARCHAR(7) NOT NULL,
+            user_version INTEGER,
+            static_version INTEGER,
+            has_ascends BOOL,
+            PRIMARY KEY (gym_id, climb_type)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_versions (
+            gym_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+def create_user_indexes(conn: sqlite3.Connection) -> None:
+    """Creates the indexes of the user database. The main table joins the ascends and opinions
+    on the climb id and they are deleted by climb id. The indexes cover the columns the join
+    reads, so it never visits the tables themselves.
+
+    Arguments:
+        conn (sqlite3.Connection): Connection to the user database
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS ascends_climb_id_index ON ascends (climb_id, id, date_logged, type)")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS opinions_climb_id_index
+        ON opinions (climb_id, project, voted_renew, grade_rating, rating)
+        """
+    )
+
+
+def bump_user_versions(conn: sqlite3.Connection, gym_ids: Iterable[int]) -> None:
+    """Bumps the version of the user data of the gyms. This marks the rows of these gyms in the
+    main table as outdated.
+
+    Arguments:
+        conn (sqlite3.Connection): Connection to the user database
+        gym_ids (Iterable[int]): Gym ids
+    """
+    # Written as a replace, so it also works on the views of the sharded user store
+    query = """
+        INSERT OR REPLACE INTO user_versions (gym_id, version)
+        VALUES (?, IFNULL((SELECT version FROM user_versions WHERE gym_id = ?), 0) + 1)
+    """
+
+    try:
+        conn.executemany(query, [(_id, _id) for _id in gym_ids])
+    except sqlite3.OperationalError:
+        # User databases created before the main table was materialized miss the table
+        create_materialization_tables(conn)
+        conn.executemany(query, [(_id, _id) for _id in gym_ids])
+
+    conn.commit()
+
+
+def bump_gym_versions(gym_ids: Iterable[int]) -> None:
+    """Bumps the version of the static data of the gyms. This marks the rows of these gyms in
+    the main table of every user as outdated, and the cached pages of the gyms.
+
+    Arguments:
+        gym_ids (Iterable[int]): Gym ids
+    """
+    # The rows are written without their hashes, so the digests no longer describe them
+    query = """
+        INSERT INTO gym_versions (gym_id, version)
+        VALUES (?, 1)
+        ON CONFLICT (gym_id)
+        DO UPDATE SET version = version + 1, walls_digest = NULL, climbs_digest = NULL
+    """
+
+    gym_ids = list(gym_ids)
+    with sqlite3.connect(DATA_DB) as conn:
+        conn.executemany(query, [(_id,) for _id in gym_ids])
+        conn.commit()
+
+    bump_cached_gym_versions(cache, gym_ids)
+
+
+def _retrieve_main_state(
+    conn: sqlite3.Connection, climb_type: ClimbType, gyms: tuple[int, ...]
+) -> list[tuple[int, bool, bool, int, int]]:
+    """Retrieves for every requested gym whether its rows of the climb type in the main table are outdated.
+
+    Arguments:
+        conn (sqlite3.Connection): Connection to the user database, with the static database attached
         climb_type (ClimbType): Climb type
-        system (System): Grading system
         gyms (tuple): Gym ids
 
     Returns:
-        set: Gym ids for which data is available
+        list: Gym id, whether it is outdated, whether it has ascends, the user and static version
     """
+    c = conn.cursor()
+    c.execute(
+        f"""
+        WITH requested_gyms (gym_id) AS (
+            VALUES {", ".join("(?)" for _ in gyms)}
+        )
+        SELECT
+            rg.gym_id,
+            ms.gym_id IS NULL
+                OR ms.user_version != IFNULL(uv.version, 0)
+                OR ms.static_version != IFNULL(gv.version, 0),
+            IFNULL(ms.has_ascends, 0),
+            IFNULL(uv.version, 0),
+            IFNULL(gv.version, 0)
+        FROM requested_gyms rg
+        LEFT JOIN main_state ms
+            ON ms.gym_id = rg.gym_id AND ms.climb_type = ?
+        LEFT JOIN user_versions uv
+            ON uv.gym_id = rg.gym_id
+        LEFT JOIN master.gym_versions gv
+            ON gv.gym_id = rg.gym_id
+        """,
+        (*gyms, climb_type),
+    )
+    return c.fetchall()
 
-    # Make sure the table is renewed by dropping it if it already exists
-    # There have been instances where the table was not updated correctly
-    conn.execute("DROP TABLE IF EXISTS main")
 
-    try:
-        # For joining we need to attach the static database to the user database
-        # Sometimes this already happened, thus we catch the error and be happy
-        conn.execute(f'ATTACH DATABASE "{DATA_DB}" AS master')
-    except sqlite3.OperationalError:
-        pass
+def _rebuild_main(
+    conn: sqlite3.Connection, climb_type: ClimbType, outdated: list[tuple[int, bool, bool, int, int]]
+) -> dict[int, bool]:
+    """Re-joins the rows of the climb type of the outdated gyms in the main table and records the new state.
 
+    Arguments:
+        conn (sqlite3.Connection): Connection to the user database, with the static database attached
+        climb_type (ClimbType): Climb type
+        outdated (list): The main state of the outdated gyms
+
+    Returns:
+        dict: Whether the rebuilt gyms have ascends, by gym id
+    """
+    gyms_str = str(tuple(g[0] for g in outdated)).replace(",)", ")")
+
+    begin_write(conn)
+    conn.execute(f"DELETE FROM main WHERE gym_id IN {gyms_str} AND climb_type = ?", (climb_type,))
     conn.execute(
         f"""
-        CREATE TABLE main AS
+        INSERT INTO main
             SELECT ascends.id, master.climbs.id as climb_id, ascends.date_logged, 
-                    ascends.type AS ascend_type, climbs.gym_id, grade_reference.{system} AS grade, 
+                    ascends.type AS ascend_type, climbs.gym_id, master.climbs.grade, 
                     master.climbs.type AS climb_type, master.climbs.average_opinion, master.climbs.date_live_start, 
                     master.climbs.date_live_end, master.walls.name AS wall_name, master.gyms.name AS gym_name, 
-                    opinions.project, opinions.voted_renew, grading_reference.{system} AS grade_rating, 
+                    opinions.project, opinions.voted_renew, opinions.grade_rating, 
                     opinions.rating
             FROM master.climbs
             INNER JOIN master.gyms 
@@ -174,35 +393,88 @@ def enrich_user_table_and_get_ascends(
                 ON opinions.climb_id = master.climbs.id
             INNER JOIN master.walls  
                 ON master.climbs.wall_id = master.walls.id
-            LEFT JOIN master.{climb_type} AS grade_reference
-                ON grade_reference.id = master.climbs.grade
-            LEFT JOIN master.{climb_type} AS grading_reference
-                ON grading_reference.id = opinions.grade_rating                    
             WHERE master.climbs.type = ?
-                AND master.gyms.id IN {str(gyms).replace(',)', ')')}
+                AND master.gyms.id IN {gyms_str}
                 AND master.climbs.date_live_start IS NOT NULL
                 AND (ascends.date_logged IS NOT NULL
-                OR grading_reference.{system} IS NOT NULL
+                OR opinions.grade_rating BETWEEN ? AND ?
                 OR opinions.rating IS NOT NULL)
     """,
-        (climb_type,),
+        (climb_type, MIN_GRADE, MAX_GRADE),
     )
-    conn.execute("DETACH DATABASE master")
-    conn.commit()
 
-    # To reduce loading times we retrieve available gym ids
-    # This will be returned so the program knows what it can display
     c = conn.cursor()
     c.execute(
-        """
-        SELECT DISTINCT gym_id
+        f"""
+        SELECT gym_id
         FROM main
-        WHERE climb_type = ? AND ascend_type IS NOT NULL
+        WHERE gym_id IN {gyms_str} AND climb_type = ? AND ascend_type IS NOT NULL
+        GROUP BY gym_id
         """,
         (climb_type,),
     )
+    gyms_with_ascends = {g[0] for g in c.fetchall()}
+
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO main_state (gym_id, climb_type, user_version, static_version, has_ascends)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [(g[0], climb_type, g[3], g[4], g[0] in gyms_with_ascends) for g in outdated],
+    )
+    conn.commit()
+
+    return {g[0]: g[0] in gyms_with_ascends for g in outdated}
+
+
+def enrich_user_table_and_get_ascends(
+    conn: sqlite3.Connection, climb_type: ClimbType, gyms: tuple[int, ...]
+) -> set[int]:
+    """Enriches the user database with the data from the static database. This is done by
+    joining the tables of the static database with the tables of the user database. The
+    enriched data is stored in the main table. This table is used to retrieve the data for the
+    statistics.
+
+    The main table is maintained incrementally, per gym and climb type. Only the rows of gyms
+    whose user data or static data changed since they were joined for the climb type are
+    re-joined, so switching between the climb types does not re-join anything either. When the
+    table is up to date, this costs a single lookup. Grades are stored as
+    raw values and translated to the grading system while the statistics are computed, so
+    switching the grading system does not re-join anything.
+
+    Arguments:
+        conn (sqlite3.Connection): Connection to the user database
+        climb_type (ClimbType): Climb type
+        gyms (tuple): Gym ids
+
+    Returns:
+        set: Gym ids for which data is available
+    """
+    try:
+        # For joining we need to attach the static database to the user database
+        # Sometimes this already happened, thus we catch the error and be happy
+        conn.execute(f'ATTACH DATABASE "{DATA_DB}" AS master')
+    except sqlite3.OperationalError:
+        pass
 
-    return {g[0] for g in c.fetchall()}
+    try:
+        state = _retrieve_main_state(conn, climb_type, gyms)
+    except sqlite3.OperationalError:
+        # User databases created before the main table was materialized miss the tables
+        create_materialization_tables(conn)
+        state = _retrieve_main_state(conn, climb_type, gyms)
+
+    has_ascends = {g[0]: g[2] for g in state}
+
+    outdated = [g for g in state if g[1]]
+    if outdated:
+        has_ascends.update(_rebuild_main(conn, climb_type, outdated))
+
+    conn.execute("DETACH DATABASE master")
+
+    # To reduce loading times we return the available gym ids
+    # This will be returned so the program knows what it can display
+    return {gym_id for gym_id, ascended in has_ascends.items() if ascended}
 
 
 def add_gyms(_json: list[GymsJson]) -> None:
@@ -255,13 +527,16 @@ def add_walls(_json: list[WallsJson]) -> None:
         conn.commit()
 
 
-def add_climbs(_json: list[ClimbsJson]) -> None:
+def add_climbs(_json: Iterable[ClimbsJson]) -> None:
     """Adds climbs to the static database. If the climb already exists, it will update the
     date live start, date live end, grade, grade stability, number of ascends and average
     opinion.
 
+    The climbs are consumed row by row, so a generator that streams them from the API keeps
+    the memory bounded by its chunk size.
+
     Arguments:
-        _json (list): List with climb data
+        _json (Iterable): Climb data
     """
     query = """
         INSERT INTO climbs (
@@ -292,8 +567,445 @@ def add_climbs(_json: list[ClimbsJson]) -> None:
         conn.commit()
 
 
+class StaticDataWriter:
+    """Bulk writer of the static database, used by the jobs of a cron run.
+
+    The writer holds one connection to the static database in WAL mode, so readers keep reading
+    the last committed snapshot while it writes and never wait on it. Rows are staged in
+    temporary tables and merged into the static tables by flush, with one upsert per table in
+    a single transaction. The versions of the gyms with written walls or climbs are bumped in
+    the same transaction.
+
+    Walls and climbs are staged with a hash of their row, and the sum of the hashes of a gym is
+    its digest. A gym with the same digest as its last flush is skipped as a whole, and of the
+    other gyms only the rows with a new hash are written. The rows of a gym that were removed
+    at TopLogger change its digest, but are kept, since ascends refer to them.
+
+    A writer is used by one thread, jobs that run concurrently have a writer each and their
+    flushes wait on each other for at most the timeout.
+
+    Use it as a context manager, the staged rows are flushed when the context exits.
+
+    Attributes:
+        path (str): Path to the static database
+        rows (int): Number of rows merged into the static tables
+        skipped (int): Number of staged rows that were unchanged and not written
+        seconds (float): Seconds spent staging and merging the rows
+    """
+
+    STAGING_TABLES = (
+        "CREATE TEMP TABLE IF NOT EXISTS staged_gyms AS SELECT * FROM main.gyms WHERE 0",
+        "CREATE TEMP TABLE IF NOT EXISTS staged_walls AS SELECT * FROM main.walls WHERE 0",
+        "CREATE TEMP TABLE IF NOT EXISTS staged_climbs AS SELECT * FROM main.climbs WHERE 0",
+    )
+
+    # The WHERE true resolves the parsing ambiguity of an upsert on a SELECT
+    MERGE_QUERIES = (
+        """
+        INSERT INTO gyms (id, name, id_name, nr_of_climbs, nr_of_boulders, nr_of_routes, country)
+        SELECT id, name, id_name, nr_of_climbs, nr_of_boulders, nr_of_routes, country
+        FROM temp.staged_gyms WHERE true
+        ON CONFLICT (id)
+        DO UPDATE SET
+            (
+                nr_of_climbs,
+                nr_of_boulders,
+                nr_of_routes
+            ) = (
+                EXCLUDED.nr_of_climbs,
+                EXCLUDED.nr_of_boulders,
+                EXCLUDED.nr_of_routes
+            )
+        """,
+        """
+        INSERT INTO walls (id, name, gym_id, row_hash)
+        SELECT id, name, gym_id, row_hash
+        FROM temp.staged_walls WHERE true
+        ON CONFLICT (id)
+        DO UPDATE SET
+            (name, row_hash) = (EXCLUDED.name, EXCLUDED.row_hash)
+        """,
+        """
+        INSERT INTO climbs (
+            id, gym_id, type, date_live_start, date_live_end, wall_id,
+            grade, auto_grade, grade_stability, nr_of_ascends, average_opinion, row_hash
+        )
+        SELECT
+            id, gym_id, type, date_live_start, date_live_end, wall_id,
+            grade, auto_grade, grade_stability, nr_of_ascends, average_opinion, row_hash
+        FROM temp.staged_climbs WHERE true
+        ON CONFLICT (id)
+        DO UPDATE SET (
+            date_live_start,
+            date_live_end,
+            grade,
+            grade_stability,
+            nr_of_ascends,
+            average_opinion,
+            row_hash
+        ) = (
+            EXCLUDED.date_live_start,
+            EXCLUDED.date_live_end,
+            EXCLUDED.grade,
+            EXCLUDED.grade_stability,
+            EXCLUDED.nr_of_ascends,
+            EXCLUDED.average_opinion,
+            EXCLUDED.row_hash
+        )
+        """,
+        """
+        INSERT INTO gym_versions (gym_id, version)
+        SELECT gym_id, 1
+        FROM (
+            SELECT gym_id FROM temp.staged_walls
+            UNION
+            SELECT gym_id FROM temp.staged_climbs
+        ) WHERE true
+        ON CONFLICT (gym_id)
+        DO UPDATE SET version = version + 1
+        """,
+    )
+
+    # The staged tables with hashed rows, with their static table, the column of the gym id and the digest column
+    HASHED_TABLES = (
+        ("staged_walls", "walls", 2, "walls_digest"),
+        ("staged_climbs", "climbs", 1, "climbs_digest"),
+    )
+
+    # Digests are kept within the range of a SQLite integer
+    DIGEST_MASK = (1 << 63) - 1
+
+    def __init__(self, path: str = DATA_DB, timeout: float = 5.0) -> None:
+        """
+        Arguments:
+            path (str): Path to the static database
+            timeout (float): Seconds a flush waits for the flush of another writer
+        """
+        self.path = path
+        self.timeout = timeout
+        self.rows = 0
+        self.skipped = 0
+        self.seconds = 0.0
+        self._staged = 0
+        self._digests: dict[str, dict[int, int]] = {table: {} for table, *_ in self.HASHED_TABLES}
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def open(self) -> None:
+        """Opens the connection to the static database and creates the staging tables"""
+        self._conn = sqlite3.connect(self.path, timeout=self.timeout)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # In WAL mode a commit only syncs at checkpoints, which keeps the database consistent
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA temp_store = MEMORY")
+        for query in self.STAGING_TABLES:
+            self._conn.execute(query)
+
+    def close(self) -> None:
+        """Closes the connection, the rows that are still staged are discarded"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "StaticDataWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: object) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    def _stage(self, table: str, nr_of_columns: int, rows: Iterable[tuple[Any, ...]]) -> None:
+        if self._conn is None:
+            raise RuntimeError("The writer is not open")
+
+        start = perf_counter()
+        cursor = self._conn.executemany(f"INSERT INTO temp.{table} VALUES ({', '.join('?' * nr_of_columns)})", rows)
+        self._staged += cursor.rowcount
+        self.seconds += perf_counter() - start
+
+    def _hash_rows(self, table: str, gym_column: int, rows: Iterable[tuple[Any, ...]]) -> Iterator[tuple[Any, ...]]:
+        """Appends the hash of every row and adds it to the digest of the gym of the row"""
+        digests = self._digests[table]
+        for row in rows:
+            row_hash = int.from_bytes(blake2b(repr(row).encode(), digest_size=8).digest()) & self.DIGEST_MASK
+            gym_id = row[gym_column]
+            digests[gym_id] = (digests.get(gym_id, 0) + row_hash) & self.DIGEST_MASK
+            yield (*row, row_hash)
+
+    def _drop_unchanged(self) -> int:
+        """Removes the staged walls and climbs that are stored unchanged, first the gyms with the same
+        digest as their last flush and then the rows with the same hash. The transaction is open.
+
+        Returns:
+            int: Number of staged rows removed
+        """
+        assert self._conn is not None
+        dropped = 0
+        for staged, table, _, column in self.HASHED_TABLES:
+            digests = self._digests[staged]
+            if not digests:
+                continue
+
+            stored = self._conn.execute(
+                f"SELECT gym_id, {column} FROM gym_versions WHERE gym_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(digests)),),
+            ).fetchall()
+            unchanged = [gym_id for gym_id, digest in stored if digest is not None and digests[gym_id] == digest]
+
+            if unchanged:
+                dropped += self._conn.execute(
+                    f"DELETE FROM temp.{staged} WHERE gym_id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(unchanged),),
+                ).rowcount
+            dropped += self._conn.execute(
+                f"""
+                DELETE FROM temp.{staged}
+                WHERE EXISTS (
+                    SELECT 1 FROM {table} WHERE {table}.id = {staged}.id AND {table}.row_hash = {staged}.row_hash
+                )
+                """
+            ).rowcount
+
+        return dropped
+
+    def _store_digests(self) -> None:
+        """Stores the digests of the staged gyms. The transaction is open."""
+        assert self._conn is not None
+        for staged, _, _, column in self.HASHED_TABLES:
+            self._conn.executemany(
+                f"""
+                INSERT INTO gym_versions (gym_id, {column})
+                VALUES (?, ?)
+                ON CONFLICT (gym_id)
+                DO UPDATE SET {column} = EXCLUDED.{column}
+                """,
+                self._digests[staged].items(),
+            )
+            self._digests[staged].clear()
+
+    def add_gyms(self, _json: Iterable[GymsJson]) -> None:
+        """Stages gyms, see add_gyms
+
+        Arguments:
+            _json (Iterable): Gym data
+        """
+        self._stage("staged_gyms", 7, _json)
+
+    def add_walls(self, _json: Iterable[WallsJson]) -> None:
+        """Stages walls, see add_walls
+
+        Arguments:
+            _json (Iterable): Wall data
+        """
+        self._stage("staged_walls", 4, self._hash_rows("staged_walls", 2, _json))
+
+    def add_climbs(self, _json: Iterable[ClimbsJson]) -> None:
+        """Stages climbs, see add_climbs. The climbs are consumed row by row.
+
+        Arguments:
+            _json (Iterable): Climb data
+        """
+        self._stage("staged_climbs", 12, self._hash_rows("staged_climbs", 1, _json))
+
+    def flush(self) -> int:
+        """Merges the staged rows that changed into the static tables in one transaction, then bumps
+        the versions of the gyms it wrote in the cache of the workers
+
+        Returns:
+            int: Number of rows merged
+        """
+        if self._conn is None:
+            raise RuntimeError("The writer is not open")
+
+        start = perf_counter()
+        skipped = 0
+        bumped: list[int] = []
+        with self._conn:
+            if self._staged:
+                skipped = self._drop_unchanged()
+                # The gyms of which the merge bumps the version
+                bumped = [
+                    gym_id
+                    for (gym_id,) in self._conn.execute(
+                        "SELECT gym_id FROM temp.staged_walls UNION SELECT gym_id FROM temp.staged_climbs"
+                    )
+                ]
+                for query in self.MERGE_QUERIES:
+                    self._conn.execute(query)
+                self._store_digests()
+            for table in ("staged_gyms", "staged_walls", "staged_climbs"):
+                self._conn.execute(f"DELETE FROM temp.{table}")
+
+        if bumped:
+            bump_cached_gym_versions(cache, bumped)
+
+        merged, self._staged = self._staged - skipped, 0
+        self.rows += merged
+        self.skipped += skipped
+        self.seconds += perf_counter() - start
+        return merged
+
+
+def create_static_update_jobs(conn: sqlite3.Connection) -> None:
+    """Creates the table with the progress of the nightly updates of the static database
+
+    Arguments:
+        conn (sqlite3.Connection): The connection to the static database
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS static_update_jobs (
+            run_id INTEGER NOT NULL, -- Unix time the nightly run started
+            gym_id INTEGER NOT NULL,
+            due INTEGER NOT NULL, -- Unix time of the run window of the timezone of the gym
+            status TEXT NOT NULL DEFAULT 'pending', -- pending, done or failed after the last attempt
+            attempts INTEGER NOT NULL DEFAULT 0,
+            seconds REAL, -- Duration of the last attempt
+            rows INTEGER, -- Rows merged into the static tables
+            skipped INTEGER, -- Unchanged rows that were not written
+            finished INTEGER,
+            error TEXT,
+            PRIMARY KEY (run_id, gym_id)
+        )
+        """
+    )
+
+    # The table of an earlier deploy has no count of the skipped rows
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(static_update_jobs)")}
+    if "skipped" not in columns:
+        conn.execute("ALTER TABLE static_update_jobs ADD COLUMN skipped INTEGER")
+
+
+class StaticUpdateCheckpoint:
+    """Progress of the nightly updates of the static database, with a row per run and gym.
+
+    A run plans a job per gym with the time it is due. Every job that finishes or fails is
+    committed right away, so a run that is restarted resumes with the jobs that are still pending.
+    The rows of a run are kept until a later run prunes them, with the duration and the number
+    of rows of every gym.
+
+    Use it as a context manager, the connection is closed when the context exits.
+    """
+
+    def __init__(self, path: str = DATA_DB, timeout: float = 5.0) -> None:
+        """
+        Arguments:
+            path (str): Path to the static database
+            timeout (float): Seconds a checkpoint waits for the flush of a writer
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        create_static_update_jobs(self._conn)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "StaticUpdateCheckpoint":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def unfinished_run(self, since: int) -> tuple[int, list[tuple[int, int, int]]] | None:
+        """Returns the latest run that started after since and has pending jobs
+
+        Arguments:
+            since (int): Unix time before which runs are abandoned
+
+        Returns:
+            tuple | None: The id of the run and its pending jobs as (gym_id, due, attempts), None if there is none
+        """
+        row = self._conn.execute(
+            "SELECT max(run_id) FROM static_update_jobs WHERE run_id >= ? AND status = 'pending'", (since,)
+        ).fetchone()
+        if row[0] is None:
+            return None
+
+        jobs = self._conn.execute(
+            """
+            SELECT gym_id, due, attempts
+            FROM static_update_jobs
+            WHERE run_id = ? AND status = 'pending'
+            ORDER BY due, gym_id
+            """,
+            (row[0],),
+        ).fetchall()
+        return row[0], jobs
+
+    def plan(self, run_id: int, jobs: Iterable[tuple[int, int]], keep: int) -> None:
+        """Plans the jobs of a new run and prunes the runs that started before it by more than keep seconds
+
+        Arguments:
+            run_id (int): Unix time the run started
+            jobs (Iterable): The jobs as (gym_id, due)
+            keep (int): Seconds the progress of a run is kept
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM static_update_jobs WHERE run_id < ?", (run_id - keep,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO static_update_jobs (run_id, gym_id, due) VALUES (?, ?, ?)",
+                ((run_id, gym_id, due) for gym_id, due in jobs),
+            )
+
+    def finish(self, run_id: int, gym_id: int, attempts: int, seconds: float, rows: int, skipped: int) -> None:
+        """Marks the job of the gym as done"""
+        with self._conn:
+            self._conn.execute(
+                """
+                UPDATE static_update_jobs
+                SET status = 'done', attempts = ?, seconds = ?, rows = ?, skipped = ?, error = NULL,
+                    finished = strftime('%s', 'now')
+                WHERE run_id = ? AND gym_id = ?
+                """,
+                (attempts, seconds, rows, skipped, run_id, gym_id),
+            )
+
+    def fail(self, run_id: int, gym_id: int, attempts: int, seconds: float, error: str, due: int | None) -> None:
+        """Records a failed attempt of the job of the gym
+
+        Arguments:
+            run_id (int): Id of the run
+            gym_id (int): Id of the gym
+            attempts (int): Number of attempts so far
+            seconds (float): Duration of the attempt
+            error (str): Description of the error
+            due (int | None): Unix time of the next attempt, None if the job gives up
+        """
+        with self._conn:
+            self._conn.execute(
+                """
+                UPDATE static_update_jobs
+                SET status = ?, attempts = ?, seconds = ?, due = IFNULL(?, due), error = ?,
+                    finished = strftime('%s', 'now')
+                WHERE run_id = ? AND gym_id = ?
+                """,
+                ("failed" if due is None else "pending", attempts, seconds, due, error, run_id, gym_id),
+            )
+
+    def summary(self, run_id: int) -> list[StaticUpdateJobRow]:
+        """Returns the jobs of the run, the slowest first"""
+        rows = self._conn.execute(
+            """
+            SELECT gym_id, status, attempts, seconds, rows, skipped
+            FROM static_update_jobs
+            WHERE run_id = ?
+            ORDER BY seconds DESC
+            """,
+            (run_id,),
+        ).fetchall()
+        return [StaticUpdateJobRow(*row) for row in rows]
+
+
 def _retrieve_data_from_static_db(
-    db_uri: str, query: str, params: Sequence[int] | None = None
+    db_uri: str, query: str, params: Sequence[int | str] | None = None
 ) -> list[tuple[Any, ...]]:
     """Retrieves data from the static databases
 
@@ -313,12 +1025,12 @@ def _retrieve_data_from_static_db(
         return c.fetchall()
 
 
-def retrieve_data(query: str, params: Sequence[int] | None = None) -> list[tuple[Any, ...]]:
+def retrieve_data(query: str, params: Sequence[int | str] | None = None) -> list[tuple[Any, ...]]:
     """Wrapper function for retrieving data from the static database
 
     Arguments:
         query (str): Query to be executed
-        params (Sequence[int] | None): Parameters for the query {None}
+        params (Sequence[int | str] | None): Parameters for the query {None}
 
     Returns:
         list: The results of the query
@@ -326,12 +1038,12 @@ def retrieve_data(query: str, params: Sequence[int] | None = None) -> list[tuple
     return _retrieve_data_from_static_db(DATA_URI, query, params)
 
 
-def retrieve_all_gyms(params: Sequence[int] | None = None) -> list[GymsRow]:
+def retrieve_all_gyms(params: Sequence[int | str] | None = None) -> list[GymsRow]:
     """Wrapper function for retrieving data from the gym database
 
     Arguments:
         query (str): Query to be executed
-        params (Sequence[int] | None): Parameters for the query {None}
+        params (Sequence[int | str] | None): Parameters for the query {None}
 
     Returns:
         list: The results of the query
@@ -339,16 +1051,106 @@ def retrieve_all_gyms(params: Sequence[int] | None = None) -> list[GymsRow]:
     return _retrieve_data_from_static_db(GYMS_URI, "SELECT * FROM gyms", params)
 
 
-def retrieve_user_updates(query: str, params: Sequence[int] | None = None) -> list[tuple[Any, ...]]:
+def retrieve_last_user_update(uid: int, climb_type: ClimbType, gym_ids: Sequence[int]) -> int | None:
+    """Retrieves when the user data of the gyms was refreshed, the time of the oldest refresh.
+
+    Arguments:
+        uid (int): User id
+        climb_type (ClimbType): Climb type
+        gym_ids (Sequence[int]): Gym ids
+
+    Returns:
+        int | None: Unix time of the oldest refresh, None if the data of one of the gyms was never fetched
+    """
+    query = f"""
+        SELECT MIN(MAX(IFNULL(last_full_sync, 0), IFNULL(last_partial_sync, 0))), COUNT(*)
+        FROM user_sync_state
+        WHERE uid = ? AND type = ? AND gym_id IN ({", ".join("?" for _ in gym_ids)})
+    """
+    last_update, nr_of_gyms = retrieve_user_updates(query, (uid, climb_type, *gym_ids))[0]
+
+    return last_update if nr_of_gyms == len(set(gym_ids)) else None
+
+
+def retrieve_user_updates(query: str, params: Sequence[int | str] | None = None) -> list[tuple[Any, ...]]:
     """Wrapper function for retrieving data from the update database
 
     Arguments:
         query (str): Query to be executed
 
     Keyword Arguments:
-        params (Sequence[int] | None): Parameters for the query {None}
+        params (Sequence[int | str] | None): Parameters for the query {None}
 
     Returns:
         list: The results of the query
     """
     return _retrieve_data_from_static_db(USER_UPDATE_URI, query, params)
+
+
+def retrieve_user_update_sizes(
+    uid: int, climb_type: ClimbType, gym_ids: Sequence[int], max_age: int = USER_DATA_MAX_AGE
+) -> list[tuple[int, int, int | None]]:
+    """Retrieves which gyms need a sync of the user data. A gym that was not synced within the max
+    age, 12 hours by default, needs a partial sync, of the ascends and opinions that changed since its watermark. A gym
+    that was never synced, has no watermark, or of which the last full sync is older than the
+    reconcile interval, needs a full sync.
+
+    Arguments:
+        uid (int): User id
+        climb_type (ClimbType): Climb type
+        gym_ids (Sequence[int]): Gym ids
+        max_age (int): Seconds after which a gym is synced again
+
+    Returns:
+        list: Gym id, 1 for a full sync or 0 for a partial sync, and the watermark of the gym. Gyms that
+            are up to date are left out
+    """
+    query = f"""
+        WITH requested_gyms (gym_id) AS (
+            VALUES {", ".join("(?)" for _ in gym_ids)}
+        )
+        SELECT
+            rg.gym_id,
+            CASE
+                WHEN ss.last_sync >= strftime('%s','now') - ? THEN NULL
+                WHEN ss.watermark IS NULL THEN 1
+                WHEN IFNULL(ss.last_full_sync, 0) < strftime('%s','now') - ? THEN 1
+                ELSE 0
+            END AS update_size,
+            ss.watermark
+        FROM requested_gyms rg
+        LEFT JOIN (
+            SELECT
+                gym_id,
+                MAX(IFNULL(last_full_sync, 0), IFNULL(last_partial_sync, 0)) AS last_sync,
+                last_full_sync,
+                watermark
+            FROM user_sync_state
+            WHERE uid = ? AND type = ?
+        ) ss
+            ON ss.gym_id = rg.gym_id
+        WHERE update_size IS NOT NULL
+    """
+    return retrieve_user_updates(query, (*gym_ids, max_age, USER_RECONCILE_INTERVAL, uid, climb_type))
+
+
+def retrieve_user_sync_targets(uid: int, since: int) -> list[tuple[ClimbType, tuple[int, ...]]]:
+    """Retrieves the climb types and gyms of which the user data was synced since a time, these are
+    what the user looked at recently.
+
+    Arguments:
+        uid (int): User id
+        since (int): Unix time
+
+    Returns:
+        list: Climb type and the ids of its gyms
+    """
+    query = """
+        SELECT type, json_group_array(gym_id)
+        FROM user_sync_state
+        WHERE uid = ? AND MAX(IFNULL(last_full_sync, 0), IFNULL(last_partial_sync, 0)) >= ?
+        GROUP BY type
+    """
+    return [
+        (climb_type, tuple(json.loads(gym_ids))) for climb_type, gym_ids in retrieve_user_updates(query, (uid, since))
+    ]
@@ -0,0 +1,214 @@
+import re
+import sqlite3
+import time
+
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any
+from urllib.parse import urlsplit
+
+from src.cython_modules.constants import INSTRUMENTATION
+
+
+# Upper bounds of the buckets of the histograms, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The ids in the paths of the TopLogger API, the requests of every gym and user share a label
+ID_IN_PATH = re.compile(r"/\d+(?=[/.]|$)")
+
+
+class Histogram:
+    """Counts observations in cumulative buckets per value of its label, like a Prometheus histogram.
+
+    Attributes:
+        name (str): Name of the metric
+        description (str): Help text of the metric
+        label (str): Name of the label
+    """
+
+    def __init__(self, name: str, description: str, label: str) -> None:
+        self.name = name
+        self.description = description
+        self.label = label
+        self._lock = Lock()
+        # The count per bucket, the +Inf bucket included, followed by the sum, per label value
+        self._series: dict[str, list[float]] = {}
+
+    def observe(self, value: str, seconds: float) -> None:
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * (len(BUCKETS) + 2)
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list[str]:
+        """Returns the lines of the histogram in the text format of Prometheus"""
+        with self._lock:
+            snapshot = sorted((value, list(series)) for value, series in self._series.items())
+
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for value, series in snapshot:
+            labels = f'{self.label}="{value}"'
+            count = 0
+            for bound, observations in zip((*BUCKETS, "+Inf"), series):
+                count += int(observations)
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+
+        return lines
+
+
+STAGES = Histogram("toploggerstats_stage_seconds", "Seconds spent in a stage of a request", "stage")
+REQUESTS = Histogram("toploggerstats_request_seconds", "Seconds of a request, the streamed body included", "endpoint")
+UPSTREAM = Histogram("toploggerstats_upstream_seconds", "Seconds of a request to TopLogger", "endpoint")
+LOCK_WAIT = Histogram("toploggerstats_sqlite_lock_wait_seconds", "Seconds waited for a SQLite write lock", "database")
+
+
+class RequestTimings:
+    """The seconds per stage of a request, in the order the stages first started.
+
+    Attributes:
+        start (float): Performance counter at the start of the request
+        stages (dict): Seconds per stage, a stage that ran more than once has the sum of its runs
+    """
+
+    __slots__ = ("start", "stages")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Returns the stages and the time up to now as the value of a Server-Timing header"""
+        stages = (*self.stages.items(), ("total", time.perf_counter() - self.start))
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages)
+
+
+# The timings of the request that the thread handles, None outside of a timed request
+current_request: ContextVar[RequestTimings | None] = ContextVar("current_request", default=None)
+
+
+class Stage:
+    """Times a stage into its histogram and into the timings of the request that runs it.
+
+    Attributes:
+        name (str): Name of the stage in the Server-Timing header
+        histogram (Histogram): Histogram of the stage
+        value (str): Value of the label of the histogram
+    """
+
+    __slots__ = ("name", "histogram", "value", "start")
+
+    def __init__(self, name: str, histogram: Histogram = STAGES, value: str | None = None) -> None:
+        self.name = name
+        self.histogram = histogram
+        self.value = name if value is None else value
+
+    def __enter__(self) -> "Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        seconds = time.perf_counter() - self.start
+        self.histogram.observe(self.value, seconds)
+
+        timings = current_request.get()
+        if timings is not None:
+            timings.add(self.name, seconds)
+
+
+# Entered instead of a stage when the instrumentation is disabled
+NO_STAGE = nullcontext()
+
+
+def stage(name: str) -> Stage | nullcontext[None]:
+    """Returns the context that times the stage, a no-op when the instrumentation is disabled.
+
+    Arguments:
+        name (str): Name of the stage
+
+    Returns:
+        Stage | nullcontext: The context manager
+    """
+    return Stage(name) if INSTRUMENTATION else NO_STAGE
+
+
+def begin_write(conn: sqlite3.Connection, database: str = "user") -> None:
+    """Begins the transaction of a write like sqlite3 does implicitly, but times the wait for the lock.
+
+    The user databases are opened in exclusive or immediate mode, so the lock is taken when the
+    transaction begins. A connection that is in a transaction already holds its lock.
+
+    Arguments:
+        conn (sqlite3.Connection): The connection that is about to write
+        database (str): Name of the database in the metrics
+    """
+    if not INSTRUMENTATION or conn.in_transaction or conn.isolation_level is None:
+        return
+
+    with Stage("sqlite_lock", LOCK_WAIT, database):
+        conn.execute(f"BEGIN {conn.isolation_level}")
+
+
+def observe_upstream(url: str, seconds: float) -> None:
+    """Observes the latency of a request to TopLogger, labeled with its path without the ids.
+
+    Arguments:
+        url (str): The request url
+        seconds (float): Seconds until the response arrived
+    """
+    UPSTREAM.observe(ID_IN_PATH.sub("/:id", urlsplit(url).path), seconds)
+
+
+def start_request() -> RequestTimings:
+    """Starts the timings of the request that the thread handles"""
+    timings = RequestTimings()
+    current_request.set(timings)
+    return timings
+
+
+def end_request(endpoint: str) -> None:
+    """Observes the duration of the request and ends its timings, the stages that the thread runs
+    afterwards are not part of it.
+
+    Arguments:
+        endpoint (str): Endpoint of the request
+    """
+    timings = current_request.get()
+    if timings is not None:
+        REQUESTS.observe(endpoint, time.perf_counter() - timings.start)
+        current_request.set(None)
+
+
+def render_metrics(cache: dict[str, int | float]) -> str:
+    """Renders the metrics of the worker in the text format of Prometheus.
+
+    Arguments:
+        cache (dict): The counters of the page cache of the worker
+
+    Returns:
+        str: The metrics
+    """
+    lines = [
+        "# HELP toploggerstats_cache_lookups_total Lookups of the page cache by their outcome",
+        "# TYPE toploggerstats_cache_lookups_total counter",
+        *(
+            f'toploggerstats_cache_lookups_total{{outcome="{outcome}"}} {cache[outcome]}'
+            for outcome in ("hits", "misses", "not_modified")
+        ),
+        "# HELP toploggerstats_cache_hit_ratio Share of the lookups of the page cache that were served from it",
+        "# TYPE toploggerstats_cache_hit_ratio gauge",
+        f"toploggerstats_cache_hit_ratio {cache['hit_rate']}",
+    ]
+    for histogram in (REQUESTS, STAGES, UPSTREAM, LOCK_WAIT):
+        lines.extend(histogram.render())
+
+    return "\n".join(lines) + "\n"
@@ -1,44 +1,187 @@
+import hashlib
+import hmac
+import json
 import os
+import time
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import timedelta, datetime as dt
+from functools import lru_cache, partial
 from os import urandom
-from sqlite3 import connect
-from typing import Any
-
-from flask import Flask, Response, render_template, request, url_for, redirect, abort, session, make_response
+from collections.abc import Iterator
+from typing import Any, cast
+
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    url_for,
+    redirect,
+    abort,
+    copy_current_request_context,
+    session,
+    make_response,
+    stream_template,
+    stream_with_context,
+)
 from flask_caching import Cache
 from werkzeug.wrappers import Response as WerkzeugResponse
 
-from src.custom_types import GymsRow, check_climb_type, check_system
-from src.database import copy_user_db, enrich_user_table_and_get_ascends, retrieve_all_gyms
-from src.cython_modules.utils import filter_gyms, filter_remembered_users, minify
+from src.caching import (
+    CACHE_KEY_PREFIX,
+    MEMCACHED_SERVERS,
+    CacheStats,
+    cache_key,
+    cached_gym_versions,
+    check_preload_fingerprint,
+    etag_of,
+    preload_fingerprint,
+)
+from src.custom_types import ClimbType, GymsRow, check_climb_type, check_system
+from src.database import (
+    enrich_user_table_and_get_ascends,
+    retrieve_all_gyms,
+    retrieve_last_user_update,
+    retrieve_user_sync_targets,
+)
+from src.instrumentation import current_request, end_request, render_metrics, stage, start_request
+from src.profiler import SamplingProfiler, install_signal_handler
+from src.refresh_worker import PRIORITY_REMEMBERED, RefreshWorker
+from src.single_flight import SingleFlight
+from src.user_store import create_user_store
+from src.cython_modules.utils import filter_gyms, filter_remembered_users, minify, minify_chunks
 from src.cython_modules.api import fetch_users
-from src.cython_modules.engine import update_user_data, create_visuals
+from src.cython_modules.engine import update_user_data, iter_chart_groups, iter_visuals
 from src.cython_modules.constants import (
     CSP_DASHBOARD_FORMAT_STRING,
-    USER_DB_FORMAT_STRING,
+    CSP_DASHBOARD,
     CSP_START,
     CSP_ERROR,
+    STREAM_DASHBOARD,
+    DASHBOARD_CHARTS,
+    DASHBOARD_CACHE_TIMEOUT,
+    NR_OF_CHART_GROUPS,
+    STALE_WHILE_REVALIDATE,
+    UPSTREAM_LATENCY_BUDGET,
+    USER_REFRESH_DEADLINE,
+    NR_OF_REFRESH_WORKERS,
+    BACKGROUND_REFRESH,
+    BACKGROUND_REFRESH_RATE,
+    BACKGROUND_REFRESH_BURST,
+    BACKGROUND_REFRESH_LEAD,
+    ACTIVE_USER_WINDOW,
+    USER_DATA_MAX_AGE,
+    INSTRUMENTATION,
+    PROFILE_DIRECTORY,
+    PROFILER_TOKEN,
+    PROFILER_SIGNAL,
+    PROFILER_SECONDS,
+    PROFILER_MAX_SECONDS,
+    PROFILER_INTERVAL,
 )
 
 
-app = Flask(__name__, static_folder="static", static_url_path="/static", template_folder="templates")
+class TopLoggerStats(Flask):
+    def get_send_file_max_age(self, filename: str | None) -> int | None:
+        # The url of a versioned static file changes with its content, so the file never goes stale
+        if request.args.get("v"):
+            return 31536000
+        return super().get_send_file_max_age(filename)
+
+
+app = TopLoggerStats(__name__, static_folder="static", static_url_path="/static", template_folder="templates")
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=365)
+app.config["DASHBOARD_CHARTS"] = DASHBOARD_CHARTS
+app.config["STREAM_DASHBOARD"] = STREAM_DASHBOARD
 app.secret_key = os.getenv("SECRET_KEY")
 
 # We have only enabled caching for the actual server
 # If we are running locally, we don't want caching but we want the response times
 if os.getenv("PROD"):
-    cache = Cache(app, config={"CACHE_TYPE": "MemcachedCache", "CACHE_MEMCACHED_SERVERS": ("127.0.0.1:11211",)})
+    cache = Cache(
+        app,
+        config={
+            "CACHE_TYPE": "MemcachedCache",
+            "CACHE_MEMCACHED_SERVERS": MEMCACHED_SERVERS,
+            "CACHE_KEY_PREFIX": CACHE_KEY_PREFIX,
+        },
+    )
 else:
     cache = Cache(app, config=None)
 
+# A database per user, or the sharded store, as configured by the USER_STORE environment variable
+user_store = create_user_store()
+
+# Concurrent refreshes of the same user data, e.g. a preload and the dashboard, share a single refresh
+refreshes = SingleFlight()
+
+# Refreshes that outlast the request that started them, in stale-while-revalidate mode
+refresh_pool = ThreadPoolExecutor(NR_OF_REFRESH_WORKERS, thread_name_prefix="refresh")
+
+# Lookups of the cached dashboards by this worker
+cache_stats = CacheStats()
+
+# Remembered users seen on the start page per request, at most, whose data is refreshed in the background
+MAX_REMEMBERED_REFRESHES = 10
+
 
 class NoAscendsFound(Exception):
     """Exception raised when no ascends are found at the selected gyms."""
 
 
-@cache.cached(timeout=21600)
+# Keys of the environ of a request served by src/asgi.py. The outcomes of the refreshes that the event loop
+# awaited for the request, by their key, and the refresh the first dispatch of the request deferred
+ASYNC_REFRESHES = "toploggerstats.async_refreshes"
+DEFERRED_REFRESH = "toploggerstats.deferred_refresh"
+
+
+class RefreshDeferred(Exception):
+    """Exception raised in async mode when a request needs a refresh of the user data. The event loop
+    awaits the refresh and dispatches the request again, instead of a worker thread waiting for TopLogger.
+
+    Attributes:
+        key (tuple): Key of the refresh, concurrent refreshes with the same key are coalesced
+        target (tuple): The user id, the climb type and the ids of the requested gyms
+    """
+
+    def __init__(self, key: tuple[int, str, frozenset[int]], target: tuple[int, ClimbType, tuple[int, ...]]) -> None:
+        super().__init__(key)
+        self.key = key
+        self.target = target
+
+
+def redispatched() -> bool:
+    """Whether src/asgi.py dispatches the request again with the outcome of the refresh it deferred. The
+    first dispatch counted the cache lookup and the visit of the request already."""
+    return bool(request.environ.get(ASYNC_REFRESHES))
+
+
+def count_lookup(outcome: str) -> None:
+    """Counts the outcome of a cache lookup, once per request"""
+    if not redispatched():
+        cache_stats.count(outcome)
+
+
+@app.template_global()
+@lru_cache(maxsize=None)
+def static_url(filename: str) -> str:
+    """Returns the url of a static file, versioned by the hash of its content.
+
+    Args:
+        filename (str): The path of the file in the static folder
+
+    Returns:
+        str: The versioned url
+    """
+    assert app.static_folder is not None
+    with open(os.path.join(app.static_folder, filename), "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+
+    return url_for("static", filename=filename, v=version)
+
+
+@cache.cached(timeout=21600, key_prefix="gyms")
 def gyms() -> list[GymsRow]:
     """Retrieves and sorts the gyms from the database. Sorting will happen by the gym name.
     This function will be cached, so the gyms are only retrieved once every 6 hours.
@@ -49,6 +192,304 @@ def gyms() -> list[GymsRow]:
     return sorted(retrieve_all_gyms(), key=lambda d: d[1])
 
 
+def user_data_version(uid: int) -> int | None:
+    """Returns the version of the user data in the cache, part of the keys of the cached pages of
+    the user. A version that is not in the cache, because it was never set or was evicted, starts
+    at the current time, so it never matches the version of a page that was cached before.
+
+    Args:
+        uid (int): The user id of the user
+
+    Returns:
+        int | None: The version, None if caching is disabled
+    """
+    key = f"user-data-version:{uid}"
+    version = cache.get(key)
+    if version is None:
+        # Another worker may add the version first, every worker uses the one in the cache
+        cache.add(key, time.time_ns(), timeout=0)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_user_data_version(uid: int) -> None:
+    """Bumps the version of the user data in the cache, which invalidates the cached pages of the user."""
+    cache.set(f"user-data-version:{uid}", time.time_ns(), timeout=0)
+
+
+def dashboard_key(
+    uid: int, climb_type: str, grading_system: str, requested_gyms: tuple[int, ...], gym: str | None
+) -> str:
+    """Returns the cache key of a dashboard, the same in every worker.
+
+    The key holds the version of the user data and the versions of the static data of the requested
+    gyms. A refresh that changes the user data, or a cron run that writes the climbs or walls of one
+    of the gyms, changes the key, other dashboards stay cached. The versions are read from the cache,
+    so a repeat load is answered without touching SQLite.
+    """
+    return cache_key(
+        "dashboard",
+        uid,
+        climb_type,
+        grading_system,
+        requested_gyms,
+        gym,
+        app.config["DASHBOARD_CHARTS"],
+        user_data_version(uid),
+        cached_gym_versions(cache.cache, requested_gyms),
+    )
+
+
+def visuals_key(
+    uid: int, climb_type: str, grading_system: str, requested_gyms: tuple[int, ...], gym: str | None, group: int | None
+) -> str:
+    """Returns the cache key of the chart data of a dashboard, versioned like the dashboard itself."""
+    return cache_key(
+        "visuals",
+        uid,
+        climb_type,
+        grading_system,
+        requested_gyms,
+        gym,
+        group,
+        user_data_version(uid),
+        cached_gym_versions(cache.cache, requested_gyms),
+    )
+
+
+def cached_response(key: str) -> Response | WerkzeugResponse | None:
+    """Looks up the response cached under the key and counts the lookup.
+
+    The entity tag of a page follows from its key, a client that has the cached page gets a 304
+    without reading the page from the cache.
+
+    Args:
+        key (str): The cache key of the response
+
+    Returns:
+        Response | WerkzeugResponse | None: The cached response or a 304, None if the response is not cached
+    """
+    with stage("cache_lookup"):
+        if request.if_none_match.contains_weak(etag_of(key)) and cache.has(key):
+            count_lookup("not_modified")
+            response = make_response("", 304)
+            response.set_etag(etag_of(key), weak=True)
+            return response
+
+        response = cache.get(key)
+
+    if response is None:
+        count_lookup("misses")
+        return None
+
+    count_lookup("hits")
+    return response.make_conditional(request)
+
+
+def _refresh_user_data(
+    uid: int, climb_type: ClimbType, requested_gyms: tuple[int, ...], max_age: int = USER_DATA_MAX_AGE
+) -> None:
+    """Adds the user to the user store if the user is new and fetches the user data of the gyms that
+    were not synced within the max age."""
+    with stage("add_user"):
+        new_user = user_store.add_user(uid)
+
+    with user_store.connect(uid) as c:
+        written, records, body_bytes = update_user_data(
+            c, uid, climb_type, requested_gyms, new_user, USER_REFRESH_DEADLINE, max_age
+        )
+
+    finish_refresh(uid, written, records, body_bytes)
+
+
+def finish_refresh(uid: int, written: int, records: int, body_bytes: int) -> None:
+    """Logs what a refresh fetched and wrote, and invalidates the cached pages of the user if it wrote rows."""
+    if records or written:
+        app.logger.info(
+            f"Refresh of {uid} fetched {records} records ({body_bytes / 1024:.1f} KiB) from TopLogger "
+            f"and wrote {written} rows"
+        )
+
+    # The cached pages stay valid as long as the refreshes do not change any row
+    if written:
+        bump_user_data_version(uid)
+
+
+def refresh_user_data(uid: int, climb_type: ClimbType, requested_gyms: tuple[int, ...]) -> int | None:
+    """Fetches the latest user data into the user database. A request that arrives while the same
+    refresh is in flight, joins that refresh instead of fetching and locking the database again.
+
+    In stale-while-revalidate mode, a request of a user with local data of every requested gym
+    waits at most the upstream latency budget. When the refresh takes longer or fails, the local
+    data is served and the refresh continues in the background.
+
+    Args:
+        uid (int): The user id of the user
+        climb_type (ClimbType): The climb type
+        requested_gyms (tuple): The ids of the requested gyms
+
+    In async mode, the event loop of src/asgi.py refreshes the user data instead. The first
+    dispatch of the request defers the refresh, the second one gets its outcome.
+
+    Returns:
+        int | None: Unix time of the oldest refresh of the local data if it is served stale, None if
+            the data is up to date
+    """
+    key = (uid, climb_type, frozenset(requested_gyms))
+    async_refreshes = request.environ.get(ASYNC_REFRESHES)
+    if async_refreshes is not None:
+        if key not in async_refreshes:
+            raise RefreshDeferred(key, (uid, climb_type, requested_gyms))
+
+        outcome = async_refreshes[key]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with stage("refresh"):
+        last_update = None
+        if STALE_WHILE_REVALIDATE:
+            with stage("sync_lookup"):
+                last_update = retrieve_last_user_update(uid, climb_type, requested_gyms)
+
+        if last_update is None:
+            _, shared = refreshes.do(key, _refresh_user_data, uid, climb_type, requested_gyms)
+
+            if shared:
+                log_coalesced_refresh(uid)
+            return None
+
+        future = refreshes.submit(refresh_pool, key, _refresh_user_data, uid, climb_type, requested_gyms)
+        try:
+            future.result(timeout=UPSTREAM_LATENCY_BUDGET)
+        except TimeoutError:
+            app.logger.info(f"Refresh of {uid} exceeded the latency budget, the local data is served")
+            future.add_done_callback(partial(log_background_refresh, uid))
+            return last_update
+        except Exception:
+            app.logger.exception(f"Refresh of {uid} failed, the local data is served")
+            return last_update
+
+        return None
+
+
+def log_coalesced_refresh(uid: int) -> None:
+    app.logger.info(
+        f"Refresh of {uid} joined a refresh in flight ({refreshes.coalesced} of "
+        f"{refreshes.coalesced + refreshes.executed} refreshes coalesced)"
+    )
+
+
+def background_refresh(uid: int, climb_type: ClimbType, requested_gyms: tuple[int, ...]) -> None:
+    """Refreshes the user data ahead of its expiry, for the refresh worker. A request for the same
+    data joins the refresh, and the refresh joins a request that is refreshing already."""
+    key = (uid, climb_type, frozenset(requested_gyms))
+    refreshes.do(key, _refresh_user_data, uid, climb_type, requested_gyms, USER_DATA_MAX_AGE - BACKGROUND_REFRESH_LEAD)
+
+
+# Keeps the data of the users that visited recently fresh, so a returning user rarely waits for TopLogger
+refresh_worker = (
+    RefreshWorker(
+        refresh_pool,
+        background_refresh,
+        retrieve_last_user_update,
+        interval=USER_DATA_MAX_AGE - BACKGROUND_REFRESH_LEAD,
+        active_window=ACTIVE_USER_WINDOW,
+        rate=BACKGROUND_REFRESH_RATE,
+        burst=BACKGROUND_REFRESH_BURST,
+        log=lambda message, e: app.logger.error(message, exc_info=e),
+    )
+    if BACKGROUND_REFRESH
+    else None
+)
+
+# Samples the stacks of the worker on demand, for the admin endpoint and the signal handler
+profiler = SamplingProfiler(
+    PROFILE_DIRECTORY, PROFILER_INTERVAL, log=lambda message, e: app.logger.error(message, exc_info=e)
+)
+
+if PROFILER_SIGNAL:
+    try:
+        install_signal_handler(profiler, PROFILER_SIGNAL, PROFILER_SECONDS)
+    except ValueError as e:
+        # Only the main thread of a process can install a signal handler
+        app.logger.warning(f"The profiler does not handle {PROFILER_SIGNAL}: {e}")
+
+
+def schedule_remembered_users(structured_remembered_users: list[tuple[str, list[str]]]) -> None:
+    """Schedules background refreshes of the users remembered by a visitor of the start page, of
+    the climb types and gyms they looked at within the active window.
+
+    Args:
+        structured_remembered_users (list): The remembered users, with the user id as second field
+    """
+    if refresh_worker is None:
+        return
+
+    since = int(time.time()) - ACTIVE_USER_WINDOW
+    for _, fields in structured_remembered_users[:MAX_REMEMBERED_REFRESHES]:
+        try:
+            uid = int(fields[1])
+        except (IndexError, ValueError):
+            continue
+
+        for climb_type, gym_ids in retrieve_user_sync_targets(uid, since):
+            refresh_worker.visit(uid, climb_type, gym_ids, PRIORITY_REMEMBERED)
+
+
+def log_background_refresh(uid: int, future: Future[None]) -> None:
+    """Logs the failure of a refresh that continued in the background, no request waits for it."""
+    if not future.cancelled() and future.exception() is not None:
+        app.logger.error(f"Background refresh of {uid} failed", exc_info=future.exception())
+
+
+def mark_stale(response: Response | WerkzeugResponse, last_update: int) -> None:
+    """Marks a response that is rendered from stale local data. It is neither cached by the
+    browser nor by the server, the next request gets the refreshed data.
+
+    Args:
+        response (Response | WerkzeugResponse): The response
+        last_update (int): Unix time of the oldest refresh of the data
+    """
+    response.headers["X-Data-Age"] = str(max(int(time.time()) - last_update, 0))
+    response.cache_control.no_store = True
+
+
+def format_age(seconds: float) -> str:
+    """Formats the age of the data for the dashboard, e.g. 3 hours.
+
+    Args:
+        seconds (float): The age in seconds
+
+    Returns:
+        str: The age in the largest whole unit
+    """
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            amount = int(seconds // size)
+            return f"{amount} {unit}{'s' if amount > 1 else ''}"
+
+    return "less than a minute"
+
+
+def visual_gyms(gym_ids_with_ascends: set[int], gyms_in_view: list[GymsRow]) -> list[GymsRow]:
+    """Returns the gyms the visuals are created for. If only one of the gyms has ascends, the
+    visuals are those of that gym.
+
+    Args:
+        gym_ids_with_ascends (set): The ids of the gyms with ascends
+        gyms_in_view (list): The gyms in view
+
+    Returns:
+        list: The gyms of the visuals
+    """
+    if len(gym_ids_with_ascends) == 1:
+        return filter_gyms(gyms(), gym_ids_with_ascends, None)
+
+    return gyms_in_view
+
+
 def error_handler(error_code: int, title: str, message: str) -> Response:
     """Handles the error response.
 
@@ -73,6 +514,36 @@ def error_handler(error_code: int, title: str, message: str) -> Response:
     return response
 
 
+def start_request_timings() -> None:
+    # A request that is dispatched again after its deferred refresh keeps the timings of its first dispatch
+    if current_request.get() is None:
+        start_request()
+
+
+def add_server_timing(response: Response) -> Response:
+    """Sends the time of every stage of the request in the Server-Timing header. The header of a
+    streamed page is sent before the charts are computed, their stages are only in the metrics."""
+    timings = current_request.get()
+    if timings is not None:
+        response.headers["Server-Timing"] = timings.server_timing()
+
+    return response
+
+
+def end_request_timings(error: BaseException | None) -> None:
+    """Observes the duration of the request. The context of a streamed page is torn down once the
+    stream is sent, so its duration includes the stream."""
+    if DEFERRED_REFRESH not in request.environ:
+        end_request(request.endpoint or "none")
+
+
+# The stages are only timed when the instrumentation is enabled, otherwise they are a no-op
+if INSTRUMENTATION:
+    app.before_request(start_request_timings)
+    app.after_request(add_server_timing)
+    app.teardown_request(end_request_timings)
+
+
 @app.errorhandler(400)
 def error_400(*args: Any, **kwargs: Any) -> Response:
     return error_handler(400, "400: Bad request", "The request you've made seemed wrong")
@@ -83,6 +554,14 @@ def error_404(*args: Any, **kwargs: Any) -> Response:
     return error_handler(404, "404: Page not found", "Nothing here")
 
 
+@app.errorhandler(RefreshDeferred)
+def defer_refresh(error: RefreshDeferred) -> tuple[str, int]:
+    """Hands the refresh to the event loop of src/asgi.py, which dispatches the request again once the
+    refresh is done. The response is not sent."""
+    request.environ[DEFERRED_REFRESH] = error
+    return "", 202
+
+
 @app.errorhandler(NoAscendsFound)
 def error_404_no_ascends(*args: Any, **kwargs: Any) -> Response:
     return error_handler(
@@ -108,6 +587,7 @@ def home() -> Response:
         session.get("remember-me", []), request.cookies.get("remembered", "")
     )
     session["remember-me"] = remembered_users
+    schedule_remembered_users(structured_remembered_users)
 
     response = make_response(
         minify(
@@ -115,7 +595,7 @@ def home() -> Response:
                 "start.html",
                 gyms=gyms(),
                 remembered_users=structured_remembered_users,
-                preload_key=str(hash(dt.now().strftime("%Y-%m-%d-%H"))),
+                preload_key=preload_fingerprint(app.secret_key, dt.now()),
             )
         ),
         200,
@@ -127,7 +607,7 @@ def home() -> Response:
 
 @app.route("/<int:uid>", defaults={"gym": None})
 @app.route("/<int:uid>/<gym>")
-def main_dashboard(uid: int, gym: str | None) -> Response:
+def main_dashboard(uid: int, gym: str | None) -> Response | WerkzeugResponse:
     """This function will render the user specific dashboard.
 
     Can be called for a combined dashboard or a single gym dashboard.
@@ -151,62 +631,254 @@ def main_dashboard(uid: int, gym: str | None) -> Response:
     if not check_system(grading_system):
         abort(400)
 
-    # Only combined paged are cached since child pages always have their data fetched
-    # in advance, and thus have minor loading times
-    if not gym:
-        cache_identifier = str(hash((uid, climb_type, grading_system, requested_gyms)))
-        data = cache.get(cache_identifier)
-        if data is not None:
-            return data
+    if refresh_worker is not None and not redispatched():
+        refresh_worker.visit(uid, climb_type, requested_gyms)
 
-    requested_gyms_set = set(requested_gyms)
+    # Every page is cached, the dashboards of the gyms along with the combined dashboard
+    cached = cached_response(dashboard_key(uid, climb_type, grading_system, requested_gyms, gym))
+    if cached is not None:
+        return cached
 
-    db_copied = copy_user_db(USER_DB_FORMAT_STRING.format(uid))
-
-    with connect(USER_DB_FORMAT_STRING.format(uid), isolation_level="EXCLUSIVE") as c:
-        update_user_data(c, uid, climb_type, requested_gyms, db_copied)
-        all_gyms = gyms()
-
-        gym_ids_with_ascends = enrich_user_table_and_get_ascends(c, climb_type, grading_system, requested_gyms)
-        all_gyms_selected = filter_gyms(all_gyms, requested_gyms_set, None)
-        gyms_in_view = filter_gyms(all_gyms, requested_gyms_set, gym)
+    last_update = refresh_user_data(uid, climb_type, requested_gyms)
 
+    with user_store.connect(uid) as c:
+        with stage("main_rebuild"):
+            gym_ids_with_ascends = enrich_user_table_and_get_ascends(c, climb_type, requested_gyms)
         if not gym_ids_with_ascends:
             raise NoAscendsFound
 
-        if len(gym_ids_with_ascends) == 1:
-            gyms_with_ascends = filter_gyms(all_gyms, gym_ids_with_ascends, None)
-            dashboard_objects = create_visuals(c, uid, gyms_with_ascends, climb_type, grading_system)
-        else:
-            dashboard_objects = create_visuals(c, uid, gyms_in_view, climb_type, grading_system)
+        context = dashboard_context(c, uid, name, gym, climb_type, grading_system, requested_gyms, gym_ids_with_ascends)
+
+    stream = app.config["STREAM_DASHBOARD"]
+    if last_update is not None:
+        # The page says how old the data is, and is not cached since the refresh is still running
+        context["data_age"] = format_age(time.time() - last_update)
+        response = render_dashboard(context, gym, climb_type, grading_system, requested_gyms, None, stream)
+        mark_stale(response, last_update)
+        return response
+
+    # Cached under the version of the data it was rendered from
+    page_key = dashboard_key(uid, climb_type, grading_system, requested_gyms, gym)
+    response = render_dashboard(context, gym, climb_type, grading_system, requested_gyms, page_key, stream)
+
+    if gym is None and len(gym_ids_with_ascends) > 1:
+        # Once the combined dashboard is sent, the dashboards of its gyms are rendered from the same data
+        response.call_on_close(
+            copy_current_request_context(
+                partial(
+                    cache_gym_dashboards, uid, name, climb_type, grading_system, requested_gyms, gym_ids_with_ascends
+                )
+            )
+        )
 
-    # To prevent XSS, we generate a nonce and pass it into the template
-    nonce = urandom(16).hex()
+    return response
 
-    # Render the page
-    response = make_response(
-        minify(
-            render_template(
-                "dashboard.html",
-                username=name,
-                gyms=all_gyms_selected,
-                multiple_gyms_requested=len(requested_gyms_set) > 1,
-                gyms_in_view=gyms_in_view,
-                gyms_with_ascends=gym_ids_with_ascends,
+
+def dashboard_context(
+    c: Any,
+    uid: int,
+    name: str,
+    gym: str | None,
+    climb_type: ClimbType,
+    grading_system: str,
+    requested_gyms: tuple[int, ...],
+    gym_ids_with_ascends: set[int],
+) -> dict[str, Any]:
+    """Creates the context of the dashboard template. The stats are read from the user database,
+    the charts are computed while the page is rendered.
+
+    Args:
+        c (Connection): The connection to the user database
+        uid (int): The user id of the user
+        name (str): The name of the user
+        gym (str | None): The id of the gym in view, None for the combined dashboard
+        climb_type (ClimbType): The climb type
+        grading_system (str): The grading system
+        requested_gyms (tuple): The ids of the requested gyms
+        gym_ids_with_ascends (set): The ids of the requested gyms with ascends
+
+    Returns:
+        dict: The context, the visuals are an iterator of the charts or of the groups of charts
+    """
+    all_gyms = gyms()
+    requested_gyms_set = set(requested_gyms)
+    gyms_in_view = filter_gyms(all_gyms, requested_gyms_set, gym)
+    gwa = visual_gyms(gym_ids_with_ascends, gyms_in_view)
+
+    # The stats, then the charts one by one, or the groups of charts for the visuals API
+    visuals: Iterator[list[str] | dict[str, Any] | list[dict[str, Any]]]
+    if app.config["DASHBOARD_CHARTS"] == "inline":
+        visuals = iter_visuals(c, uid, gwa, climb_type, grading_system)
+    else:
+        visuals = iter_chart_groups(c, uid, gwa, climb_type, grading_system)
+
+    return {
+        "username": name,
+        "gyms": filter_gyms(all_gyms, requested_gyms_set, None),
+        "multiple_gyms_requested": len(requested_gyms_set) > 1,
+        "gyms_in_view": gyms_in_view,
+        "gyms_with_ascends": gym_ids_with_ascends,
+        "uid": uid,
+        "data_age": None,
+        # The stats read the main table, the charts are computed afterwards without the database
+        "stats": next(visuals),
+        "visuals": visuals,
+    }
+
+
+def render_dashboard(
+    context: dict[str, Any],
+    gym: str | None,
+    climb_type: str,
+    grading_system: str,
+    requested_gyms: tuple[int, ...],
+    page_key: str | None,
+    stream: bool,
+) -> Response | WerkzeugResponse:
+    """Renders the dashboard and caches it under the page key.
+
+    Args:
+        context (dict): The context of the dashboard template
+        gym (str | None): The id of the gym in view, None for the combined dashboard
+        climb_type (str): The climb type
+        grading_system (str): The grading system
+        requested_gyms (tuple): The ids of the requested gyms
+        page_key (str | None): The key to cache the page under, None to not cache it
+        stream (bool): Whether to stream the page, only the inline charts are streamed
+
+    Returns:
+        Response | WerkzeugResponse: The dashboard, or a 304
+    """
+    uid = context["uid"]
+
+    if app.config["DASHBOARD_CHARTS"] == "inline":
+        # To prevent XSS, we generate a nonce and pass it into the template
+        nonce = urandom(16).hex()
+        context.update(nonce=nonce, visuals_urls=())
+        csp = CSP_DASHBOARD_FORMAT_STRING.format(nonce)
+
+        if stream:
+            return stream_dashboard(context, csp, page_key)
+    else:
+        # The browser fetches the groups of charts from the visuals API, which are cached right away,
+        # since they are computed from the data the stats were read from
+        if page_key is not None:
+            for group, charts in enumerate(context["visuals"]):
+                key = visuals_key(uid, climb_type, grading_system, requested_gyms, gym, group)
+                cache.set(key, visuals_response(charts), timeout=DASHBOARD_CACHE_TIMEOUT)
+
+        # The page has no inline scripts and is the same for every request of the user and gyms
+        gym_ids = ",".join(map(str, requested_gyms))
+        visuals_urls = [
+            url_for(
+                "visuals_api",
                 uid=uid,
-                nonce=nonce,
-                stats=dashboard_objects[0],
-                visuals=dashboard_objects[1],
+                gym=gym,
+                group=group,
+                climb_type=climb_type,
+                grading_system=grading_system,
+                gyms=gym_ids,
             )
-        ),
-        200,
-    )
-    response.headers["Content-Security-Policy"] = CSP_DASHBOARD_FORMAT_STRING.format(nonce)
+            for group in range(NR_OF_CHART_GROUPS)
+        ]
+        context.update(nonce=None, visuals=(), visuals_urls=visuals_urls)
+        csp = CSP_DASHBOARD
+
+    # Render the page
+    with stage("render"):
+        html = render_template("dashboard.html", **context)
+    with stage("minify"):
+        html = minify(html)
+    response = make_response(html, 200)
+    response.headers["Content-Security-Policy"] = csp
+
+    if app.config["DASHBOARD_CHARTS"] != "inline":
+        response.vary.add("Cookie")
+
+    if page_key is not None:
+        set_dashboard_etag(response, page_key)
+        cache.set(page_key, response, timeout=DASHBOARD_CACHE_TIMEOUT)
+
+    return response.make_conditional(request)
+
+
+def cache_gym_dashboards(
+    uid: int,
+    name: str,
+    climb_type: ClimbType,
+    grading_system: str,
+    requested_gyms: tuple[int, ...],
+    gym_ids_with_ascends: set[int],
+) -> None:
+    """Renders and caches the dashboard of every gym with ascends, so switching from the combined
+    dashboard to a gym is a cache hit. The user data is not refreshed again, the pages are rendered
+    from the data of the combined dashboard. Pages that are cached already are skipped.
+
+    Args:
+        uid (int): The user id of the user
+        name (str): The name of the user
+        climb_type (ClimbType): The climb type
+        grading_system (str): The grading system
+        requested_gyms (tuple): The ids of the requested gyms
+        gym_ids_with_ascends (set): The ids of the requested gyms with ascends
+    """
+    try:
+        with user_store.connect(uid) as c:
+            for gym_row in filter_gyms(gyms(), gym_ids_with_ascends, None):
+                gym = gym_row[2]
+                page_key = dashboard_key(uid, climb_type, grading_system, requested_gyms, gym)
+                if cache.has(page_key):
+                    continue
+
+                context = dashboard_context(
+                    c, uid, name, gym, climb_type, grading_system, requested_gyms, gym_ids_with_ascends
+                )
+                render_dashboard(context, gym, climb_type, grading_system, requested_gyms, page_key, False)
+    except Exception:
+        # The combined dashboard is sent already, a gym that is not cached is rendered when requested
+        app.logger.exception(f"Caching the gym dashboards of {uid} failed")
+
+
+def set_dashboard_etag(response: Response, page_key: str) -> None:
+    """Sets the entity tag of the cached dashboard, the browser revalidates the page on every load.
+
+    The tag is weak, since the inline charts carry a nonce that differs per render of the same data.
+    """
+    response.set_etag(etag_of(page_key), weak=True)
+    response.cache_control.no_cache = True
+
+
+def stream_dashboard(context: dict[str, Any], csp: str, page_key: str | None) -> Response:
+    """Streams the dashboard. The page up to the stats row is sent at once, every chart follows as
+    soon as it is computed. Once the page is complete, it is cached as a whole under the cache key.
 
-    # Only cache the combined dashboard
-    if not gym:
-        cache.set(cache_identifier, response, timeout=900)
+    Args:
+        context (dict): The context of the dashboard template
+        csp (str): The Content-Security-Policy of the page
+        page_key (str | None): The key to cache the complete page under, None to not cache it
+
+    Returns:
+        Response: The streamed response
+    """
 
+    def generate() -> Iterator[str]:
+        chunks = []
+        for chunk in minify_chunks(stream_template("dashboard.html", **context)):
+            chunks.append(chunk)
+            yield chunk
+
+        if page_key is not None:
+            response = make_response("".join(chunks), 200)
+            response.headers["Content-Security-Policy"] = csp
+            set_dashboard_etag(response, page_key)
+            cache.set(page_key, response, timeout=DASHBOARD_CACHE_TIMEOUT)
+
+    response = Response(stream_with_context(generate()), 200, mimetype="text/html")
+    response.headers["Content-Security-Policy"] = csp
+    if page_key is not None:
+        set_dashboard_etag(response, page_key)
+    # Keep proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
     return response
 
 
@@ -222,7 +894,7 @@ def example_dashboard() -> Response | WerkzeugResponse:
     response.set_cookie("grading_system", "french_rounded")
     response.set_cookie("name", "Marco")
 
-    cache.delete("6693546282")
+    bump_user_data_version(6693546282)
 
     return response
 
@@ -245,6 +917,156 @@ def get_users_by_name(gym_id: int) -> list[tuple[int, str]]:
     return fetch_users(gym_id)
 
 
+@app.route("/api/visuals/<int:uid>", defaults={"gym": None}, methods=("GET",))
+@app.route("/api/visuals/<int:uid>/<gym>", methods=("GET",))
+def visuals_api(uid: int, gym: str | None) -> Response | WerkzeugResponse | tuple[str, int]:
+    """Returns the chart data of the dashboard as compact JSON, rendered by static/js/charts.js.
+
+    The response has a strong ETag of its content, a request with a matching If-None-Match
+    header gets a 304 without a body.
+
+    Args:
+        uid (int): The user id of the user
+        gym (str | None): The id of the gym the user wants to see. If combined, this will be None.
+
+    Notes:
+        - The climb type, grading system and comma separated gym ids are passed as query
+          parameters, so the url identifies the response.
+        - The optional group parameter selects one of the groups of charts, which the dashboard
+          fetches in parallel. Without it, every chart is returned.
+    """
+    try:
+        climb_type = request.args["climb_type"]
+        grading_system = request.args["grading_system"]
+        requested_gyms = tuple(int(g) for g in request.args["gyms"].split(","))
+        group = int(request.args["group"]) if "group" in request.args else None
+    except (KeyError, ValueError):
+        return "Invalid request", 400
+
+    if not check_climb_type(climb_type) or not check_system(grading_system):
+        return "Invalid request", 400
+
+    if group is not None and not 0 <= group < NR_OF_CHART_GROUPS:
+        return "Invalid request", 400
+
+    # The groups of the dashboards are cached when the dashboard is rendered
+    response = cached_response(visuals_key(uid, climb_type, grading_system, requested_gyms, gym, group))
+    if response is not None:
+        return response
+
+    last_update = refresh_user_data(uid, climb_type, requested_gyms)
+
+    with user_store.connect(uid) as c:
+        with stage("main_rebuild"):
+            gym_ids_with_ascends = enrich_user_table_and_get_ascends(c, climb_type, requested_gyms)
+        if not gym_ids_with_ascends:
+            return "No ascends found", 404
+
+        gyms_in_view = filter_gyms(gyms(), set(requested_gyms), gym)
+        visuals = iter_visuals(
+            c, uid, visual_gyms(gym_ids_with_ascends, gyms_in_view), climb_type, grading_system, group
+        )
+
+        # The stats are part of the dashboard page
+        next(visuals)
+
+    # The stats are read, the rest are charts
+    response = visuals_response(cast(list[dict[str, Any]], list(visuals)))
+    if last_update is not None:
+        mark_stale(response, last_update)
+        return response
+
+    # Cached under the version of the data it was computed from
+    key = visuals_key(uid, climb_type, grading_system, requested_gyms, gym, group)
+    cache.set(key, response, timeout=DASHBOARD_CACHE_TIMEOUT)
+    return response.make_conditional(request)
+
+
+def visuals_response(charts: list[dict[str, Any]]) -> Response:
+    """Creates the response of the visuals API, with a strong ETag of its content.
+
+    Args:
+        charts (list): The chart data
+
+    Returns:
+        Response: The chart data as compact JSON
+    """
+    body = json.dumps(charts, separators=(",", ":"))
+
+    response = Response(body, 200, mimetype="application/json")
+    response.set_etag(hashlib.sha256(body.encode()).hexdigest())
+    # The chart data changes with every refresh, the browser revalidates it with the ETag
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route("/api/cache-stats", methods=("GET",))
+def get_cache_stats() -> dict[str, Any]:
+    """Returns the hits and misses of the dashboard cache of the worker that handles the request.
+
+    Returns:
+        dict: The counters of the worker and its process id
+    """
+    return {"pid": os.getpid(), **cache_stats.as_dict()}
+
+
+@app.route("/api/refresh-stats", methods=("GET",))
+def get_refresh_stats() -> dict[str, Any]:
+    """Returns the depth of the queue and the lag of the background refreshes of the worker that
+    handles the request.
+
+    Returns:
+        dict: The stats of the refresh worker of the worker process and its process id
+    """
+    if refresh_worker is None:
+        return {"pid": os.getpid(), "enabled": False}
+
+    return {"pid": os.getpid(), "enabled": True, **refresh_worker.as_dict()}
+
+
+@app.route("/metrics", methods=("GET",))
+def metrics() -> Response:
+    """Returns the metrics of the worker that handles the request in the text format of Prometheus:
+    histograms of the requests, their stages, the requests to TopLogger and the waits for the SQLite
+    locks, and the lookups of the page cache. Only served when the instrumentation is enabled.
+
+    Returns:
+        Response: The metrics
+    """
+    if not INSTRUMENTATION:
+        abort(404)
+
+    return Response(render_metrics(cache_stats.as_dict()), 200, content_type="text/plain; version=0.0.4")
+
+
+@app.route("/admin/profile", methods=("POST",))
+def profile() -> tuple[dict[str, Any], int]:
+    """Starts a sampling profile of the worker that handles the request. The profile is written as
+    folded stacks to the profile directory once the seconds are over. Only served when a profiler
+    token is configured, and only to a request with that token as its bearer token.
+
+    Notes:
+        - The seconds are given in the query string, e.g. /admin/profile?seconds=60
+        - A request reaches a single worker, send the signal of PROFILER_SIGNAL to profile every worker.
+
+    Returns:
+        tuple: The process id, the path and the seconds of the profile, and the status code
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if not PROFILER_TOKEN or scheme != "Bearer" or not hmac.compare_digest(token.encode(), PROFILER_TOKEN.encode()):
+        abort(404)
+
+    seconds = request.args.get("seconds", float(PROFILER_SECONDS), type=float)
+    if not 0 < seconds <= PROFILER_MAX_SECONDS:
+        return {"error": f"A profile takes up to {PROFILER_MAX_SECONDS} seconds"}, 400
+
+    path = profiler.start(seconds)
+    if path is None:
+        return {"pid": os.getpid(), "error": "A profile of this worker is running"}, 409
+
+    return {"pid": os.getpid(), "path": path, "seconds": seconds}, 202
+
+
 @app.route("/api/preload/<int:uid>", methods=("POST",))
 def preload(uid: int) -> tuple[str, int]:
     """To reduce load times, we have a preload endpoint that will preload the user data for the user.
@@ -257,28 +1079,29 @@ def preload(uid: int) -> tuple[str, int]:
         uid (int): The user id of the user
 
     Notes:
-        - The fingerprint is a hash of current hour and should be passed to the front end.
-        - The preload is check against the current hour, so if the user visits the page at 10:59,
-          the preload will be invalidated at 11:00. However, this only results in a small
-          amount of requests being invalidated.
+        - The fingerprint is an HMAC of the current hour with the secret key, the same in every
+          worker, and should be passed to the front end.
+        - The preload is checked against the current and the previous hour, so if the user visits
+          the page at 10:59, the preload stays valid until 12:00.
     """
 
     data = request.get_json()
-    if "fp" not in data or data["fp"] != str(hash(dt.now().strftime("%Y-%m-%d-%H"))):
+    if not check_preload_fingerprint(app.secret_key, data.get("fp"), dt.now()):
         return "Invalid request", 400
 
     try:
         climb_type = data["climb_type"]
-        requested_gyms = data["gym_ids"]
-    except KeyError:
+        # The gym ids are sent as strings, they have to match the gym ids of the dashboard to be coalesced
+        requested_gyms = tuple(int(g) for g in data["gym_ids"])
+    except (KeyError, TypeError, ValueError):
         return "Invalid request", 400
 
-    if climb_type not in {"boulder", "route"}:
+    if not check_climb_type(climb_type):
         return "Invalid request", 400
 
-    db_copied = copy_user_db(USER_DB_FORMAT_STRING.format(uid))
+    if refresh_worker is not None and not redispatched():
+        refresh_worker.visit(uid, climb_type, requested_gyms)
 
-    with connect(USER_DB_FORMAT_STRING.format(uid), isolation_level="EXCLUSIVE") as c:
-        update_user_data(c, uid, climb_type, tuple(requested_gyms), db_copied)
+    refresh_user_data(uid, climb_type, requested_gyms)
 
     return "Preloaded", 200
@@ -0,0 +1,133 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+from collections import Counter
+from collections.abc import Callable
+from threading import Lock, Thread
+from types import FrameType
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread of the process for a number of seconds and writes them as
+    folded stacks, the input of flamegraph.pl, speedscope and most other flame graph tools.
+
+    A sample walks the frames that `sys._current_frames` returns, so it costs the process nothing
+    between the samples and nothing at all when no profile runs. A Cython function has no frame of
+    its own, not even in a profiling build, so its time is counted in the Python function that
+    called it. To see into the Cython modules, profile a build of
+    `scripts/build_cython_modules.py --profile` with cProfile. A single profile runs at a time per
+    process.
+    """
+
+    def __init__(self, directory: str, interval: float, log: Callable[..., None] | None = None) -> None:
+        """
+        Arguments:
+            directory (str): Directory the profiles are written to
+            interval (float): Seconds between the samples
+            log (Callable | None): Logs a failed profile, called with the message and the exception
+        """
+        self._directory = directory
+        self._interval = interval
+        self._log = log
+        # Held from the start of a profile until it is written, by the sampling thread
+        self._lock = Lock()
+
+    def start(self, seconds: float) -> str | None:
+        """Starts a profile of the process in a thread of its own.
+
+        Arguments:
+            seconds (float): Seconds the stacks are sampled
+
+        Returns:
+            str | None: Path the profile will be written to, None if a profile is running already
+        """
+        # Never blocks, a signal handler may interrupt the thread that holds the lock
+        if not self._lock.acquire(blocking=False):
+            return None
+
+        path = os.path.join(self._directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded")
+        try:
+            Thread(target=self._run, args=(seconds, path), name="profiler", daemon=True).start()
+        except BaseException:
+            self._lock.release()
+            raise
+
+        return path
+
+    def _run(self, seconds: float, path: str) -> None:
+        try:
+            self._write(self._sample(seconds), path)
+        except Exception as e:
+            if self._log is not None:
+                self._log(f"Profile {path} failed", e)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float) -> Counter[str]:
+        """Samples the stacks of the other threads until the seconds are over.
+
+        Returns:
+            Counter: The number of samples per folded stack
+        """
+        own = threading.get_ident()
+        stacks: Counter[str] = Counter()
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[fold(names.get(ident, str(ident)), frame)] += 1
+
+            time.sleep(self._interval)
+
+        return stacks
+
+    def _write(self, stacks: Counter[str], path: str) -> None:
+        """Writes the folded stacks to a temporary file first, a profile at the path is complete"""
+        os.makedirs(self._directory, exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        os.replace(f"{path}.tmp", path)
+
+
+def fold(thread: str, frame: FrameType | None) -> str:
+    """Folds a stack into a line of the profile: the thread and the functions from the outermost
+    inwards, separated by semicolons.
+
+    Arguments:
+        thread (str): Name of the thread
+        frame (FrameType | None): The innermost frame of the stack
+
+    Returns:
+        str: The folded stack
+    """
+    functions = []
+    while frame is not None:
+        functions.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+
+    functions.append(thread)
+    # A semicolon separates the functions, a space the count
+    return ";".join(reversed(functions)).replace(" ", "_")
+
+
+def install_signal_handler(profiler: SamplingProfiler, name: str, seconds: float) -> None:
+    """Starts a profile whenever the process receives the signal.
+
+    Arguments:
+        profiler (SamplingProfiler): The profiler of the process
+        name (str): Name of the signal, e.g. SIGUSR2
+        seconds (float): Seconds of a profile
+
+    Raises:
+        ValueError: If there is no signal by that name, or the handler is not installed by the main thread
+    """
+    signum = getattr(signal, name, None)
+    if not isinstance(signum, signal.Signals):
+        raise ValueError(f"{name} is not a signal")
+
+    signal.signal(signum, lambda *_: profiler.start(seconds))
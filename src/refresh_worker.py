@@ -0,0 +1,241 @@
+import heapq
+import itertools
+import statistics
+import time
+
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor
+from threading import Condition, Thread
+from typing import Any
+
+from src.custom_types import ClimbType
+
+
+# Priorities of the refreshes, of the refreshes that are due the one with the lowest is submitted first
+PRIORITY_VISIT = 0  # The user is on the site, with a dashboard or a preload
+PRIORITY_REMEMBERED = 1  # The user is remembered by a visitor of the start page
+PRIORITY_EXPIRY = 2  # The data of an active user is about to expire
+
+# The user, the climb type and the requested gyms of a refresh
+Target = tuple[int, ClimbType, tuple[int, ...]]
+
+
+class RefreshWorker:
+    """Refreshes the user data of active users in the background, before it expires.
+
+    A refresh is scheduled per user, climb type and gyms, with the time it is due and a priority.
+    A thread takes the due refreshes in the order of their priority and submits them to the
+    executor, within a budget of refreshes per second, so the background leaves the upstream rate
+    limit to the requests. A refresh of data that was synced within the interval is not submitted,
+    it is scheduled again for when the data is an interval old.
+
+    After a refresh, the next one is scheduled an interval after the sync, ahead of the expiry of
+    the data, as long as the user was seen within the active window.
+
+    Attributes:
+        submitted (int): Number of refreshes submitted to the executor
+        refreshed (int): Number of refreshes that finished
+        failed (int): Number of refreshes that raised
+        skipped (int): Number of due refreshes of data that was synced within the interval
+        inactive (int): Number of targets dropped since their user was not seen within the active window
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        refresh: Callable[[int, ClimbType, tuple[int, ...]], Any],
+        last_sync: Callable[[int, ClimbType, tuple[int, ...]], int | None],
+        interval: float,
+        active_window: float,
+        rate: float,
+        burst: int,
+        log: Callable[..., None] | None = None,
+    ) -> None:
+        """
+        Arguments:
+            executor (Executor): Executor that runs the refreshes
+            refresh (Callable): Refreshes the data of a user, climb type and gyms
+            last_sync (Callable): Returns the unix time of the oldest sync of the gyms, None if one was not synced
+            interval (float): Seconds after a sync that the data is refreshed again
+            active_window (float): Seconds after the last visit of a user that the data is kept fresh
+            rate (float): Refreshes per second
+            burst (int): Maximum burst of refreshes
+            log (Callable | None): Logs a failed refresh, called with the message and the exception
+        """
+        self._executor = executor
+        self._refresh = refresh
+        self._last_sync = last_sync
+        self._interval = interval
+        self._active_window = active_window
+        self._rate = rate
+        self._capacity = max(burst, 1)
+        self._tokens = float(self._capacity)
+        self._updated = time.monotonic()
+        self._log = log
+
+        self._condition = Condition()
+        self._thread: Thread | None = None
+        self._sequence = itertools.count()
+        # The scheduled refreshes by their due time and, once due, by their priority. A target that is
+        # scheduled again keeps its stale entries in the heaps, they are skipped when popped
+        self._scheduled: dict[Target, tuple[float, int, int]] = {}
+        self._pending: list[tuple[float, int, int, Target]] = []
+        self._due: list[tuple[int, float, int, Target]] = []
+        self._last_seen: dict[Target, float] = {}
+        self._running = 0
+        self._lags: deque[float] = deque(maxlen=1000)
+
+        self.submitted = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.inactive = 0
+
+    def visit(
+        self, uid: int, climb_type: ClimbType, requested_gyms: tuple[int, ...], priority: int = PRIORITY_VISIT
+    ) -> None:
+        """Marks the user as seen and schedules a refresh of the data right away. The refresh is only
+        submitted if the data was not synced within the interval.
+
+        Arguments:
+            uid (int): The user id
+            climb_type (ClimbType): The climb type
+            requested_gyms (tuple): The ids of the gyms
+            priority (int): Priority of the refresh
+        """
+        target = (uid, climb_type, tuple(sorted(set(requested_gyms))))
+        with self._condition:
+            self._last_seen[target] = time.time()
+            self._schedule(target, time.time(), priority)
+
+    def _schedule(self, target: Target, due: float, priority: int) -> None:
+        """Schedules the refresh of the target, unless it is scheduled earlier already. The lock is held."""
+        current = self._scheduled.get(target)
+        if current is not None and (current[0], current[1]) <= (due, priority):
+            return
+
+        entry = self._scheduled[target] = (due, priority, next(self._sequence))
+        heapq.heappush(self._pending, (*entry, target))
+        self._condition.notify()
+
+        if self._thread is None or not self._thread.is_alive():
+            # Started on first use, also in a worker process that was forked after it started
+            self._thread = Thread(target=self._run, name="refresh-worker", daemon=True)
+            self._thread.start()
+
+    def _next(self) -> tuple[Target, float]:
+        """Waits until a refresh is due and the budget allows it. The lock is held.
+
+        Returns:
+            tuple: The target and the time the refresh was due
+        """
+        while True:
+            now = time.time()
+            while self._pending and self._pending[0][0] <= now:
+                due, priority, sequence, target = heapq.heappop(self._pending)
+                heapq.heappush(self._due, (priority, due, sequence, target))
+
+            # An entry of a target that was scheduled again has an older sequence number
+            while self._due and self._due[0][2] != self._scheduled.get(self._due[0][3], (0, 0, -1))[2]:
+                heapq.heappop(self._due)
+
+            wait: float | None
+            if self._due:
+                wait = self._budget_wait()
+                if wait <= 0:
+                    priority, due, sequence, target = heapq.heappop(self._due)
+                    del self._scheduled[target]
+                    return target, due
+            else:
+                wait = self._pending[0][0] - now if self._pending else None
+
+            self._condition.wait(wait)
+
+    def _budget_wait(self) -> float:
+        """Returns the seconds until the budget has a refresh left, 0 if it has one now"""
+        if self._rate <= 0:
+            return 0
+
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        return 0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                target, due = self._next()
+
+            try:
+                last_sync = self._last_sync(*target)
+            except Exception as e:
+                last_sync = None
+                if self._log is not None:
+                    self._log(f"Looking up the last sync of {target[0]} failed", e)
+
+            with self._condition:
+                if last_sync is not None and last_sync + self._interval > time.time():
+                    # Synced by a request in the meantime
+                    self.skipped += 1
+                    self._reschedule(target, last_sync + self._interval)
+                    continue
+
+                self._tokens -= 1
+                self._running += 1
+                self.submitted += 1
+                self._lags.append(max(time.time() - due, 0))
+
+            self._executor.submit(self._refresh_target, target)
+
+    def _refresh_target(self, target: Target) -> None:
+        """Refreshes the target on the executor and schedules the next refresh"""
+        failed = False
+        try:
+            self._refresh(*target)
+            last_sync = self._last_sync(*target)
+        except Exception as e:
+            failed = True
+            last_sync = None
+            if self._log is not None:
+                self._log(f"Background refresh of {target[0]} failed", e)
+
+        with self._condition:
+            self._running -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.refreshed += 1
+
+            # A refresh that failed, or did not sync every gym, is tried again after a tenth of the interval
+            retry = time.time() + self._interval / 10
+            self._reschedule(target, retry if last_sync is None else max(last_sync + self._interval, retry))
+
+    def _reschedule(self, target: Target, due: float) -> None:
+        """Schedules the next refresh of the target, if its user was seen within the active window.
+        The lock is held."""
+        if time.time() - self._last_seen.get(target, 0) < self._active_window:
+            self._schedule(target, due, PRIORITY_EXPIRY)
+        elif self._last_seen.pop(target, None) is not None:
+            self.inactive += 1
+
+    def as_dict(self) -> dict[str, int | float]:
+        """Returns the depth of the queue, the counters and the lag of the recent refreshes in
+        seconds, the time between when a refresh was due and when it was submitted."""
+        with self._condition:
+            now = time.time()
+            lags = sorted(self._lags)
+            return {
+                "queued": len(self._scheduled),
+                "due": sum(1 for due, _, _ in self._scheduled.values() if due <= now),
+                "running": self._running,
+                "active_targets": len(self._last_seen),
+                "submitted": self.submitted,
+                "refreshed": self.refreshed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "inactive": self.inactive,
+                "lag_p50": round(statistics.median(lags), 3) if lags else 0.0,
+                "lag_p99": round(lags[min(len(lags) - 1, len(lags) * 99 // 100)], 3) if lags else 0.0,
+                "lag_max": round(lags[-1], 3) if lags else 0.0,
+            }
@@ -0,0 +1,126 @@
+import asyncio
+
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Executor, Future
+from threading import Lock
+from typing import Any
+
+
+class SingleFlight:
+    """Runs a function only once for concurrent calls with the same key.
+
+    The first call for a key executes the function, calls for the same key that arrive while it
+    runs wait for it and share its result, or its exception. Once the function returns, the next
+    call for the key executes it again.
+
+    Attributes:
+        executed (int): Number of calls that executed the function
+        coalesced (int): Number of calls that shared the result of an executing call
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._calls: dict[Hashable, Future[Any]] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do[T](self, key: Hashable, function: Callable[..., T], *args: Any) -> tuple[T, bool]:
+        """Executes the function, or joins the call for the same key that is in flight.
+
+        Arguments:
+            key (Hashable): Key of the call
+            function (Callable): Function to execute
+            *args (Any): Arguments of the function
+
+        Returns:
+            tuple: The result of the function and whether it was shared with another call
+        """
+        with self._lock:
+            joined = self._calls.get(key)
+            if joined is None:
+                future: Future[T] = Future()
+                self._calls[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if joined is not None:
+            return joined.result(), True
+
+        return self._run(key, future, function, *args), False
+
+    async def do_async[T](self, key: Hashable, function: Callable[..., Awaitable[T]], *args: Any) -> tuple[T, bool]:
+        """Awaits the coroutine function, or joins the call for the same key that is in flight. The calls
+        of do and submit for the key join the awaited call as well, and the other way around.
+
+        Arguments:
+            key (Hashable): Key of the call
+            function (Callable): Coroutine function to await
+            *args (Any): Arguments of the function
+
+        Returns:
+            tuple: The result of the function and whether it was shared with another call
+        """
+        with self._lock:
+            joined = self._calls.get(key)
+            if joined is None:
+                future: Future[T] = Future()
+                self._calls[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if joined is not None:
+            # A cancelled request leaves the call it joined running for the others
+            return await asyncio.shield(asyncio.wrap_future(joined)), True
+
+        try:
+            result = await function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def submit(self, executor: Executor, key: Hashable, function: Callable[..., Any], *args: Any) -> Future[Any]:
+        """Executes the function on the executor, or joins the call for the same key that is in
+        flight. A call of do for the key joins the submitted call as well.
+
+        Arguments:
+            executor (Executor): Executor to run the function on
+            key (Hashable): Key of the call
+            function (Callable): Function to execute
+            *args (Any): Arguments of the function
+
+        Returns:
+            Future: The future of the result of the function
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            future = self._calls[key] = Future()
+            self.executed += 1
+
+        executor.submit(self._run, key, future, function, *args)
+        return future
+
+    def _run[T](self, key: Hashable, future: Future[T], function: Callable[..., T], *args: Any) -> T:
+        """Executes the function of the leading call and passes its outcome to the calls that joined"""
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -0,0 +1,301 @@
+import os
+import sqlite3
+
+from threading import Lock
+
+from src.database import copy_user_db
+from src.cython_modules.constants import (
+    USER_DB_FORMAT_STRING,
+    USER_SHARD_FORMAT_STRING,
+    USER_STORE,
+    NR_OF_USER_SHARDS,
+)
+
+
+# The tables of a user database, with their columns and the columns that identify the rows to delete
+USER_TABLES: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    "ascends": (("id", "climb_id", "date_logged", "type", "gym_id"), ("id",)),
+    "opinions": (("id", "climb_id", "uid", "project", "voted_renew", "grade_rating", "rating"), ("id",)),
+    "main": (
+        (
+            "id",
+            "climb_id",
+            "date_logged",
+            "ascend_type",
+            "gym_id",
+            "grade",
+            "climb_type",
+            "average_opinion",
+            "date_live_start",
+            "date_live_end",
+            "wall_name",
+            "gym_name",
+            "project",
+            "voted_renew",
+            "grade_rating",
+            "rating",
+        ),
+        # The main table is only deleted from per gym and climb type, their rows are deleted at once
+        ("gym_id", "climb_type"),
+    ),
+    "main_state": (("gym_id", "climb_type", "user_version", "static_version", "has_ascends"), ("gym_id", "climb_type")),
+    "user_versions": (("gym_id", "version"), ("gym_id",)),
+}
+
+SHARD_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS shard_users (
+        uid BIGINT PRIMARY KEY,
+        created UNSIGNED INTEGER DEFAULT (strftime('%s','now'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS shard_ascends (
+        uid BIGINT NOT NULL,
+        id BIGINT NOT NULL,
+        climb_id BIGINT,
+        date_logged DATE,
+        type VARCHAR(8),
+        gym_id INTEGER,
+        PRIMARY KEY (uid, id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS shard_ascends_climb_id_index ON shard_ascends (uid, climb_id)",
+    """
+    CREATE TABLE IF NOT EXISTS shard_opinions (
+        uid BIGINT NOT NULL,
+        id BIGINT NOT NULL,
+        climb_id BIGINT,
+        project BOOL,
+        voted_renew BOOL,
+        grade_rating INTEGER,
+        rating FLOAT,
+        PRIMARY KEY (uid, id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS shard_opinions_climb_id_index ON shard_opinions (uid, climb_id)",
+    """
+    CREATE TABLE IF NOT EXISTS shard_main (
+        uid BIGINT NOT NULL,
+        id BIGINT,
+        climb_id BIGINT,
+        date_logged DATE,
+        ascend_type VARCHAR(8),
+        gym_id INTEGER,
+        grade INTEGER,
+        climb_type VARCHAR(7),
+        average_opinion FLOAT,
+        date_live_start DATE,
+        date_live_end DATE,
+        wall_name TEXT,
+        gym_name TEXT,
+        project BOOL,
+        voted_renew BOOL,
+        grade_rating INTEGER,
+        rating FLOAT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS shard_main_gym_id_index ON shard_main (uid, gym_id)",
+    """
+    CREATE TABLE IF NOT EXISTS shard_main_state (
+        uid BIGINT NOT NULL,
+        gym_id INTEGER NOT NULL,
+        climb_type VARCHAR(7) NOT NULL,
+        user_version INTEGER,
+        static_version INTEGER,
+        has_ascends BOOL,
+        PRIMARY KEY (uid, gym_id, climb_type)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS shard_user_versions (
+        uid BIGINT NOT NULL,
+        gym_id INTEGER NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (uid, gym_id)
+    ) WITHOUT ROWID
+    """,
+)
+
+
+class FileUserStore:
+    """Stores the data of every user in a database of its own, copied from the default user database"""
+
+    def add_user(self, uid: int) -> bool:
+        """Creates the database of the user if it does not exist yet.
+
+        Arguments:
+            uid (int): User id
+
+        Returns:
+            bool: True if the user is new, False otherwise
+        """
+        return copy_user_db(USER_DB_FORMAT_STRING.format(uid))
+
+    def connect(self, uid: int) -> sqlite3.Connection:
+        """Opens a connection to the user database of the user.
+
+        Arguments:
+            uid (int): User id
+
+        Returns:
+            sqlite3.Connection: Connection to the user database
+        """
+        return sqlite3.connect(USER_DB_FORMAT_STRING.format(uid), isolation_level="EXCLUSIVE")
+
+
+class ShardedUserStore:
+    """Stores the data of all users in a fixed number of shard databases in WAL mode.
+
+    Users are assigned to a shard by their user id. The shard tables hold the rows of the user
+    tables keyed by the user id. A connection of a user gets temporary views with the names and
+    columns of the user tables, filtered on the user, and triggers that route inserts and deletes
+    to the shard tables. The functions of the database module, the engine and the statistics thus
+    work on a connection of either store.
+
+    Attributes:
+        nr_of_shards (int): Number of shards
+        path_format (str): Format string of the path of a shard, formatted with the shard number
+    """
+
+    def __init__(self, nr_of_shards: int = NR_OF_USER_SHARDS, path_format: str = USER_SHARD_FORMAT_STRING) -> None:
+        self.nr_of_shards = nr_of_shards
+        self.path_format = path_format
+        self._lock = Lock()
+        self._created: set[int] = set()
+
+    def shard(self, uid: int) -> int:
+        return uid % self.nr_of_shards
+
+    def _open(self, uid: int) -> sqlite3.Connection:
+        """Opens a connection to the shard of the user, the shard is created on first use"""
+        shard = self.shard(uid)
+
+        # Writers of different users of the shard queue for the write lock, readers never wait
+        conn = sqlite3.connect(self.path_format.format(shard), timeout=30, isolation_level="IMMEDIATE")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+        with self._lock:
+            if shard not in self._created:
+                conn.execute("PRAGMA journal_mode = WAL")
+                for query in SHARD_SCHEMA:
+                    conn.execute(query)
+                conn.commit()
+                self._created.add(shard)
+
+        return conn
+
+    def add_user(self, uid: int) -> bool:
+        """Registers the user in its shard.
+
+        Arguments:
+            uid (int): User id
+
+        Returns:
+            bool: True if the user is new, False otherwise
+        """
+        conn = self._open(uid)
+        try:
+            with conn:
+                return conn.execute("INSERT OR IGNORE INTO shard_users (uid) VALUES (?)", (uid,)).rowcount == 1
+        finally:
+            conn.close()
+
+    def connect(self, uid: int) -> sqlite3.Connection:
+        """Opens a connection to the shard of the user, on which the user tables only show the
+        rows of the user.
+
+        Arguments:
+            uid (int): User id
+
+        Returns:
+            sqlite3.Connection: Connection to the shard
+        """
+        conn = self._open(uid)
+        uid = int(uid)
+
+        for table, (columns, keys) in USER_TABLES.items():
+            shard_columns = ("uid", *(c for c in columns if c != "uid"))
+            values = (str(uid), *(f"NEW.{c}" for c in columns if c != "uid"))
+            view_columns = ", ".join(str(uid) if c == "uid" else c for c in columns)
+            deleted_rows = " AND ".join(f"{key} = OLD.{key}" for key in keys)
+
+            conn.execute(
+                f"CREATE TEMP VIEW {table} ({', '.join(columns)}) AS "
+                f"SELECT {view_columns} FROM shard_{table} WHERE uid = {uid}"
+            )
+            conn.execute(
+                f"""
+                CREATE TEMP TRIGGER {table}_insert INSTEAD OF INSERT ON {table}
+                BEGIN
+                    INSERT OR REPLACE INTO shard_{table} ({', '.join(shard_columns)})
+                    VALUES ({', '.join(values)});
+                END
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TEMP TRIGGER {table}_delete INSTEAD OF DELETE ON {table}
+                BEGIN
+                    DELETE FROM shard_{table} WHERE uid = {uid} AND {deleted_rows};
+                END
+                """
+            )
+
+        return conn
+
+    def import_user_db(self, uid: int, path: str) -> int:
+        """Imports the per-user database of the user into its shard, the rows of the user that
+        are already in the shard are replaced.
+
+        Arguments:
+            uid (int): User id
+            path (str): Path to the user database
+
+        Returns:
+            int: Number of rows imported
+        """
+        conn = self._open(uid)
+        uid = int(uid)
+        rows = 0
+
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (path,))
+            tables = {t[0] for t in conn.execute("SELECT name FROM source.sqlite_master WHERE type = 'table'")}
+
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO shard_users (uid) VALUES (?)", (uid,))
+                for table, (columns, _) in USER_TABLES.items():
+                    # Databases created before the main table was materialized miss its tables
+                    if table not in tables:
+                        continue
+
+                    shard_columns = ("uid", *(c for c in columns if c != "uid"))
+                    conn.execute(f"DELETE FROM shard_{table} WHERE uid = {uid}")
+                    rows += conn.execute(
+                        f"""
+                        INSERT INTO shard_{table} ({', '.join(shard_columns)})
+                        SELECT {uid}, {', '.join(c for c in columns if c != 'uid')} FROM source.{table}
+                        """
+                    ).rowcount
+
+            conn.execute("DETACH DATABASE source")
+        finally:
+            conn.close()
+
+        return rows
+
+
+def create_user_store() -> FileUserStore | ShardedUserStore:
+    """Creates the user store that is selected by the USER_STORE environment variable.
+
+    Returns:
+        FileUserStore | ShardedUserStore: The user store
+    """
+    if USER_STORE == "files":
+        return FileUserStore()
+    if USER_STORE == "shards":
+        os.makedirs(os.path.dirname(USER_SHARD_FORMAT_STRING), exist_ok=True)
+        return ShardedUserStore()
+
+    raise ValueError(f"Unknown user store {USER_STORE!r}, expected 'files' or 'shards'")
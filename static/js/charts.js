@@ -0,0 +1,555 @@
+// Renders the charts of the dashboard from their chart data.
+// The chart data is fetched from the visuals API, or passed in by the streamed dashboard.
+
+var WIDE_BREAKPOINTS = [[1500, 650], [700, 500], [600, 440], [500, 380], [400, 320], [350, 260]];
+var BREAKPOINTS = WIDE_BREAKPOINTS.slice(1);
+
+function responsive(breakpoints) {
+    return breakpoints.map(function(b) {
+        return {
+            breakpoint: b[0],
+            options: {
+                chart: {
+                    width: b[1]
+                }
+            }
+        };
+    });
+}
+
+function chartOptions(type, height, width, extra) {
+    return Object.assign({
+        type: type,
+        height: height,
+        width: width,
+        toolbar: {
+            show: false
+        },
+        zoom: {
+            enabled: false
+        }
+    }, extra);
+}
+
+function title(text) {
+    return {
+        text: text,
+        align: 'center'
+    };
+}
+
+var LEGEND = {
+    position: 'top',
+    horizontalAlign: 'center',
+    onItemClick: {
+        toggleDataSeries: true
+    },
+    onItemHover: {
+        highlightDataSeries: true
+    }
+};
+
+var NO_ANIMATIONS = {
+    animations: {
+        enabled: false
+    }
+};
+
+function percentage(val) {
+    return val + '%';
+}
+
+// The width of a chart with a bar per wall or gym
+function barsWidth(labels) {
+    return Math.min(160 * labels.length, 600);
+}
+
+// A stacked bar shows the sum of the series below it, the tooltip shows the grade of the bar itself
+function stackedGrade(grades, offset) {
+    return function(val, opts) {
+        var series = opts.w.globals.series;
+        var sum = 0;
+        var nullCount = 0;
+        for (var i = 0; i < opts.seriesIndex; i++) {
+            if (series[i][opts.dataPointIndex] == undefined) {
+                nullCount++;
+            } else {
+                sum += series[i][opts.dataPointIndex];
+            }
+        }
+        if (nullCount > 0) {
+            sum += offset;
+        }
+        return grades[val + sum];
+    };
+}
+
+var CHARTS = {
+    'ascends-per-grade': function(d) {
+        return {
+            responsive: responsive(WIDE_BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('bar', 500, 750, {
+                stacked: true
+            }),
+            colors: d.colors,
+            dataLabels: {
+                enabled: false
+            },
+            stroke: {
+                curve: 'smooth'
+            },
+            plotOptions: {
+                bar: {
+                    horizontal: false
+                }
+            },
+            title: title('Ascends per grade'),
+            legend: LEGEND,
+            xaxis: {
+                type: 'category',
+                categories: d.labels
+            },
+            yaxis: {
+                min: 0,
+                decimalsInFloat: 0,
+                title: {
+                    text: 'Your ascends'
+                },
+                forceNiceScale: true,
+                labels: {
+                    minWidth: 15
+                }
+            }
+        };
+    },
+    'ascends-over-time': function(d) {
+        return {
+            responsive: responsive(WIDE_BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('area', 500, 750, {
+                stacked: true
+            }),
+            colors: d.colors,
+            dataLabels: {
+                enabled: false
+            },
+            stroke: {
+                curve: 'smooth'
+            },
+            title: title('Ascends over time'),
+            fill: {
+                type: 'gradient',
+                gradient: {
+                    opacityFrom: 0.6,
+                    opacityTo: 0.8
+                }
+            },
+            legend: LEGEND,
+            xaxis: {
+                type: 'datetime',
+                categories: d.labels,
+                labels: {
+                    format: 'MMM yyyy'
+                }
+            },
+            tooltip: {
+                x: {
+                    format: 'MMM yyyy'
+                }
+            },
+            yaxis: {
+                min: 0,
+                decimalsInFloat: 0,
+                title: {
+                    text: 'Your ascends'
+                },
+                forceNiceScale: true,
+                labels: {
+                    minWidth: 15
+                }
+            }
+        };
+    },
+    'max-grade-over-time': function(d) {
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('area', 500, 650, {
+                stacked: true
+            }),
+            colors: d.colors,
+            dataLabels: {
+                enabled: false
+            },
+            stroke: {
+                curve: 'smooth'
+            },
+            title: title('Max grade over time'),
+            fill: {
+                type: 'gradient',
+                gradient: {
+                    opacityFrom: 0.6,
+                    opacityTo: 0.8
+                }
+            },
+            legend: LEGEND,
+            tooltip: {
+                x: {
+                    format: 'MMM yyyy'
+                },
+                y: {
+                    formatter: function(val, opts) {
+                        if (opts.w.globals.series[opts.seriesIndex][opts.dataPointIndex] == undefined) {
+                            return;
+                        }
+                        return stackedGrade(d.grades, d.max)(val, opts);
+                    }
+                }
+            },
+            yaxis: {
+                labels: {
+                    formatter: function(val, index) {
+                        return d.grades[index];
+                    },
+                    minWidth: 15
+                },
+                min: 0,
+                max: d.max,
+                tickAmount: d.max,
+                title: {
+                    text: 'Your grade'
+                }
+            },
+            xaxis: {
+                type: 'datetime',
+                categories: d.labels,
+                labels: {
+                    format: 'MMM yyyy'
+                }
+            }
+        };
+    },
+    'rating-accuracy': function(d) {
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('scatter', 500, 500, NO_ANIMATIONS),
+            colors: d.colors,
+            fill: {
+                type: 'solid'
+            },
+            dataLabels: {
+                enabled: false
+            },
+            title: title('Rating accuracy'),
+            xaxis: {
+                type: 'numeric',
+                min: 1,
+                max: 5,
+                tickAmount: 4,
+                decimalsInFloat: 0,
+                title: {
+                    text: 'Your rating'
+                }
+            },
+            yaxis: {
+                min: 1,
+                max: 5,
+                tickAmount: 8,
+                decimalsInFloat: 1,
+                title: {
+                    text: 'Average rating'
+                }
+            }
+        };
+    },
+    'grading-accuracy': function(d) {
+        var axis = function(text) {
+            return {
+                min: 0,
+                max: d.max,
+                tickAmount: d.max,
+                labels: {
+                    formatter: function(val) {
+                        return d.grades[val];
+                    }
+                },
+                title: {
+                    text: text
+                }
+            };
+        };
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('scatter', 500, 500, NO_ANIMATIONS),
+            colors: d.colors,
+            legend: {
+                show: false
+            },
+            fill: {
+                type: 'solid'
+            },
+            markers: {
+                size: 9
+            },
+            dataLabels: {
+                enabled: false
+            },
+            title: title('Grading accuracy'),
+            xaxis: Object.assign({
+                type: 'numeric'
+            }, axis('Your grade')),
+            yaxis: axis('Average grade')
+        };
+    },
+    'ascends-per-x': function(d) {
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('bar', 500, barsWidth(d.labels), Object.assign({
+                stacked: true
+            }, NO_ANIMATIONS)),
+            plotOptions: {
+                bar: {
+                    horizontal: false
+                }
+            },
+            colors: d.colors,
+            dataLabels: {
+                enabled: false
+            },
+            legend: LEGEND,
+            title: title(d.title),
+            xaxis: {
+                type: 'category',
+                categories: d.labels
+            },
+            yaxis: {
+                min: 0,
+                decimalsInFloat: 0,
+                title: {
+                    text: 'Your ascends'
+                },
+                forceNiceScale: true,
+                labels: {
+                    minWidth: 15
+                }
+            }
+        };
+    },
+    'max-grade-per-x': function(d) {
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('bar', 500, barsWidth(d.labels), Object.assign({
+                stacked: true
+            }, NO_ANIMATIONS)),
+            plotOptions: {
+                bar: {
+                    horizontal: false
+                }
+            },
+            colors: d.colors,
+            dataLabels: {
+                enabled: false
+            },
+            legend: LEGEND,
+            title: title(d.title),
+            tooltip: {
+                y: {
+                    formatter: stackedGrade(d.grades, 0)
+                }
+            },
+            xaxis: {
+                type: 'category',
+                categories: d.labels
+            },
+            yaxis: {
+                labels: {
+                    formatter: function(val, index) {
+                        return d.grades[index];
+                    },
+                    minWidth: 15
+                },
+                min: 0,
+                max: d.max,
+                tickAmount: d.max,
+                title: {
+                    text: 'Your grade'
+                }
+            }
+        };
+    },
+    'flash-rate': function(d) {
+        return {
+            responsive: [{
+                breakpoint: 400,
+                options: {
+                    chart: {
+                        width: 300
+                    }
+                }
+            }, {
+                breakpoint: 350,
+                options: {
+                    chart: {
+                        width: 300,
+                        height: 300
+                    }
+                }
+            }],
+            series: d.series,
+            chart: chartOptions('donut', 500, 350),
+            labels: d.labels,
+            colors: d.colors,
+            legend: {
+                position: 'top',
+                horizontalAlign: 'center',
+                onItemClick: {
+                    toggleDataSeries: false
+                }
+            },
+            tooltip: {
+                y: {
+                    formatter: percentage
+                }
+            },
+            dataLabels: {
+                enabled: false
+            },
+            title: Object.assign(title('Flash rate'), {
+                offsetY: -5,
+                margin: 20
+            })
+        };
+    },
+    'flash-rate-per-x': function(d) {
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('bar', 500, barsWidth(d.labels), Object.assign({
+                stacked: true
+            }, NO_ANIMATIONS)),
+            plotOptions: {
+                bar: {
+                    horizontal: false
+                }
+            },
+            tooltip: {
+                y: {
+                    formatter: percentage
+                }
+            },
+            colors: d.colors,
+            dataLabels: {
+                enabled: false
+            },
+            title: title(d.title),
+            xaxis: {
+                type: 'category',
+                categories: d.labels
+            },
+            yaxis: {
+                min: 0,
+                decimalsInFloat: 0,
+                max: 100,
+                tickAmount: 10,
+                title: {
+                    text: 'Your rates'
+                },
+                labels: {
+                    minWidth: 15
+                }
+            }
+        };
+    },
+    'rating-per-x': function(d) {
+        return {
+            responsive: responsive(BREAKPOINTS),
+            series: d.series,
+            chart: chartOptions('bar', 500, barsWidth(d.labels), NO_ANIMATIONS),
+            plotOptions: {
+                bar: {
+                    horizontal: false
+                }
+            },
+            fill: {
+                type: 'solid',
+                colors: ['#df007a', '#00b0e8']
+            },
+            dataLabels: {
+                enabled: false
+            },
+            title: title(d.title),
+            xaxis: {
+                type: 'category',
+                categories: d.labels
+            },
+            yaxis: {
+                min: 0,
+                max: 5,
+                tickAmount: 10,
+                decimalsInFloat: 1,
+                title: {
+                    text: 'Your average rating'
+                },
+                labels: {
+                    minWidth: 15
+                }
+            }
+        };
+    }
+};
+
+// Renders a chart into its element, the block of the chart is added to the visual plane if the page has none
+function renderChart(visual) {
+    var element = document.getElementById(visual.id);
+    if (element === null) {
+        var plane = document.getElementById('visual-plane');
+        var block = document.createElement('div');
+        var chart = document.createElement('div');
+        element = document.createElement('div');
+
+        block.className = 'block';
+        chart.className = 'chart visual';
+        element.id = visual.id;
+        chart.appendChild(element);
+        block.appendChild(chart);
+        plane.insertBefore(block, plane.lastElementChild);
+    }
+
+    new ApexCharts(element, CHARTS[visual.chart](visual)).render();
+}
+
+// The chart groups are fetched in parallel and rendered in order, so the layout does not depend on the network
+function loadCharts() {
+    var plane = document.getElementById('visual-plane');
+    if (plane === null || !plane.dataset.visuals) {
+        return;
+    }
+
+    var groups = plane.dataset.visuals.split(' ').map(function(url) {
+        return fetch(url, {
+            credentials: 'same-origin'
+        }).then(function(response) {
+            if (!response.ok) {
+                throw new Error(response.status + ' ' + url);
+            }
+            return response.json();
+        });
+    });
+
+    groups.reduce(function(rendered, group) {
+        return rendered.then(function() {
+            return group;
+        }).then(function(visuals) {
+            visuals.forEach(renderChart);
+        });
+    }, Promise.resolve()).catch(function(error) {
+        console.error('Loading the charts failed', error);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', loadCharts);
@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+# The application reads its configuration when it is imported, the tests run on databases of their own
+DATA_DIRECTORY = tempfile.TemporaryDirectory(prefix="toploggerstats-tests-")
+os.environ["DATA_DIRECTORY"] = DATA_DIRECTORY.name
+os.environ["BACKGROUND_REFRESH"] = "0"
+os.environ.pop("PROD", None)
+
+import pytest  # noqa: E402
+
+from scripts import create_databases, create_directories  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def databases() -> None:
+    """Creates the directories and the empty databases of the application"""
+    create_directories.main()
+    create_databases.main()
@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from src import asgi, main
+from src.main import RefreshDeferred
+
+
+UID = 42
+COOKIE = b"climb_type=boulder; grading_system=french; gyms=1,2; name=Test"
+
+
+class RefreshWorker:
+    """Stands in for the refresh worker of the app and records the visits"""
+
+    def __init__(self) -> None:
+        self.visits: list[tuple[int, str, tuple[int, ...]]] = []
+
+    def visit(self, uid: int, climb_type: str, gym_ids: tuple[int, ...], priority: int = 0) -> None:
+        self.visits.append((uid, climb_type, gym_ids))
+
+
+def get(path: str) -> list[dict[str, Any]]:
+    """Serves a GET request of the dashboard through the ASGI application, returns the sent messages"""
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"cookie", COOKIE)],
+    }
+    sent: list[dict[str, Any]] = []
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict[str, Any]) -> None:
+        sent.append(message)
+
+    asyncio.run(asgi.application(scope, receive, send))
+    return sent
+
+
+def test_deferred_refresh_counts_the_request_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    refreshed: list[tuple[int, str, tuple[int, ...]]] = []
+
+    async def refresh_user_data(deferred: RefreshDeferred) -> None:
+        refreshed.append(deferred.target)
+        await asgi.offload(main.user_store.add_user, deferred.target[0])
+
+    worker = RefreshWorker()
+    monkeypatch.setattr(asgi, "refresh_user_data", refresh_user_data)
+    monkeypatch.setattr(main, "refresh_worker", worker)
+    # The new user has no ascends, the error page is not rendered
+    monkeypatch.setattr(main, "error_handler", lambda code, title, message: (title, code))
+    misses = main.cache_stats.misses
+
+    sent = get(f"/{UID}")
+
+    assert sent[0]["status"] == 404
+    assert refreshed == [(UID, "boulder", (1, 2))]
+    assert worker.visits == [(UID, "boulder", (1, 2))]
+    assert main.cache_stats.misses - misses == 1
+
+
+def test_written_body_is_sent_ahead_of_the_returned_body(monkeypatch: pytest.MonkeyPatch) -> None:
+    def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+        write = start_response("200 OK", [("Content-Type", "text/plain")])
+        write(b"written ")
+        return [b"returned"]
+
+    monkeypatch.setattr(asgi, "app", app)
+    response = asgi.WSGIResponse({})
+
+    assert response.status == 200
+    assert response.headers == [(b"content-type", b"text/plain")]
+    assert response.read() == b"written "
+    assert response.read() == b"returned"
+    assert response.read() is None
@@ -0,0 +1,65 @@
+import os
+from typing import Any
+
+import pytest
+
+from src import database
+from src.custom_types import AscendsJson, ClimbsJson, ClimbType, GymsJson, WallsJson
+from src.cython_modules.constants import USER_SHARD_FORMAT_STRING
+from src.user_store import FileUserStore, ShardedUserStore
+
+
+UID = 7
+GYM: GymsJson = (1, "Gym 1", "gym-1", 2, 1, 1, "NL")
+WALL: WallsJson = (1000, "Wall", 1)
+CLIMBS: list[ClimbsJson] = [
+    (100_000, 1, "boulder", "2024-01-01 10:00:00", "", 1000, 600, True, 0.5, 1, 3.0),
+    (100_001, 1, "route", "2024-01-01 10:00:00", "", 1000, 650, True, 0.5, 1, 3.0),
+]
+ASCENDS: list[AscendsJson] = [
+    (10**6, 100_000, "2024-03-01 10:00:00", "Flash"),
+    (10**6 + 1, 100_001, "2024-03-01 10:00:00", "Redpoint"),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def static_data() -> None:
+    database.add_gyms([GYM])
+    database.add_walls([WALL])
+    database.add_climbs(CLIMBS)
+
+
+@pytest.fixture(params=["files", "shards"])
+def user_store(request: pytest.FixtureRequest) -> FileUserStore | ShardedUserStore:
+    if request.param == "files":
+        return FileUserStore()
+
+    os.makedirs(os.path.dirname(USER_SHARD_FORMAT_STRING), exist_ok=True)
+    return ShardedUserStore(1)
+
+
+def test_switching_climb_types_does_not_rebuild_the_main_table(
+    monkeypatch: pytest.MonkeyPatch, user_store: FileUserStore | ShardedUserStore
+) -> None:
+    rebuilt: list[ClimbType] = []
+    rebuild_main = database._rebuild_main
+
+    def record_rebuild(conn: Any, climb_type: ClimbType, outdated: list[tuple[int, bool, bool, int, int]]) -> Any:
+        rebuilt.append(climb_type)
+        return rebuild_main(conn, climb_type, outdated)
+
+    monkeypatch.setattr(database, "_rebuild_main", record_rebuild)
+    user_store.add_user(UID)
+
+    with user_store.connect(UID) as conn:
+        database.add_ascends(conn, ASCENDS)
+        database.bump_user_versions(conn, (1,))
+
+        climb_types: tuple[ClimbType, ...] = ("boulder", "route", "boulder", "route")
+        for climb_type in climb_types:
+            assert database.enrich_user_table_and_get_ascends(conn, climb_type, (1,)) == {1}
+
+        rows = conn.execute("SELECT climb_type, climb_id FROM main ORDER BY climb_id").fetchall()
+
+    assert rebuilt == ["boulder", "route"]
+    assert rows == [("boulder", 100_000), ("route", 100_001)]